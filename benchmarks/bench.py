@@ -0,0 +1,390 @@
+# Offline benchmark suite: runs the app's ingest, thumbnail and download paths against a fake
+# yt-dlp/ffmpeg and a local thumbnail server, and writes the measurements as JSON so runs of
+# different versions can be compared (--baseline).
+#
+#   python benchmarks/bench.py                      # all scenarios, results/<timestamp>.json
+#   python benchmarks/bench.py --quick -s ingest    # 100/1k entries only, ingest scenarios
+#   python benchmarks/bench.py --baseline old.json  # also print the change per metric
+import argparse, gc, json, os, platform, shutil, statistics, subprocess, sys, tempfile, threading, time, tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+from skylark_engine import AUDIO_MODES, DownloadSettings, ProgressTracker, extract_stream, item_from_entry
+from skylark_cluster import Coordinator
+from skylark_library import LibraryIndex
+from skylark_pipeline import DownloadRunner
+from skylark_queue import DownloadQueue, QueueItem, canonical_video_url
+from fake_yt_dlp import video_id, video_info
+from thumbnail_server import ThumbnailServer
+
+SCENARIOS: Dict[str, Callable[[argparse.Namespace, str], Dict[str, Any]]] = {}
+
+def scenario(name: str):
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+def install_fake_tools(bin_dir: str):
+    # Shims named yt-dlp/ffmpeg that run the fakes with this interpreter, first on PATH.
+    os.makedirs(bin_dir, exist_ok=True)
+    for tool, script in (("yt-dlp", "fake_yt_dlp.py"), ("ffmpeg", "fake_ffmpeg.py")):
+        target = os.path.join(BENCH_DIR, script)
+        if os.name == "nt":
+            with open(os.path.join(bin_dir, f"{tool}.cmd"), "w") as f: f.write(f'@"{sys.executable}" "{target}" %*\n')
+        else:
+            path = os.path.join(bin_dir, tool)
+            with open(path, "w") as f: f.write(f'#!/bin/sh\nexec "{sys.executable}" "{target}" "$@"\n')
+            os.chmod(path, 0o755)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+
+def playlist_url(size: int) -> str:
+    return f"https://www.youtube.com/playlist?list=BENCH_{size}"
+
+def sizes(args: argparse.Namespace) -> List[int]:
+    return [100, 1000] if args.quick else [100, 1000, 10000]
+
+@scenario("ingest_core")
+def bench_ingest_core(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    # Enumeration + queue-item construction without Tk: the floor for the GUI ingest below.
+    results = {}
+    for size in sizes(args):
+        download_queue, started, first = DownloadQueue(), time.perf_counter(), None
+        for entries, _ in extract_stream(playlist_url(size), threading.Event()):
+            for info in entries:
+                if (item := item_from_entry(info)) is not None and download_queue.add(item) and first is None: first = time.perf_counter()
+        results[str(size)] = {"seconds": time.perf_counter() - started, "first_item_seconds": (first or started) - started, "items": len(download_queue)}
+    return results
+
+def require_display():
+    import tkinter
+    try: tkinter.Tk().destroy()
+    except tkinter.TclError as e: raise SkipScenario(f"no display: {e}")
+
+def make_app(work: str):
+    require_display()
+    import skylark_downloader
+    config = skylark_downloader.AppConfig
+    for name, value in (("SETTINGS_FILE", "settings.json"), ("METADATA_CACHE_FILE", "metadata.sqlite3"), ("JOURNAL_FILE", "journal.sqlite3"), ("SUBSCRIPTIONS_FILE", "subscriptions.sqlite3"), ("DOWNLOAD_ARCHIVE_FILE", "archive.txt"), ("LIBRARY_INDEX_FILE", "library.sqlite3"), ("THUMBNAIL_CACHE_DIR", "thumbnails"), ("TRACE_FILE", "trace.jsonl"), ("METRICS_FILE", "metrics.prom"), ("DEPENDENCY_CACHE_FILE", "dependencies.json")):
+        setattr(config, name, os.path.join(work, f"{time.monotonic_ns()}-{value}"))
+    app = skylark_downloader.App()
+    app.settings_values["inprocess_engine"] = False
+    app._sync_engine_choice()
+    return app
+
+class SkipScenario(Exception):
+    pass
+
+@scenario("ingest_gui")
+def bench_ingest_gui(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    # _fetch_url_metadata + _process_and_add_entries through the real App, with a 10 ms ticker
+    # on the Tk loop measuring how late it fires while the ingest runs.
+    results = {}
+    for size in sizes(args):
+        app, lateness, state = make_app(work), [], {}
+        def tick(expected: float):
+            now = time.perf_counter()
+            lateness.append(max(0.0, now - expected))
+            if app.ingest_session is None and "started" in state:
+                state["seconds"] = now - state["started"]
+                return app.quit()
+            app.after(10, tick, now + 0.010)
+        def start():
+            app.url_entry.insert(0, playlist_url(size))
+            state["started"] = time.perf_counter()
+            app.add_to_queue()
+            app.after(10, tick, time.perf_counter() + 0.010)
+        app.after(500, start)
+        app.mainloop()
+        details_started = time.perf_counter()
+        while app.detail_fetcher.pending_count() and time.perf_counter() - details_started < args.timeout:
+            app.update()
+            time.sleep(0.01)
+        lateness.sort()
+        results[str(size)] = {"seconds": state.get("seconds"), "items": len(app.download_queue), "details_seconds": state.get("seconds", 0) + time.perf_counter() - details_started,
+                              "loop_latency_ms": {"p50": 1000 * statistics.median(lateness) if lateness else None, "p99": 1000 * lateness[int(len(lateness) * 0.99)] if lateness else None, "max": 1000 * lateness[-1] if lateness else None}}
+        app._on_close()
+    return results
+
+@scenario("thumbnails")
+def bench_thumbnails(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    from skylark_thumbnails import ThumbnailLoader
+    count = 200 if args.quick else 1000
+    server = ThumbnailServer(latency=args.thumbnail_latency).start()
+    try:
+        results = {}
+        loader = ThumbnailLoader(os.path.join(work, "thumbnails"), size=(240, 136))
+        for label in ("cold", "memory"):
+            done, started = threading.Semaphore(0), time.perf_counter()
+            for n in range(count): loader.load(f"{server.url}/vi/bench{n:06d}/hqdefault.jpg", lambda image, error: done.release())
+            for _ in range(count): done.acquire()
+            results[label] = {"seconds": time.perf_counter() - started, "per_second": count / (time.perf_counter() - started)}
+        loader.shutdown()
+        loader = ThumbnailLoader(os.path.join(work, "thumbnails"), size=(240, 136))
+        done, started = threading.Semaphore(0), time.perf_counter()
+        for n in range(count): loader.load(f"{server.url}/vi/bench{n:06d}/hqdefault.jpg", lambda image, error: done.release())
+        for _ in range(count): done.acquire()
+        results["disk"] = {"seconds": time.perf_counter() - started, "per_second": count / (time.perf_counter() - started)}
+        loader.shutdown()
+        results["http_requests"] = server.requests
+        return results
+    finally: server.stop()
+
+@scenario("memory_per_item")
+def bench_memory(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    from fake_yt_dlp import video_info
+    count = 10000 if args.quick else 100000
+    infos = [video_info(n, count) for n in range(count)]
+    gc.collect()
+    rss_before = peak_rss()
+    tracemalloc.start()
+    download_queue = DownloadQueue()
+    for info in infos: download_queue.add(item_from_entry(info))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = peak_rss()
+    return {"items": count, "bytes_per_item": current / count, "peak_bytes_per_item": peak / count, "peak_rss_delta_bytes_per_item": (rss_after - rss_before) / count if rss_before is not None else None}
+
+def peak_rss() -> Optional[int]:
+    try: import resource
+    except ImportError: return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+@scenario("download")
+def bench_download(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    # End-to-end DownloadRunner (what run_download_process drives) at each concurrency level.
+    count, results = (12 if args.quick else 40), {}
+    items = [item for entries, _ in extract_stream(playlist_url(count), threading.Event()) for item in map(item_from_entry, entries) if item]
+    for label, changes in [(str(n), {"concurrent_downloads": n, "adaptive_concurrency": False}) for n in range(1, 6)] + [("adaptive", {"concurrent_downloads": 3, "adaptive_concurrency": True})]:
+        for fmt in ("MP4 - Video", "MP3 - Audio Only"):
+            save_path = tempfile.mkdtemp(dir=work)
+            settings = DownloadSettings(format=fmt, inprocess_engine=False, **changes)
+            runner = DownloadRunner(settings, tracker=ProgressTracker())
+            cpu_started, started = cpu_children(), time.perf_counter()
+            outcomes = runner.run(items, save_path)
+            results[f"{label}/{'mp3' if settings.is_audio else 'mp4'}"] = {"seconds": time.perf_counter() - started, "child_cpu_seconds": cpu_children() - cpu_started, "failed": sum(1 for _, level, _ in outcomes if level == "error"), "final_limit": runner.limiter.limit}
+            shutil.rmtree(save_path, ignore_errors=True)
+    return results
+
+@scenario("audio_modes")
+def bench_audio_modes(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    # Post-processing CPU per track for each audio format: MP3 re-encodes, the others stream-copy.
+    count, results = (8 if args.quick else 24), {}
+    items = [item for entries, _ in extract_stream(playlist_url(count), threading.Event()) for item in map(item_from_entry, entries) if item]
+    for fmt in AUDIO_MODES:
+        save_path = tempfile.mkdtemp(dir=work)
+        runner = DownloadRunner(DownloadSettings(format=fmt, inprocess_engine=False, adaptive_concurrency=False), tracker=ProgressTracker())
+        cpu_started, started = cpu_children(), time.perf_counter()
+        outcomes = runner.run(items, save_path)
+        summary = runner.metrics.summary().get("postprocess", {})
+        results[fmt.split(" ")[0].lower()] = {"seconds": time.perf_counter() - started, "child_cpu_seconds_per_track": (cpu_children() - cpu_started) / count, "postprocess_p50": summary.get("p50"), "failed": sum(1 for _, level, _ in outcomes if level == "error")}
+        shutil.rmtree(save_path, ignore_errors=True)
+    return results
+
+@scenario("multi_output")
+def bench_multi_output(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    # MP4 + MP3 of the same videos: two single-format passes against one job with extra_audio.
+    count, results = (8 if args.quick else 24), {}
+    items = [item for entries, _ in extract_stream(playlist_url(count), threading.Event()) for item in map(item_from_entry, entries) if item]
+    for label, passes in (("separate", [DownloadSettings(inprocess_engine=False), DownloadSettings(format="MP3 - Audio Only", inprocess_engine=False)]), ("single_pass", [DownloadSettings(extra_audio="MP3 - Audio Only", inprocess_engine=False)])):
+        save_path, downloaded, started = tempfile.mkdtemp(dir=work), 0, time.perf_counter()
+        for settings in passes:
+            runner = DownloadRunner(settings, tracker=ProgressTracker())
+            runner.run(items, save_path)
+            downloaded += runner.metrics.summary()["download"]["bytes"]
+        results[label] = {"seconds": time.perf_counter() - started, "downloaded_bytes": downloaded, "files": sum(len(files) for _, _, files in os.walk(save_path))}
+        shutil.rmtree(save_path, ignore_errors=True)
+    return results
+
+@scenario("library")
+def bench_library(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    # The same videos saved into a second folder: downloaded again without the library index, placed
+    # from the first folder with it; plus the one-off scan that indexes an existing folder.
+    count, results = (8 if args.quick else 24), {}
+    items = [item for entries, _ in extract_stream(playlist_url(count), threading.Event()) for item in map(item_from_entry, entries) if item]
+    for label, index in (("without_index", ""), ("with_index", os.path.join(tempfile.mkdtemp(dir=work), "library.sqlite3"))):
+        first, second = tempfile.mkdtemp(dir=work), tempfile.mkdtemp(dir=work)
+        settings = DownloadSettings(inprocess_engine=False, library_index=index)
+        DownloadRunner(settings, tracker=ProgressTracker()).run(items, first)
+        runner, started = DownloadRunner(settings, tracker=ProgressTracker()), time.perf_counter()
+        outcomes = runner.run(items, second)
+        summary = runner.metrics.summary()
+        results[label] = {"seconds": time.perf_counter() - started, "downloaded_bytes": summary.get("download", {}).get("bytes", 0), "reused": summary.get("library", {}).get("count", 0), "failed": sum(1 for _, level, _ in outcomes if level == "error")}
+    library, started = LibraryIndex(os.path.join(tempfile.mkdtemp(dir=work), "library.sqlite3")), time.perf_counter()
+    results["scan"] = {"files": library.scan(first), "seconds": time.perf_counter() - started}
+    library.close()
+    return results
+
+@scenario("throttling")
+def bench_throttling(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    # A batch that hits a burst of rate limiting plus a few transient and permanent errors: without
+    # retries every injected failure fails its item, with them only the permanent ones should.
+    count, results = (12 if args.quick else 36), {}
+    items = [item for entries, _ in extract_stream(playlist_url(count), threading.Event()) for item in map(item_from_entry, entries) if item]
+    failure_dir = os.path.join(work, "failures")
+    for label, retries in (("no_retries", 0), ("retries", 3)):
+        os.makedirs(failure_dir, exist_ok=True)
+        for n, kind in enumerate(["rate_limit"] * (count // 2) + ["transient"] * 2 + ["private"]):
+            open(os.path.join(failure_dir, f"{n:04d}-{kind}"), "w").close()
+        os.environ["SKYLARK_BENCH_FAILURE_DIR"] = failure_dir
+        save_path = tempfile.mkdtemp(dir=work)
+        runner = DownloadRunner(DownloadSettings(inprocess_engine=False, concurrent_downloads=4, max_retries=retries), tracker=ProgressTracker())
+        runner.breaker.cooldown = 0.5
+        started = time.perf_counter()
+        try: outcomes = runner.run(items, save_path)
+        finally: del os.environ["SKYLARK_BENCH_FAILURE_DIR"]
+        summary = runner.metrics.summary()["download"]
+        results[label] = {"seconds": time.perf_counter() - started, "failed": sum(1 for _, level, _ in outcomes if level == "error"), "attempts": summary["count"], "breaker_trips": runner.breaker.trips, "final_limit": runner.limiter.limit}
+        shutil.rmtree(failure_dir, ignore_errors=True)
+        shutil.rmtree(save_path, ignore_errors=True)
+    return results
+
+@scenario("scheduling")
+def bench_scheduling(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    # Long videos queued ahead of short ones on two slots, with stream sizes proportional to length:
+    # queue order against shortest-first, as the mean time until an item finishes. Then, on a running
+    # batch, how long pausing and cancelling a running job take to free its slot, and how soon a
+    # high-priority item added meanwhile gets the freed slot.
+    count, results = (12 if args.quick else 36), {}
+    numbers = sorted(range(0, 600, 600 // count), key=lambda n: -video_info(n)["duration"])
+    make_items = lambda: [QueueItem(canonical_video_url(video_id(n)), video_id=video_id(n), title=f"Benchmark video {n}", duration=video_info(n)["duration"]) for n in numbers]
+    settings = DownloadSettings(inprocess_engine=False, concurrent_downloads=2, adaptive_concurrency=False)
+    os.environ["SKYLARK_BENCH_BYTES_PER_SECOND"] = "20000"
+    try:
+        for label, shortest_first in (("queue_order", False), ("shortest_first", True)):
+            save_path, finished = tempfile.mkdtemp(dir=work), []
+            runner, started = DownloadRunner(settings.replace(shortest_first=shortest_first), tracker=ProgressTracker()), time.perf_counter()
+            outcomes = runner.run(make_items(), save_path, lambda item, level, message: finished.append(time.perf_counter() - started))
+            results[label] = {"seconds": time.perf_counter() - started, "mean_completion": statistics.mean(finished), "failed": sum(1 for _, level, _ in outcomes if level == "error")}
+            shutil.rmtree(save_path, ignore_errors=True)
+        save_path, items, events = tempfile.mkdtemp(dir=work), make_items(), {}
+        runner = DownloadRunner(settings, tracker=ProgressTracker())
+        thread = threading.Thread(target=runner.run, args=(items, save_path, lambda item, level, message: events.setdefault(item.key, (level, time.perf_counter()))))
+        thread.start()
+        while not all((state := runner.tracker.state(item.key)) and state['fraction'] > 0 for item in items[:2]): time.sleep(0.005)
+        urgent = QueueItem(canonical_video_url(video_id(599)), video_id=video_id(599), title="Benchmark video 599", priority=1)
+        runner.add([urgent])
+        control: Dict[str, Any] = {}
+        for name, stop, item in (("pause", runner.pause, items[0]), ("cancel", runner.cancel, items[1])):
+            stopped = time.perf_counter()
+            stop(item.key)
+            while item.key not in events: time.sleep(0.002)
+            control[f"{name}_seconds"], control[f"{name}_level"] = events[item.key][1] - stopped, events[item.key][0]
+            if name == "pause":
+                while runner.tracker.state(urgent.key) is None and urgent.key not in events: time.sleep(0.002)
+                control["urgent_start_seconds"] = time.perf_counter() - stopped
+        thread.join(args.timeout)
+        control["completed"] = len(events)
+        results["control"] = control
+        shutil.rmtree(save_path, ignore_errors=True)
+    finally: del os.environ["SKYLARK_BENCH_BYTES_PER_SECOND"]
+    return results
+
+@scenario("cluster")
+def bench_cluster(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    # One coordinator queue drained by 1/2/4 local worker processes (two slots each), then a run
+    # where the first worker is killed holding leases and the others pick its jobs up after expiry.
+    # The crash run fails unless a lease of the killed worker expired and every job still finished.
+    count, results = (12 if args.quick else 48), {}
+    items = [item for entries, _ in extract_stream(playlist_url(count), threading.Event()) for item in map(item_from_entry, entries) if item]
+    cli = os.path.join(os.path.dirname(BENCH_DIR), "skylark_cli.py")
+    start = lambda url, n: subprocess.Popen([sys.executable, cli, "--worker", url, "-o", os.path.join(work, f"worker{n}"), "--slots", "2", "--worker-id", f"bench-worker{n}", "--settings", "", "--no-inprocess-engine", "--progress-interval", "0"], stdout=subprocess.DEVNULL)
+    for label, workers, crash in [(str(n), n, False) for n in (1, 2, 4)] + [("crash", 2, True)]:
+        coordinator, started = Coordinator(items, DownloadSettings(inprocess_engine=False), lease_seconds=2.0).start(), time.perf_counter()
+        processes = [start(coordinator.url, n) for n in range(workers)]
+        if crash:
+            deadline = time.monotonic() + args.timeout
+            while not coordinator.status()["workers"].get("bench-worker0"):
+                if time.monotonic() > deadline: raise RuntimeError("crash run: worker 0 never leased a job")
+                time.sleep(0.02)
+            processes[0].kill()
+            processes.append(start(coordinator.url, workers))
+        outcomes = coordinator.wait(args.timeout)
+        results[label] = {"seconds": time.perf_counter() - started, "completed": len(outcomes), "failed": sum(1 for _, level, _ in outcomes if level == "error"), "expired_leases": coordinator.expired}
+        coordinator.release_workers()
+        coordinator.stop()
+        for process in processes: process.wait()
+        if crash and (results[label]["expired_leases"] < 1 or results[label]["completed"] != len(items)):
+            raise RuntimeError(f"crash run: expected an expired lease and {len(items)} completed jobs, got {results[label]}")
+    return results
+
+GUI_STARTUP = """
+import sys, time
+sys.path.insert(0, {root!r})
+import skylark_downloader
+for name, value in {paths!r}.items(): setattr(skylark_downloader.AppConfig, name, value)
+app = skylark_downloader.App()
+def done():
+    if app.time_to_interactive is None: return app.after(10, done)
+    print(app.time_to_interactive, skylark_downloader.IMPORTED - skylark_downloader.STARTED, "requests" in sys.modules)
+    app._on_close()
+app.after(10, done)
+app.mainloop()
+"""
+
+def run_python(code: str) -> List[str]:
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, timeout=120).stdout.split()
+
+@scenario("startup")
+def bench_startup(args: argparse.Namespace, work: str) -> Dict[str, Any]:
+    # Fresh interpreter per run: import time of the Tk-free core (what --headless loads) and, with a
+    # display, the GUI's time_to_interactive measured from the top of skylark_downloader.
+    runs, root = (3 if args.quick else 10), os.path.dirname(BENCH_DIR)
+    core = [float(run_python(f"import sys, time; sys.path.insert(0, {root!r}); t = time.perf_counter(); import skylark_cli; print(time.perf_counter() - t)")[0]) for _ in range(runs)]
+    results: Dict[str, Any] = {"core_import_seconds": statistics.median(core)}
+    try: require_display()
+    except SkipScenario as e: return dict(results, gui={"skipped": str(e)})
+    paths = {name: os.path.join(work, f"startup-{value}") for name, value in (("SETTINGS_FILE", "settings.json"), ("METADATA_CACHE_FILE", "metadata.sqlite3"), ("JOURNAL_FILE", "journal.sqlite3"), ("SUBSCRIPTIONS_FILE", "subscriptions.sqlite3"), ("DOWNLOAD_ARCHIVE_FILE", "archive.txt"), ("LIBRARY_INDEX_FILE", "library.sqlite3"), ("THUMBNAIL_CACHE_DIR", "thumbnails"), ("TRACE_FILE", "trace.jsonl"), ("METRICS_FILE", "metrics.prom"), ("DEPENDENCY_CACHE_FILE", "dependencies.json"))}
+    gui = [run_python(GUI_STARTUP.format(root=root, paths=paths)) for _ in range(runs)]
+    results["gui"] = {"time_to_interactive_seconds": statistics.median(float(r[0]) for r in gui), "import_seconds": statistics.median(float(r[1]) for r in gui), "requests_imported": gui[-1][2] == "True"}
+    return results
+
+def cpu_children() -> float:
+    times = os.times()
+    return times.children_user + times.children_system
+
+def environment() -> Dict[str, Any]:
+    version = None
+    try:
+        import skylark_downloader
+        version = skylark_downloader.AppConfig.VERSION
+    except Exception: pass
+    return {"app_version": version, "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def flatten(data: Any, prefix: str = "") -> Dict[str, float]:
+    if isinstance(data, dict): return {k: v for key, value in data.items() for k, v in flatten(value, f"{prefix}{key}/").items()}
+    return {prefix.rstrip("/"): data} if isinstance(data, (int, float)) and not isinstance(data, bool) else {}
+
+def compare(current: Dict[str, Any], baseline_path: str):
+    with open(baseline_path) as f: baseline = flatten(json.load(f)["scenarios"])
+    for key, value in flatten(current["scenarios"]).items():
+        if (old := baseline.get(key)) and value is not None: print(f"{key:60} {old:12.4f} -> {value:12.4f} ({(value - old) / old * 100:+.1f}%)")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for Skylark Downloader.")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS), help="Run only these scenarios (repeatable).")
+    parser.add_argument("-o", "--output", help="JSON results file (default: benchmarks/results/<timestamp>.json).")
+    parser.add_argument("--baseline", help="Earlier results file to compare against.")
+    parser.add_argument("--quick", action="store_true", help="Smaller workloads.")
+    parser.add_argument("--thumbnail-latency", type=float, default=0.01, help="Per-request latency of the thumbnail server in seconds.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Upper bound on waiting for background detail lookups.")
+    args = parser.parse_args(argv)
+    work = tempfile.mkdtemp(prefix="skylark-bench-")
+    install_fake_tools(os.path.join(work, "bin"))
+    report: Dict[str, Any] = {"environment": environment(), "quick": args.quick, "scenarios": {}}
+    try:
+        for name in args.scenario or list(SCENARIOS):
+            print(f"Running {name}...", file=sys.stderr)
+            try: report["scenarios"][name] = SCENARIOS[name](args, work)
+            except SkipScenario as e: report["scenarios"][name] = {"skipped": str(e)}
+    finally: shutil.rmtree(work, ignore_errors=True)
+    output = args.output or os.path.join(BENCH_DIR, "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f: json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+    if args.baseline: compare(report, args.baseline)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+# Offline stand-in for ffmpeg used by the benchmark suite.
+#
+# Burns SKYLARK_BENCH_FFMPEG_CPU seconds of CPU (default 0.05) for a stream copy and four times
+# that for an audio encode (libmp3lame/libopus), then writes the output file named by the last argument.
+# The -metadata values are written into it (inside moov/udta boxes for MP4/M4A) so library scans can read them.
+import os, struct, sys, time
+
+CPU_SECONDS = float(os.environ.get("SKYLARK_BENCH_FFMPEG_CPU", "0.05"))
+
+def main(args: list) -> int:
+    if "-version" in args:
+        print("ffmpeg version benchmark-stub")
+        return 0
+    budget = CPU_SECONDS * (4 if "libmp3lame" in args or "libopus" in args else 1)
+    started = time.process_time()
+    while time.process_time() - started < budget: sum(i * i for i in range(1000))
+    tags = b"".join(args[n + 1].encode("utf-8") + b"\0" for n, arg in enumerate(args[:-1]) if arg == "-metadata")
+    box = lambda kind, payload: struct.pack(">I4s", 8 + len(payload), kind) + payload
+    muxer = args[args.index("-f") + 1] if "-f" in args else ""
+    data = box(b"ftyp", b"isom") + box(b"mdat", b"\0" * 1024) + box(b"moov", box(b"udta", tags)) if muxer in ("mp4", "ipod") else tags + b"\0" * 1024
+    with open(args[-1], "wb") as f: f.write(data)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,113 @@
+# Offline stand-in for the yt-dlp executable used by the benchmark suite.
+#
+# Playlist URLs of the form ``...playlist?list=BENCH_<n>`` enumerate ``n`` entries oldest first,
+# channel URLs ``.../@bench_<n>/videos`` the same entries newest first; every other URL is a single
+# video. ``--playlist-start`` is honoured. Timing is controlled through environment variables:
+#
+#   SKYLARK_BENCH_ENTRY_LATENCY   seconds per --flat-playlist entry (default 0.0002)
+#   SKYLARK_BENCH_DETAIL_LATENCY  seconds per -j detail lookup (default 0.005)
+#   SKYLARK_BENCH_SIZE            bytes per downloaded stream (default 2000000)
+#   SKYLARK_BENCH_SPEED           bytes/s per download (default 20000000)
+#   SKYLARK_BENCH_BYTES_PER_SECOND  when set, streams are this many bytes per second of the video's
+#                                 duration instead of SKYLARK_BENCH_SIZE
+#   SKYLARK_BENCH_THUMB_URL       base URL of the thumbnail server (default http://127.0.0.1:8765)
+#   SKYLARK_BENCH_FAILURE_DIR     folder of failure tokens ("<n>-rate_limit", "<n>-transient",
+#                                 "<n>-private"); each download claims the first one left and fails that way
+import json, os, re, sys, time
+
+FAILURES = {"rate_limit": "ERROR: [youtube] {id}: Sign in to confirm you're not a bot. This helps protect our community.",
+            "transient": "ERROR: unable to download video data: HTTP Error 503: Service Unavailable", "private": "ERROR: [youtube] {id}: Private video. Sign in if you've been granted access to this video"}
+
+ENTRY_LATENCY = float(os.environ.get("SKYLARK_BENCH_ENTRY_LATENCY", "0.0002"))
+DETAIL_LATENCY = float(os.environ.get("SKYLARK_BENCH_DETAIL_LATENCY", "0.005"))
+SIZE = int(os.environ.get("SKYLARK_BENCH_SIZE", "2000000"))
+SPEED = float(os.environ.get("SKYLARK_BENCH_SPEED", "20000000"))
+BYTES_PER_SECOND = int(os.environ.get("SKYLARK_BENCH_BYTES_PER_SECOND", "0"))
+THUMB_URL = os.environ.get("SKYLARK_BENCH_THUMB_URL", "http://127.0.0.1:8765")
+
+def video_id(n: int) -> str:
+    return f"bench{n:06d}"
+
+def video_info(n: int, playlist_size: int = 0) -> dict:
+    vid = video_id(n)
+    info = {"id": vid, "title": f"Benchmark video {n}", "uploader": "Skylark Bench", "upload_date": "20240101", "duration": 180 + n % 600, "view_count": 1000 * n,
+            "description": f"Benchmark video {n}. Previous: https://www.youtube.com/watch?v={video_id(n - 1)}",
+            "webpage_url": f"https://www.youtube.com/watch?v={vid}", "original_url": f"https://www.youtube.com/watch?v={vid}", "ie_key": "Youtube",
+            "subtitles": {"en": [], "es": []}, "thumbnail": f"{THUMB_URL}/vi/{vid}/hqdefault.jpg",
+            "thumbnails": [{"url": f"{THUMB_URL}/vi/{vid}/default.jpg", "width": 120}, {"url": f"{THUMB_URL}/vi/{vid}/hqdefault.jpg", "width": 480}]}
+    if playlist_size: info.update(playlist_title=f"Benchmark playlist {playlist_size}", playlist_id=f"BENCH_{playlist_size}")
+    return info
+
+def video_number(url: str) -> int:
+    match = re.search(r'bench(\d{6})', url)
+    return int(match.group(1)) if match else 0
+
+def option(args: list, name: str, default=None):
+    return args[args.index(name) + 1] if name in args else default
+
+def enumerate_playlist(url: str, start: int = 1):
+    match = re.search(r'list=BENCH_(\d+)|/@bench_(\d+)', url)
+    if not match:
+        print(json.dumps(video_info(video_number(url))), flush=True)
+        return
+    size = int(match.group(1) or match.group(2))
+    order = range(size) if match.group(1) else range(size - 1, -1, -1)
+    for n in list(order)[start - 1:]:
+        time.sleep(ENTRY_LATENCY)
+        info = video_info(n, size)
+        print(json.dumps({"_type": "url", "ie_key": "Youtube", "id": info["id"], "url": info["webpage_url"], "title": info["title"], "playlist_title": info["playlist_title"]}), flush=True)
+
+def claim_failure() -> str:
+    folder = os.environ.get("SKYLARK_BENCH_FAILURE_DIR")
+    for name in sorted(os.listdir(folder)) if folder and os.path.isdir(folder) else []:
+        try: os.remove(os.path.join(folder, name))
+        except OSError: continue
+        return name.split("-", 1)[1]
+    return ""
+
+def download(args: list, url: str) -> int:
+    if failure := claim_failure():
+        print(FAILURES[failure].format(id=video_id(video_number(url))), file=sys.stderr, flush=True)
+        return 1
+    templates = [args[i + 1] for i, arg in enumerate(args) if arg == "-o"]
+    default = next(t for t in templates if not re.match(r'^\w+:', t) or re.match(r'^[A-Za-z]:[\\/]', t))
+    progress = option(args, "--progress-template", "").split(":", 1)[-1]
+    prints = [args[i + 1].split(":", 1)[1] for i, arg in enumerate(args) if arg == "--print"]
+    info = video_info(video_number(url))
+    size = info["duration"] * BYTES_PER_SECOND if BYTES_PER_SECOND else SIZE
+    for format_id in option(args, "-f", "best").split(","):
+        fmt = format_id.split("[")[0]
+        path = default.replace("%(format_id)s", fmt).replace("%(ext)s", "m4a" if "audio" in fmt and "opus" not in format_id else "webm")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        started, downloaded = time.monotonic(), 0
+        with open(path, "wb") as f:
+            while downloaded < size:
+                chunk = min(size - downloaded, max(1, int(SPEED * 0.1)))
+                f.write(b"\0" * chunk)
+                downloaded += chunk
+                time.sleep(chunk / SPEED)
+                elapsed = time.monotonic() - started
+                fields = {"status": "downloading", "downloaded_bytes": downloaded, "total_bytes": size, "total_bytes_estimate": "NA", "speed": downloaded / elapsed, "eta": (size - downloaded) / SPEED}
+                if progress: print(re.sub(r'%\(progress\.(\w+)\)s', lambda m: str(fields.get(m.group(1), "NA")), progress), flush=True)
+        if progress: print(re.sub(r'%\(progress\.(\w+)\)s', lambda m: str({"status": "finished", "downloaded_bytes": size, "total_bytes": size}.get(m.group(1), "NA")), progress), flush=True)
+        for template in prints:
+            line = template.replace("%(filepath)s", path)
+            line = re.sub(r'%\(\.\{([\w,]+)\}\)j', lambda m: json.dumps({k: info.get(k) for k in m.group(1).split(",")}), line)
+            print(line, flush=True)
+    return 0
+
+def main(args: list) -> int:
+    if "-U" in args:
+        print("yt-dlp is up to date (benchmark stub)")
+        return 0
+    url = args[-1]
+    if "--flat-playlist" in args: enumerate_playlist(url, int(option(args, "--playlist-start", 1)))
+    elif "-j" in args:
+        for url in [a for a in args if a.startswith("http")]:
+            time.sleep(DETAIL_LATENCY)
+            print(json.dumps(video_info(video_number(url))), flush=True)
+    else: return download(args, url)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,53 @@
+# Local HTTP server that serves generated JPEG thumbnails for the benchmark suite.
+import http.server, threading, time
+from io import BytesIO
+from typing import Optional
+
+class ThumbnailServer:
+    # Serves the same 480x360 JPEG for every path after an optional per-request `latency`; counts
+    # requests so cache hit rates can be checked.
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, size=(480, 360)):
+        from PIL import Image
+        buffer = BytesIO()
+        Image.new("RGB", size, (40, 90, 160)).save(buffer, "JPEG", quality=90)
+        payload, server = buffer.getvalue(), self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server._lock: server.requests += 1
+                if server.latency: time.sleep(server.latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args): pass
+
+        self.latency, self.requests = latency, 0
+        self._lock = threading.Lock()
+        self._httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ThumbnailServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+if __name__ == "__main__":
+    server = ThumbnailServer(port=8765).start()
+    print(f"Serving thumbnails on {server.url}")
+    try: threading.Event().wait()
+    except KeyboardInterrupt: server.stop()
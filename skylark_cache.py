@@ -0,0 +1,65 @@
+import json, threading, time
+from typing import List, Dict, Any, Optional, Tuple
+from skylark_db import connect, transaction
+
+class MetadataCache:
+    # SQLite store of per-video queue details keyed by canonical video ID. Entries older than
+    # `ttl` are still served but reported as stale so callers can revalidate in the background;
+    # the least recently used rows are evicted once the table grows past `max_entries`.
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 50_000):
+        self.path, self.ttl, self.max_entries = path, ttl, max_entries
+        self.hits = self.misses = self.stale_hits = 0
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self._conn = connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS metadata (video_id TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed_at)")
+
+    def __contains__(self, video_id: Optional[str]) -> bool:
+        with self._lock:
+            return bool(video_id) and self._conn.execute("SELECT 1 FROM metadata WHERE video_id = ?", (video_id,)).fetchone() is not None
+
+    def get(self, video_id: Optional[str]) -> Optional[Tuple[Dict[str, Any], bool]]:
+        if not video_id: return None
+        return self.get_many([video_id]).get(video_id)
+
+    def get_many(self, video_ids: List[str]) -> Dict[str, Tuple[Dict[str, Any], bool]]:
+        results: Dict[str, Tuple[Dict[str, Any], bool]] = {}
+        video_ids = [v for v in dict.fromkeys(video_ids) if v]
+        now = time.time()
+        with self._lock, transaction(self._conn):
+            for start in range(0, len(video_ids), 500):
+                chunk = video_ids[start:start + 500]
+                rows = self._conn.execute(f"SELECT video_id, data, fetched_at FROM metadata WHERE video_id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+                for video_id, data, fetched_at in rows: results[video_id] = (json.loads(data), now - fetched_at > self.ttl)
+                self._conn.executemany("UPDATE metadata SET accessed_at = ? WHERE video_id = ?", [(now, r[0]) for r in rows])
+            self.hits += len(results)
+            self.misses += len(video_ids) - len(results)
+            self.stale_hits += sum(1 for _, stale in results.values() if stale)
+        return results
+
+    def put(self, video_id: Optional[str], details: Dict[str, Any]):
+        if video_id: self.put_many({video_id: details})
+
+    def put_many(self, items: Dict[str, Dict[str, Any]]):
+        if not items: return
+        now = time.time()
+        with self._lock, transaction(self._conn):
+            self._conn.executemany("INSERT OR REPLACE INTO metadata (video_id, data, fetched_at, accessed_at) VALUES (?, ?, ?, ?)", [(video_id, json.dumps(details), now, now) for video_id, details in items.items()])
+            self._puts_since_evict += len(items)
+            if self._puts_since_evict >= 500: self._evict()
+
+    def _evict(self):
+        self._puts_since_evict = 0
+        excess = self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0] - self.max_entries
+        if excess > 0: self._conn.execute("DELETE FROM metadata WHERE video_id IN (SELECT video_id FROM metadata ORDER BY accessed_at LIMIT ?)", (excess,))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+        return {"entries": size, "hits": self.hits, "misses": self.misses, "stale": self.stale_hits}
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._conn.close()
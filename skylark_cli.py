@@ -0,0 +1,167 @@
+import argparse, dataclasses, json, multiprocessing, os, sys, threading, time
+from typing import List, Dict, Any, Optional
+from skylark_engine import YtDlpEngine, ProgressTracker, DownloadSettings, FORMAT_OPTIONS, QUALITY_MAP, AUDIO_MODES, extract_stream, item_from_entry
+from skylark_pipeline import DownloadRunner
+from skylark_queue import QueueItem, DownloadQueue
+from skylark_journal import JobJournal
+from skylark_metrics import Metrics
+from skylark_subscriptions import SubscriptionStore, sync_all
+from skylark_cluster import Coordinator, Worker
+
+SETTINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings.json")
+SUBSCRIPTIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "subscriptions.sqlite3")
+EXIT_OK, EXIT_FAILED, EXIT_NOTHING_TO_DO = 0, 1, 2
+CHOICES = {"format": FORMAT_OPTIONS, "quality": list(QUALITY_MAP.keys()), "extra_audio": ["None", *AUDIO_MODES]}
+
+def emit(event: str, **fields):
+    print(json.dumps({"event": event, "time": round(time.time(), 3), **fields}), flush=True)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="skylark", description="Download YouTube videos and playlists without the GUI. Emits one JSON event per line on stdout.")
+    parser.add_argument("urls", nargs="*", help="Video or playlist URLs.")
+    parser.add_argument("-i", "--url-file", help="File with one URL per line ('-' for stdin).")
+    parser.add_argument("-o", "--output", help="Destination folder (defaults to default_save_path when use_default_path is set, else the current directory).")
+    parser.add_argument("--settings", default=SETTINGS_FILE, help="settings.json to start from (default: the GUI's settings file).")
+    parser.add_argument("--journal", help="Job journal to record progress in; unfinished jobs from an earlier run are resumed first.")
+    parser.add_argument("--trace", help="Append per-stage timing spans to this JSON-lines file.")
+    parser.add_argument("--metrics", help="Write a Prometheus text snapshot of stage timings here when the run ends.")
+    parser.add_argument("--progress-interval", type=float, default=1.0, help="Seconds between progress events (0 disables them).")
+    subscriptions = parser.add_argument_group("subscriptions")
+    subscriptions.add_argument("--subscriptions", default=SUBSCRIPTIONS_FILE, help="Subscription store (default: the GUI's).")
+    subscriptions.add_argument("--subscribe", action="append", default=[], metavar="URL", help="Save a playlist or channel to sync (repeatable).")
+    subscriptions.add_argument("--unsubscribe", action="append", default=[], metavar="URL", help="Forget a subscription and its sync state (repeatable).")
+    subscriptions.add_argument("--skip-existing", action="store_true", help="With --subscribe: only download videos added after the first sync.")
+    subscriptions.add_argument("--sync", action="store_true", help="Queue the new videos of every subscription.")
+    subscriptions.add_argument("--sync-workers", type=int, default=4, help="Subscriptions enumerated in parallel during --sync.")
+    cluster = parser.add_argument_group("distributed mode")
+    cluster.add_argument("--serve", metavar="[HOST:]PORT", help="Coordinate: resolve the URLs, then hand the jobs out to workers instead of downloading them here.")
+    cluster.add_argument("--worker", metavar="URL", help="Work for the coordinator at URL (e.g. http://host:8700) until its queue is empty; saves to -o.")
+    cluster.add_argument("--slots", type=int, default=2, help="Jobs a worker runs at once.")
+    cluster.add_argument("--worker-id", help="Name this worker reports to the coordinator (default: hostname plus a random suffix).")
+    cluster.add_argument("--lease-seconds", type=float, default=60.0, help="Seconds a worker's lease lasts without a heartbeat before its job is re-queued.")
+    cluster.add_argument("--token", help="Shared secret the coordinator requires from workers.")
+    overrides = parser.add_argument_group("settings overrides")
+    for field in dataclasses.fields(DownloadSettings):
+        flag = "--" + field.name.replace("_", "-")
+        if field.type in (bool, "bool"): overrides.add_argument(flag, dest=field.name, action=argparse.BooleanOptionalAction, default=None)
+        else: overrides.add_argument(flag, dest=field.name, type=int if field.type in (int, "int") else str, choices=CHOICES.get(field.name), default=None)
+    return parser
+
+def load_settings(path: str, args: argparse.Namespace) -> DownloadSettings:
+    values: Dict[str, Any] = {}
+    if path and os.path.exists(path):
+        with open(path, 'r') as f: values = json.load(f)
+    values.update({field.name: getattr(args, field.name) for field in dataclasses.fields(DownloadSettings) if getattr(args, field.name) is not None})
+    return DownloadSettings.from_dict(values)
+
+def read_urls(args: argparse.Namespace) -> List[str]:
+    urls = list(args.urls)
+    if args.url_file:
+        with (sys.stdin if args.url_file == "-" else open(args.url_file, 'r', encoding='utf-8')) as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith('#'))
+    return urls
+
+def sync_subscriptions(args: argparse.Namespace, engine: Optional[YtDlpEngine]) -> List[Dict[str, Any]]:
+    store = SubscriptionStore(args.subscriptions)
+    try:
+        for url in args.unsubscribe:
+            store.remove(url)
+            emit("unsubscribed", url=url)
+        for url in args.subscribe:
+            if store.add(url, skip_existing=args.skip_existing): emit("subscribed", url=url)
+        if not args.sync: return []
+        entries: List[Dict[str, Any]] = []
+        def on_synced(url: str, new: List[Dict[str, Any]], error: str):
+            entries.extend(new)
+            emit("synced", url=url, new=len(new), **({"error": error} if error else {}))
+        sync_all(store, threading.Event(), engine, args.sync_workers, on_synced=on_synced)
+        return entries
+    finally: store.close()
+
+def resolve(urls: List[str], engine: Optional[YtDlpEngine], resumed: List[QueueItem], synced: List[Dict[str, Any]] = ()) -> List[QueueItem]:
+    download_queue, cancel_event = DownloadQueue(), threading.Event()
+    for item in resumed: download_queue.add(item)
+    if resumed: emit("resumed", count=len(resumed))
+    for item in filter(None, map(item_from_entry, synced)): download_queue.add(item)
+    for url in urls:
+        added = skipped = 0
+        try:
+            for entries, stderr_output in extract_stream(url, cancel_event, engine):
+                for info in entries:
+                    if (item := item_from_entry(info)) is None: skipped += 1
+                    elif download_queue.add(item): added += 1
+                if stderr_output.strip(): emit("error", url=url, message=stderr_output.strip().splitlines()[-1])
+        except FileNotFoundError: emit("error", url=url, message="yt-dlp not found.")
+        except Exception as e: emit("error", url=url, message=f"An unexpected error occurred: {e}")
+        emit("resolved", url=url, added=added, skipped=skipped)
+    return download_queue.snapshot()
+
+def serve(args: argparse.Namespace, settings: DownloadSettings, items: List[QueueItem], tracker: ProgressTracker, journal: Optional[JobJournal], on_result) -> List:
+    host, _, port = args.serve.rpartition(":")
+    coordinator = Coordinator(items, settings, host or "127.0.0.1", int(port), args.lease_seconds, args.token, tracker, journal, on_result).start()
+    emit("serving", url=coordinator.url, jobs=len(coordinator.jobs))
+    try:
+        results = coordinator.wait()
+        coordinator.release_workers()
+        return results
+    finally: coordinator.stop()
+
+def work(args: argparse.Namespace, settings: DownloadSettings, save_path: str, engine: Optional[YtDlpEngine], metrics: Metrics) -> int:
+    on_result = lambda item, level, message: emit("result", url=item.url, title=item.title, level=level, message=message)
+    worker = Worker(args.worker, save_path, settings, engine, args.slots, worker_id=args.worker_id, token=args.token, metrics=metrics, on_result=on_result)
+    emit("worker", id=worker.worker_id, coordinator=worker.url, slots=worker.slots)
+    started = time.perf_counter()
+    levels = [level for _, level, _ in worker.run()]
+    if worker.error: emit("error", message=worker.error)
+    emit("summary", ok=levels.count("ok"), warnings=levels.count("warning"), failed=levels.count("error"), elapsed=round(time.perf_counter() - started, 3), output=save_path)
+    return EXIT_FAILED if "error" in levels or worker.error else EXIT_OK
+
+def report_progress(tracker: ProgressTracker, interval: float, done: threading.Event):
+    while not done.wait(interval):
+        changed, fraction, bandwidth = tracker.snapshot()
+        items = {key: {k: state[k] for k in ('fraction', 'speed', 'eta')} for key, state in changed.items() if state is not None}
+        emit("progress", completed=tracker.completed, total=tracker.total, fraction=round(fraction, 4), bandwidth=bandwidth, items=items)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try: settings = load_settings(args.settings, args)
+    except (OSError, ValueError, TypeError) as e:
+        emit("error", message=f"Invalid settings: {e}")
+        return EXIT_NOTHING_TO_DO
+    save_path = args.output or (settings.default_save_path if settings.use_default_path and os.path.isdir(settings.default_save_path) else os.getcwd())
+    engine = YtDlpEngine(max_workers=args.slots if args.worker else settings.concurrent_downloads) if settings.inprocess_engine and YtDlpEngine.is_available() else None
+    journal = JobJournal(args.journal) if args.journal else None
+    metrics = Metrics(args.trace)
+    try:
+        if args.worker: return work(args, settings, save_path, engine, metrics)
+        # Items paused in the GUI stay in the journal for it; they are neither resumed nor downloaded
+        # here, even when a URL given now lists them again.
+        pending = journal.pending() if journal else []
+        resumed, paused = [item for item in pending if not item.paused], set(item.key for item in pending if item.paused)
+        synced = sync_subscriptions(args, engine) if args.subscribe or args.unsubscribe or args.sync else []
+        if not (urls := read_urls(args)) and not resumed and not args.sync:
+            if args.subscribe or args.unsubscribe: return EXIT_OK
+            emit("error", message="No URLs given.")
+            return EXIT_NOTHING_TO_DO
+        if not (items := [item for item in resolve(urls, engine, resumed, synced) if item.key not in paused]):
+            emit("summary", ok=0, warnings=0, failed=0, elapsed=0.0, output=save_path)
+            return EXIT_NOTHING_TO_DO
+        if journal: journal.add_many(items[len(resumed):])
+        tracker, done, started = ProgressTracker(), threading.Event(), time.perf_counter()
+        if args.progress_interval > 0: threading.Thread(target=report_progress, args=(tracker, args.progress_interval, done), daemon=True).start()
+        on_result = lambda item, level, message: emit("result", url=item.url, title=item.title, level=level, message=message)
+        if args.serve: results = serve(args, settings, items, tracker, journal, on_result)
+        else: results = DownloadRunner(settings, engine, tracker, journal, metrics=metrics).run(items, save_path, on_result)
+        done.set()
+        levels = [level for _, level, _ in results]
+        emit("summary", ok=levels.count("ok"), warnings=levels.count("warning"), failed=levels.count("error"), elapsed=round(time.perf_counter() - started, 3), output=save_path)
+        return EXIT_FAILED if "error" in levels else EXIT_OK
+    finally:
+        if engine is not None: engine.shutdown()
+        if journal is not None: journal.close()
+        if args.metrics: metrics.write_snapshot(args.metrics)
+        metrics.close()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
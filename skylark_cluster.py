@@ -0,0 +1,272 @@
+import collections, http.server, json, socket, threading, time, urllib.error, urllib.request, uuid
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from skylark_engine import YtDlpEngine, ProgressTracker, DownloadSettings
+from skylark_journal import JOURNAL_FIELDS, RUNNING, DONE, FAILED
+from skylark_metrics import Metrics
+from skylark_pipeline import DownloadRunner, CircuitBreaker, DiskSpaceGuard, CANCELLED, schedule_key
+from skylark_queue import QueueItem
+
+QUEUED, LEASED, FINISHED = "queued", "leased", "finished"
+MAX_LEASES, CONNECT_RETRIES = 3, 5
+# Settings that describe the worker's machine rather than the job; a worker keeps its own values.
+LOCAL_FIELDS = ("default_save_path", "use_default_path", "inprocess_engine", "download_archive", "library_index", "staging_dir")
+TOKEN_HEADER = "X-Skylark-Token"
+
+class Job:
+    __slots__ = ('item', 'idx', 'state', 'worker', 'expires', 'leases')
+
+    def __init__(self, item: QueueItem, idx: int):
+        self.item, self.idx, self.state = item, idx, QUEUED
+        self.worker, self.expires, self.leases = None, 0.0, 0
+
+class Coordinator:
+    # Serves a list of jobs to workers on this or other hosts over HTTP/JSON:
+    #   POST /lease     {"worker"}                              -> {"job", "settings", "lease_seconds"}, or {"job": null, "done"}
+    #   POST /heartbeat {"worker", "key", "fraction", "speed", "eta"} -> 200 while the lease is held, 409 once it is lost
+    #   POST /result    {"worker", "key", "level", "message", "output_path"}
+    #   GET  /status
+    # Jobs are leased in the runner's schedule order (priority, then shortest first if enabled).
+    # A lease that is not renewed within `lease_seconds` puts the job back at the front of the queue
+    # (crashed or cut-off worker); after MAX_LEASES expiries the job fails. The first result posted
+    # for a job wins, so a late result from a worker that lost its lease is only used if nobody
+    # finished the job first. With a `token`, requests must carry it in the X-Skylark-Token header.
+    def __init__(self, items: List[QueueItem], settings: DownloadSettings, host: str = "127.0.0.1", port: int = 0, lease_seconds: float = 60.0, token: Optional[str] = None,
+                 tracker: Optional[ProgressTracker] = None, journal=None, on_result: Optional[Callable[[QueueItem, str, str], None]] = None):
+        self.settings, self.lease_seconds, self.token = settings, lease_seconds, token
+        self.tracker, self.journal, self.on_result = tracker or ProgressTracker(), journal, on_result
+        self.tracker.add_total(len(items))
+        self.jobs: Dict[str, Job] = {}
+        for idx, item in enumerate(items): self.jobs.setdefault(item.key, Job(item, idx))
+        self.results: List[Tuple[QueueItem, str, str]] = []
+        self.expired = 0
+        self.workers: Dict[str, float] = {}
+        self._released = set()
+        self._queue = collections.deque(sorted(self.jobs, key=lambda key: schedule_key(self.jobs[key].item, settings.shortest_first, self.jobs[key].idx)))
+        self._cond = threading.Condition()
+        self._httpd = http.server.ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def _handler(self):
+        coordinator = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status: int, body: Dict[str, Any]):
+                # A worker that dies mid-request just leaves its lease to expire.
+                data = json.dumps(body).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except ConnectionError: pass
+
+            def _authorized(self) -> bool:
+                if coordinator.token is None or self.headers.get(TOKEN_HEADER) == coordinator.token: return True
+                self._reply(403, {"error": "bad token"})
+                return False
+
+            def do_GET(self):
+                if not self._authorized(): return
+                if self.path == "/status": self._reply(200, coordinator.status())
+                else: self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                if not self._authorized(): return
+                try: body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                except ValueError: return self._reply(400, {"error": "invalid JSON"})
+                routes = {"/lease": coordinator.lease, "/heartbeat": coordinator.heartbeat, "/result": coordinator.result}
+                if (route := routes.get(self.path)) is None: return self._reply(404, {"error": "not found"})
+                try: self._reply(*route(body))
+                except (KeyError, TypeError, ValueError) as e: self._reply(400, {"error": f"bad request: {e}"})
+
+            def log_message(self, *args): pass
+
+        return Handler
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{socket.gethostname() if host in ('0.0.0.0', '') else host}:{port}"
+
+    def start(self) -> "Coordinator":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _reap(self):
+        # Called with the lock held: expired leases go back to the front of the queue.
+        now = time.monotonic()
+        for key, job in self.jobs.items():
+            if job.state != LEASED or job.expires > now: continue
+            self.expired += 1
+            if job.leases >= MAX_LEASES: self._finish(job, "error", f"Failed: lease expired {job.leases} times (worker lost).")
+            else:
+                job.state, job.worker = QUEUED, None
+                self._queue.appendleft(key)
+
+    def _finish(self, job: Job, level: str, message: str):
+        job.state, job.item.error = FINISHED, message if level == "error" else None
+        if self.journal is not None: self.journal.mark(job.item.key, FAILED if level == "error" else DONE, job.item.output_path, message if level == "error" else None)
+        self.tracker.finish(job.item.key)
+        self.results.append((job.item, level, message))
+        if self.on_result: self.on_result(job.item, level, message)
+        self._cond.notify_all()
+
+    def lease(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        with self._cond:
+            self.workers[str(body["worker"])] = time.monotonic()
+            self._reap()
+            while self._queue:
+                job = self.jobs[self._queue.popleft()]
+                if job.state != QUEUED: continue
+                job.state, job.worker, job.expires = LEASED, str(body["worker"]), time.monotonic() + self.lease_seconds
+                job.leases += 1
+                if self.journal is not None: self.journal.mark(job.item.key, RUNNING)
+                self.tracker.start(job.item.key)
+                settings = {name: value for name, value in self.settings.to_dict().items() if name not in LOCAL_FIELDS}
+                return 200, {"job": {"key": job.item.key, "idx": job.idx, "item": {name: getattr(job.item, name) for name in JOURNAL_FIELDS}}, "settings": settings, "lease_seconds": self.lease_seconds}
+            if done := all(job.state == FINISHED for job in self.jobs.values()):
+                self._released.add(str(body["worker"]))
+                self._cond.notify_all()
+            return 200, {"job": None, "done": done}
+
+    def heartbeat(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        with self._cond:
+            job = self.jobs.get(body["key"])
+            if job is None or job.state != LEASED or job.worker != body["worker"]: return 409, {"error": "lease lost"}
+            self.workers[job.worker] = time.monotonic()
+            job.expires = self.workers[job.worker] + self.lease_seconds
+        if body.get("fraction") is not None: self.tracker.report(job.item.key, float(body["fraction"]), body.get("speed"), body.get("eta"))
+        return 200, {"ok": True}
+
+    def result(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        with self._cond:
+            if (job := self.jobs.get(body["key"])) is None: return 404, {"error": "unknown job"}
+            if job.state == FINISHED: return 200, {"accepted": False}
+            job.item.output_path = body.get("output_path")
+            self._finish(job, body["level"], body["message"])
+        return 200, {"accepted": True}
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            self._reap()
+            states = collections.Counter(job.state for job in self.jobs.values())
+            workers = collections.Counter(job.worker for job in self.jobs.values() if job.state == LEASED)
+            return {"jobs": len(self.jobs), "queued": states[QUEUED], "leased": states[LEASED], "finished": states[FINISHED], "expired_leases": self.expired, "workers": dict(workers)}
+
+    def wait(self, timeout: Optional[float] = None) -> List[Tuple[QueueItem, str, str]]:
+        # Blocks until every job has a result, reaping expired leases while nobody asks for work.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not all(job.state == FINISHED for job in self.jobs.values()):
+                if deadline is not None and time.monotonic() >= deadline: break
+                self._cond.wait(min(self.lease_seconds / 4, 1.0))
+                self._reap()
+            return list(self.results)
+
+    def release_workers(self, grace: float = 10.0):
+        # Keeps serving after the last result until every live worker has been told there is no
+        # work left (or `grace` runs out), so workers exit instead of retrying a vanished
+        # coordinator. Workers silent for a whole lease period are presumed dead.
+        deadline = time.monotonic() + grace
+        with self._cond:
+            while (left := deadline - time.monotonic()) > 0:
+                cutoff = time.monotonic() - self.lease_seconds
+                if all(worker in self._released or seen < cutoff for worker, seen in self.workers.items()): break
+                self._cond.wait(min(left, 0.5))
+
+class Worker:
+    # Leases jobs from a Coordinator and runs each through a DownloadRunner (the same command and
+    # option builders as a local download) with the coordinator's settings plus this machine's
+    # LOCAL_FIELDS, heartbeating progress until the result is posted. `slots` jobs run at once and
+    # share one circuit breaker and disk-space guard; `run()` returns once the coordinator has no
+    # work left.
+    def __init__(self, url: str, save_path: str, local_settings: Optional[DownloadSettings] = None, engine: Optional[YtDlpEngine] = None, slots: int = 1,
+                 worker_id: Optional[str] = None, token: Optional[str] = None, poll: float = 1.0, metrics: Optional[Metrics] = None, on_result: Optional[Callable[[QueueItem, str, str], None]] = None):
+        self.url, self.save_path, self.local_settings = url.rstrip("/"), save_path, local_settings or DownloadSettings()
+        self.engine, self.slots, self.token, self.poll = engine, max(1, slots), token, poll
+        self.worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.metrics, self.on_result = metrics or Metrics(), on_result
+        self.breaker, self.space = CircuitBreaker(), DiskSpaceGuard()
+        self.results: List[Tuple[QueueItem, str, str]] = []
+        self.error = ""
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def _call(self, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, Any]]:
+        request = urllib.request.Request(self.url + path, data=None if body is None else json.dumps(body).encode('utf-8'), method="GET" if body is None else "POST", headers={"Content-Type": "application/json"})
+        if self.token: request.add_header(TOKEN_HEADER, self.token)
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response: return response.status, json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e: return e.code, json.loads(e.read() or b"{}")
+
+    def run(self) -> List[Tuple[QueueItem, str, str]]:
+        threads = [threading.Thread(target=self._slot, name=f"worker-{n}", daemon=True) for n in range(self.slots)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        return self.results
+
+    def _slot(self):
+        failures = 0
+        while not self._done.is_set():
+            try: status, reply = self._call("/lease", {"worker": self.worker_id})
+            except (OSError, ValueError) as e:
+                failures += 1
+                if failures > CONNECT_RETRIES:
+                    self.error = f"coordinator unreachable: {e}"
+                    return
+                self._done.wait(min(30.0, self.poll * 2 ** failures))
+                continue
+            failures = 0
+            if status != 200:
+                self.error = reply.get("error", f"coordinator answered {status}")
+                return
+            if reply.get("job") is not None: self._run_job(reply)
+            elif reply.get("done"): self._done.set()
+            else: self._done.wait(self.poll)
+
+    def _run_job(self, reply: Dict[str, Any]):
+        job, item = reply["job"], QueueItem(**reply["job"]["item"])
+        local = {name: getattr(self.local_settings, name) for name in LOCAL_FIELDS}
+        # Each job gets its own runner sized to the slot count, so a shared engine keeps its pool size.
+        settings = DownloadSettings.from_dict({**reply["settings"], **local, "concurrent_downloads": self.slots, "adaptive_concurrency": False})
+        tracker = ProgressTracker()
+        runner = DownloadRunner(settings, self.engine, tracker, postprocess_workers=self.slots, metrics=self.metrics)
+        runner.breaker, runner.space = self.breaker, self.space
+        done, lost = threading.Event(), threading.Event()
+        threading.Thread(target=self._heartbeat, args=(item.key, runner, tracker, float(reply["lease_seconds"]), done, lost), daemon=True).start()
+        try: results = runner.run([item], self.save_path, first_index=job["idx"])
+        except Exception as e: results = [(item, "error", f"Worker error: {e}")]
+        finally: done.set()
+        _, level, message = results[0]
+        # A job stopped because its lease was lost belongs to whichever worker holds it now, so no
+        # result is posted for it.
+        if lost.is_set() and level == CANCELLED: message = f"Lease lost on '{item.title[:20]}...'; the coordinator handed it to another worker."
+        else:
+            for attempt in range(CONNECT_RETRIES):
+                try:
+                    self._call("/result", {"worker": self.worker_id, "key": job["key"], "level": level, "message": message, "output_path": item.output_path})
+                    break
+                except (OSError, ValueError): time.sleep(min(30.0, self.poll * 2 ** attempt))
+        with self._lock: self.results.append((item, level, message))
+        if self.on_result: self.on_result(item, level, message)
+
+    def _heartbeat(self, key: str, runner: DownloadRunner, tracker: ProgressTracker, lease_seconds: float, done: threading.Event, lost: threading.Event):
+        # Any answer but 200 means the lease is gone (expired and possibly re-leased), so the job is
+        # stopped instead of finishing work another worker is now doing.
+        while not done.wait(lease_seconds / 3):
+            state = tracker.state(key) or {}
+            try: status, _ = self._call("/heartbeat", {"worker": self.worker_id, "key": key, "fraction": state.get('fraction'), "speed": state.get('speed'), "eta": state.get('eta')})
+            except (OSError, ValueError): continue
+            if status != 200:
+                lost.set()
+                runner.cancel(key)
+                return
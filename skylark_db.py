@@ -0,0 +1,19 @@
+import contextlib, sqlite3
+
+def connect(path: str) -> sqlite3.Connection:
+    # The setup every store shares: one connection used from several threads (each store serialises
+    # access with its own lock), autocommit outside explicit transactions, and WAL so a reader never
+    # waits on the writer.
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+@contextlib.contextmanager
+def transaction(conn: sqlite3.Connection):
+    conn.execute("BEGIN")
+    try: yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
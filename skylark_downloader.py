@@ -1,10 +1,25 @@
+import sys, time
+STARTED = time.perf_counter()
+if __name__ == "__main__" and "--headless" in sys.argv:
+    import skylark_cli
+    sys.argv.remove("--headless")
+    sys.exit(skylark_cli.main())
 import customtkinter as ctk
 from customtkinter import filedialog, CTkImage
-import threading, tkinter as tk, subprocess, json, os, concurrent.futures, shutil, sys, re, webbrowser
-from typing import List, Dict, Any
-from PIL import Image
-import requests
-from io import BytesIO
+import threading, tkinter as tk, subprocess, json, os, re, webbrowser, multiprocessing
+from collections import deque
+from typing import List, Dict, Any, Tuple, Optional
+import skylark_engine
+from skylark_engine import YtDlpEngine, DetailFetcher, ProgressTracker, DownloadSettings, FORMAT_OPTIONS, QUALITY_MAP, AUDIO_MODES
+from skylark_pipeline import DownloadRunner
+from skylark_queue import QueueItem, DownloadQueue, canonical_video_id, canonical_video_url
+from skylark_cache import MetadataCache
+from skylark_events import EventBus, DrainTimer
+from skylark_journal import JobJournal
+from skylark_metrics import Metrics
+from skylark_subscriptions import SubscriptionStore, sync_all
+from skylark_thumbnails import ThumbnailLoader
+IMPORTED = time.perf_counter()
 
 class AppConfig:
     NAME, VERSION = "Skylark Downloader", "6.2"
@@ -13,8 +28,26 @@ class AppConfig:
     COLOR_MAP = {"red": "#E74C3C", "green": "#2ECC71", "yellow": "#F1C40F", "white": "white", "disabled": "gray50"}
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
     SETTINGS_FILE = os.path.join(SCRIPT_DIR, "settings.json")
+    DEPENDENCY_CACHE_FILE = os.path.join(SCRIPT_DIR, "dependency_cache.json")
+    METADATA_CACHE_FILE = os.path.join(SCRIPT_DIR, "metadata_cache.sqlite3")
+    JOURNAL_FILE = os.path.join(SCRIPT_DIR, "job_journal.sqlite3")
+    SUBSCRIPTIONS_FILE = os.path.join(SCRIPT_DIR, "subscriptions.sqlite3")
+    DOWNLOAD_ARCHIVE_FILE = os.path.join(SCRIPT_DIR, "download_archive.txt")
+    LIBRARY_INDEX_FILE = os.path.join(SCRIPT_DIR, "library_index.sqlite3")
+    THUMBNAIL_CACHE_DIR = os.path.join(SCRIPT_DIR, "thumbnail_cache")
+    TRACE_FILE, METRICS_FILE = os.path.join(SCRIPT_DIR, "logs", "trace.jsonl"), os.path.join(SCRIPT_DIR, "logs", "metrics.prom")
+    METRICS_SNAPSHOT_MS, STATS_REFRESH_MS = 15000, 1000
+    THUMBNAIL_SIZE, THUMBNAIL_WORKERS = (120, 68), 4
+    INGEST_BATCH, INGEST_CHUNK, INGEST_FLUSH_INTERVAL = 50, 100, 0.25
+    PROGRESS_REFRESH_MS, EVENT_DRAIN_MS = 200, 50
+    METADATA_TTL, METADATA_MAX_ENTRIES, REVALIDATE_PRIORITY = 7 * 24 * 3600, 50_000, 1_000_000
     LANGUAGE_OPTIONS = ["English (en)", "Spanish (es)", "French (fr)", "German (de)", "Japanese (ja)", "Korean (ko)", "Chinese (zh)", "Russian (ru)", "Portuguese (pt)", "Italian (it)", "Arabic (ar)", "Hindi (hi)"]
-    QUALITY_MAP = {"Highest": ("bestvideo", "bestaudio"), "1080p": ("bestvideo[height<=1080]", "bestaudio"), "720p": ("bestvideo[height<=720]", "bestaudio"), "480p": ("bestvideo[height<=480]", "bestaudio"), "Lowest": ("worstvideo", "worstaudio")}
+    FORMAT_OPTIONS, QUALITY_MAP, AUDIO_MODES = FORMAT_OPTIONS, QUALITY_MAP, AUDIO_MODES
+    NO_DEFAULT_FOLDER = "No default folder selected."
+    NO_STAGING_FOLDER = "Off - working files go to the save folder."
+    URL_PATTERN = r'^(https?://)?(www\.)?((music\.)?youtube\.com|youtu\.be)/.+$'
+    SYNC_SESSION, SYNC_WORKERS = "subscriptions", 4
+    DEFAULT_SETTINGS = {**DownloadSettings().to_dict(), "default_save_path": NO_DEFAULT_FOLDER, "use_download_archive": True, "use_library_index": True}
 
 class FFmpegMissingDialog(ctk.CTkToplevel):
     def __init__(self, parent):
@@ -36,6 +69,36 @@ class FFmpegMissingDialog(ctk.CTkToplevel):
     def open_ffmpeg_link(self): webbrowser.open("https://ffmpeg.org/download.html")
     def close_app(self): self.parent.destroy()
 
+class StatsWindow(ctk.CTkToplevel):
+    def __init__(self, parent: "App"):
+        super().__init__(parent)
+        self.parent = parent
+        self.transient(parent)
+        self.title("Pipeline Stats")
+        self.geometry("640x320")
+        self.configure(fg_color="#1E1E1E")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.textbox = ctk.CTkTextbox(self, font=ctk.CTkFont(family="monospace", size=12), wrap="none")
+        self.textbox.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        self.refresh()
+    def refresh(self):
+        if not self.winfo_exists(): return
+        lines = [f"{'Stage':<14}{'Count':>7}{'Errors':>8}{'p50':>10}{'p95':>10}{'Wait p95':>10}{'Bytes':>12}"]
+        for stage, stats in self.parent.metrics.summary().items():
+            fmt = lambda value: f"{value * 1000:.0f} ms" if value is not None else "-"
+            lines.append(f"{stage:<14}{stats['count']:>7}{stats['errors']:>8}{fmt(stats['p50']):>10}{fmt(stats['p95']):>10}{fmt(stats['wait_p95']):>10}{stats['bytes'] / 1e6:>10.1f}MB")
+        lines.append("")
+        lines.append(f"Throughput: {self.parent._format_speed(self.parent.metrics.throughput())} (last {self.parent.metrics.throughput_window:.0f}s) · live {self.parent._format_speed(self.parent.progress_tracker.bandwidth())}")
+        lateness, bus = self.parent.drain_timer.lateness(), self.parent.events
+        fmt = lambda value: f"{value * 1000:.0f} ms" if value is not None else "-"
+        lines.append(f"UI loop lateness: p50 {fmt(lateness['p50'])} · max {fmt(lateness['max'])} · {bus.pending_count()} pending / {bus.coalesced} coalesced events")
+        self.textbox.configure(state="normal")
+        self.textbox.delete("1.0", "end")
+        self.textbox.insert("1.0", "\n".join(lines))
+        self.textbox.configure(state="disabled")
+        self.after(AppConfig.STATS_REFRESH_MS, self.refresh)
+
 class ConfirmationDialog(ctk.CTkToplevel):
     def __init__(self, parent, title: str, message: str):
         super().__init__(parent)
@@ -80,14 +143,164 @@ class Tooltip:
         if self.tooltip_window: self.tooltip_window.destroy()
         self.tooltip_window = None
 
+class IngestSession:
+    __slots__ = ('url', 'cancel_event', 'pending', 'started', 'first_item_at', 'seen', 'added', 'skipped', 'cached', 'pending_details', 'error', 'enumeration_done', 'draining')
+    def __init__(self, url: str):
+        self.url, self.cancel_event, self.pending = url, threading.Event(), deque()
+        self.started, self.first_item_at = time.perf_counter(), None
+        self.seen = self.added = self.skipped = self.cached = self.pending_details = 0
+        self.error, self.enumeration_done, self.draining = "", False, False
+
+class QueueView(ctk.CTkFrame):
+    # Virtualized list: a fixed pool of row widgets is rebound to the window of `items` starting at
+    # `first_index`, so adding, removing or scrolling costs O(visible rows) whatever the queue length.
+    ROW_HEIGHT, ROW_GAP, TITLE_CHARS = 88, 5, 70
+    def __init__(self, master, app: "App", **kwargs):
+        super().__init__(master, **kwargs)
+        self.app, self.first_index, self.rows, self._refresh_pending = app, 0, [], False
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.grid(row=0, column=0, sticky="nsew", padx=(5, 0), pady=5)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns", padx=(2, 3), pady=5)
+        self.viewport.bind("<Configure>", lambda e: self.request_refresh())
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"): self.bind_all(sequence, self._on_mousewheel, add="+")
+
+    @property
+    def items(self) -> DownloadQueue: return self.app.download_queue
+
+    def _page_size(self) -> int:
+        return max(1, int(self.viewport.winfo_height() // self._apply_widget_scaling(self.ROW_HEIGHT + self.ROW_GAP)))
+
+    def visible_items(self) -> List[QueueItem]:
+        return self.items.window(self.first_index, self._page_size() + 1)
+
+    def request_refresh(self):
+        if self._refresh_pending: return
+        self._refresh_pending = True
+        self.after_idle(self.refresh)
+
+    def refresh(self):
+        self._refresh_pending = False
+        total, page = len(self.items), self._page_size()
+        self.first_index = max(0, min(self.first_index, total - page))
+        while len(self.rows) < page + 1: self.rows.append(self._create_row())
+        visible = self.items.window(self.first_index, page + 1)
+        for slot, row in enumerate(self.rows):
+            if slot < len(visible):
+                row.place(x=0, y=slot * (self.ROW_HEIGHT + self.ROW_GAP), relwidth=1)
+                self._render_row(row, visible[slot])
+            else:
+                row.place_forget()
+                row.item = None
+        self.scrollbar.set(self.first_index / total, min(1.0, (self.first_index + page) / total)) if total else self.scrollbar.set(0, 1)
+
+    def refresh_item(self, item: QueueItem):
+        for row in self.rows:
+            if row.item is item: self._render_row(row, item)
+
+    def scroll_to(self, index: int):
+        self.first_index = index
+        self.request_refresh()
+
+    def _on_scrollbar(self, action: str, value, unit: str = "units"):
+        if action == "moveto": self.scroll_to(round(float(value) * len(self.items)))
+        else: self.scroll_to(self.first_index + int(value) * (self._page_size() if unit == "pages" else 1))
+
+    def _on_mousewheel(self, event):
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if widget is None or not str(widget).startswith(str(self)): return
+        if event.num in (4, 5): step = -1 if event.num == 4 else 1
+        else: step = -int(event.delta / 120) or (-1 if event.delta > 0 else 1)
+        self.scroll_to(self.first_index + step)
+
+    def _create_row(self) -> ctk.CTkFrame:
+        row = ctk.CTkFrame(self.viewport, corner_radius=8, fg_color="#333333", height=self.ROW_HEIGHT)
+        row.grid_columnconfigure(1, weight=1)
+        row.item, row.thumbnail_url = None, None
+        row.thumbnail_label = ctk.CTkLabel(row, text="Loading...", width=120, height=68, fg_color="#2b2b2b", corner_radius=6)
+        row.thumbnail_label.grid(row=0, column=0, rowspan=2, padx=10, pady=10)
+        details_frame = ctk.CTkFrame(row, fg_color="transparent")
+        details_frame.grid(row=0, column=1, padx=(0, 10), pady=(10, 5), sticky="new")
+        details_frame.grid_columnconfigure(0, weight=1)
+        row.title_label = ctk.CTkLabel(details_frame, text="", justify="left", anchor="w", font=ctk.CTkFont(size=14, weight="bold"))
+        row.title_label.grid(row=0, column=0, sticky="ew")
+        row.uploader_label = ctk.CTkLabel(details_frame, text="", justify="left", anchor="w", font=ctk.CTkFont(size=12), text_color="gray")
+        row.uploader_label.grid(row=1, column=0, sticky="w", pady=(2, 0))
+        info_frame = ctk.CTkFrame(row, fg_color="transparent")
+        info_frame.grid(row=1, column=1, padx=(0, 10), pady=(0, 10), sticky="sew")
+        row.duration_label = ctk.CTkLabel(info_frame, text="", font=ctk.CTkFont(size=12))
+        row.duration_label.pack(side="left", anchor="w")
+        row.views_label = ctk.CTkLabel(info_frame, text="", font=ctk.CTkFont(size=12))
+        row.views_label.pack(side="left", padx=(10, 0), anchor="w")
+        row.sub_indicator = ctk.CTkLabel(info_frame, text="S", font=ctk.CTkFont(size=11, weight="bold"), text_color="white", fg_color="#555555", corner_radius=5, width=20, height=20)
+        row.sub_tooltip = Tooltip(row.sub_indicator, "")
+        row.progress_label = ctk.CTkLabel(info_frame, text="", font=ctk.CTkFont(size=12), text_color=AppConfig.COLOR_MAP["yellow"])
+        row.progress_label.pack(side="right", anchor="e")
+        controls = ctk.CTkFrame(row, fg_color="transparent")
+        controls.grid(row=0, column=2, rowspan=2, padx=10, pady=10)
+        for text, tip, command in (("⤒", "Run next", lambda r=row: r.item is not None and self.app._run_queue_item_next(r.item)), ("▲", "Move up", lambda r=row: r.item is not None and self.app._move_queue_item(r.item, -1)), ("▼", "Move down", lambda r=row: r.item is not None and self.app._move_queue_item(r.item, 1))):
+            button = ctk.CTkButton(controls, text=text, font=ctk.CTkFont(size=14), width=30, height=30, fg_color="#585858", hover_color="#686868", command=command)
+            button.pack(side="left", padx=(0, 4))
+            Tooltip(button, tip)
+        row.pause_button = ctk.CTkButton(controls, text="⏸", font=ctk.CTkFont(size=14), width=30, height=30, fg_color="#585858", hover_color="#686868", command=lambda r=row: r.item is not None and self.app._toggle_pause_item(r.item))
+        row.pause_button.pack(side="left", padx=(0, 4))
+        ctk.CTkButton(controls, text="✕", font=ctk.CTkFont(size=16), width=30, height=30, fg_color="#C0392B", hover_color="#E74C3C", command=lambda r=row: r.item is not None and self.app._remove_queue_item(r.item)).pack(side="left")
+        return row
+
+    def _render_row(self, row: ctk.CTkFrame, item: QueueItem):
+        row.item = item
+        title = item.title
+        row.title_label.configure(text=title if len(title) <= self.TITLE_CHARS else title[:self.TITLE_CHARS - 3] + "...")
+        if item.needs_details:
+            row.uploader_label.configure(text="Fetching details...")
+            row.duration_label.configure(text="🕒 --:--")
+            row.views_label.configure(text="👁️ --")
+        else:
+            row.uploader_label.configure(text=item.uploader)
+            row.duration_label.configure(text=f"🕒 {self.app._format_duration(item.duration)}")
+            row.views_label.configure(text=f"👁️ {self.app._format_views(item.view_count)}")
+        if subtitles := item.subtitles:
+            row.sub_tooltip.text = "Available Subtitles:\n" + "\n".join(subtitles)
+            row.sub_indicator.pack(side="left", padx=(10, 0), anchor="w")
+        else: row.sub_indicator.pack_forget()
+        row.progress_label.configure(text=self.app._format_progress(item), text_color=AppConfig.COLOR_MAP["red" if item.error else "yellow"])
+        row.pause_button.configure(text="▶" if item.paused else "⏸")
+        url = item.thumbnail_url
+        if url == row.thumbnail_url: return
+        row.thumbnail_url = url
+        if url: self.app._load_thumbnail(row, url)
+        else: row.thumbnail_label.configure(text="Loading..." if item.needs_details else "No Thumbnail", image=None)
+
 class App(ctk.CTk):
     def __init__(self):
         super().__init__()
         self.withdraw()
-        self.download_queue: List[Dict[str, Any]] = []
+        self.progress_tracker = ProgressTracker()
+        self.download_queue = DownloadQueue()
+        self.ingest_session: Optional[IngestSession] = None
         self.is_downloading, self.settings_visible = False, False
         self.last_save_path = ""
-        self.default_save_path = tk.StringVar(value="No default folder selected.")
+        self.download_runner: Optional[DownloadRunner] = None
+        self.default_save_path = tk.StringVar(value=AppConfig.NO_DEFAULT_FOLDER)
+        self.settings_values: Dict[str, Any] = dict(AppConfig.DEFAULT_SETTINGS)
+        self.settings_frame: Optional[ctk.CTkFrame] = None
+        self.dependencies: Optional[Dict[str, Any]] = None
+        self.ffmpeg_dialog: Optional[FFmpegMissingDialog] = None
+        self.time_to_interactive: Optional[float] = None
+        self.engine = YtDlpEngine()
+        self.active_engine: Optional[YtDlpEngine] = None
+        self.events, self.drain_timer = EventBus(), DrainTimer()
+        self.metrics = Metrics(AppConfig.TRACE_FILE)
+        self.detail_fetcher = DetailFetcher(lambda urls: skylark_engine.fetch_details_batch(urls, self.active_engine), metrics=self.metrics)
+        self.journal = JobJournal(AppConfig.JOURNAL_FILE)
+        self.subscriptions = SubscriptionStore(AppConfig.SUBSCRIPTIONS_FILE)
+        self.stats_window: Optional[StatsWindow] = None
+        self.metadata_cache = MetadataCache(AppConfig.METADATA_CACHE_FILE, ttl=AppConfig.METADATA_TTL, max_entries=AppConfig.METADATA_MAX_ENTRIES)
+        width, height = AppConfig.THUMBNAIL_SIZE
+        self.thumbnail_loader = ThumbnailLoader(AppConfig.THUMBNAIL_CACHE_DIR, size=(width * 2, height * 2), max_workers=AppConfig.THUMBNAIL_WORKERS, wrap=lambda image: CTkImage(image, size=AppConfig.THUMBNAIL_SIZE), metrics=self.metrics)
+        self.detail_poll_active = False
         self.title(f"{AppConfig.NAME} v{AppConfig.VERSION}")
         self.geometry(f"{AppConfig.WIDTH}x{AppConfig.MIN_HEIGHT}")
         self.minsize(AppConfig.WIDTH, AppConfig.MIN_HEIGHT)
@@ -99,11 +312,18 @@ class App(ctk.CTk):
         self._create_header_widgets()
         self._create_url_entry_widgets()
         self._create_queue_widgets()
-        self._create_settings_panel()
         self._create_format_quality_widgets()
         self._create_controls_widgets()
         self.load_settings()
-        self.after(100, self._check_dependencies)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        # The settings panel is built on first open; dependencies come from the cached probe and are
+        # re-checked off the Tk thread, so the window is shown right away.
+        self._check_dependencies()
+        self.deiconify()
+        self.after_idle(self._mark_interactive)
+        self.after(150, self._restore_journal)
+        self.after(AppConfig.METRICS_SNAPSHOT_MS, self._write_metrics_snapshot)
+        self.after(AppConfig.EVENT_DRAIN_MS, self._drain_events)
 
     def _create_header_widgets(self):
         header_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -132,15 +352,15 @@ class App(ctk.CTk):
         queue_header_frame.grid_columnconfigure(0, weight=1)
         ctk.CTkLabel(queue_header_frame, text="Download Queue", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, sticky="w")
         ctk.CTkButton(queue_header_frame, text="Clear All", command=self.confirm_clear_queue, fg_color="#585858", hover_color="#686868").grid(row=0, column=1, sticky="e")
-        self.queue_frame = ctk.CTkScrollableFrame(queue_container, corner_radius=10, fg_color="#1E1E1E")
-        self.queue_frame.grid(row=1, column=0, columnspan=2, sticky="nsew", pady=(5, 0))
+        self.queue_view = QueueView(queue_container, self, corner_radius=10, fg_color="#1E1E1E")
+        self.queue_view.grid(row=1, column=0, columnspan=2, sticky="nsew", pady=(5, 0))
 
     def _create_format_quality_widgets(self):
         frame = ctk.CTkFrame(self, fg_color="transparent")
         frame.grid(row=3, column=0, padx=20, pady=0, sticky="ew")
         frame.grid_columnconfigure((0, 2), weight=1)
         ctk.CTkLabel(frame, text="Format:", font=ctk.CTkFont(size=14)).grid(row=0, column=0, sticky="e", padx=(0, 10))
-        self.format_selector = ctk.CTkOptionMenu(frame, values=["MP4 - Video", "MP3 - Audio Only"], font=ctk.CTkFont(size=14), dropdown_font=ctk.CTkFont(size=14), corner_radius=8, command=self.toggle_quality_selector)
+        self.format_selector = ctk.CTkOptionMenu(frame, values=AppConfig.FORMAT_OPTIONS, font=ctk.CTkFont(size=14), dropdown_font=ctk.CTkFont(size=14), corner_radius=8, command=self.toggle_quality_selector)
         self.format_selector.grid(row=0, column=1, sticky="w")
         self.quality_label = ctk.CTkLabel(frame, text="Quality:", font=ctk.CTkFont(size=14))
         self.quality_label.grid(row=0, column=2, sticky="e", padx=(20, 10))
@@ -181,6 +401,27 @@ class App(ctk.CTk):
         ctk.CTkEntry(left, textvariable=self.default_save_path, font=ctk.CTkFont(size=12), corner_radius=8, state=AppConfig.STATE_READONLY).grid(row=6, column=0, columnspan=2, padx=padx, pady=(0, pady[1]), sticky="ew")
         self.use_default_path_switch = ctk.CTkSwitch(left, text="Always save to default (no prompt)", font=ctk.CTkFont(size=12))
         self.use_default_path_switch.grid(row=7, column=0, columnspan=2, padx=padx, pady=pady, sticky="w")
+        self.archive_switch = ctk.CTkSwitch(left, text="Skip already downloaded videos", font=ctk.CTkFont(size=12))
+        self.archive_switch.grid(row=8, column=0, columnspan=2, padx=padx, pady=pady, sticky="w")
+        self.archive_switch.select()
+        self.library_switch = ctk.CTkSwitch(left, text="Reuse files already in the library", font=ctk.CTkFont(size=12))
+        self.library_switch.grid(row=9, column=0, columnspan=2, padx=padx, pady=pady, sticky="w")
+        self.library_switch.select()
+        ctk.CTkLabel(left, text="Engine", font=ctk.CTkFont(size=14, weight="bold")).grid(row=10, column=0, columnspan=2, pady=(15, 10), sticky="w")
+        self.engine_switch = ctk.CTkSwitch(left, text="In-process yt-dlp engine (faster)", font=ctk.CTkFont(size=12), state=AppConfig.STATE_NORMAL if YtDlpEngine.is_available() else AppConfig.STATE_DISABLED, command=self._sync_engine_choice)
+        self.engine_switch.grid(row=11, column=0, columnspan=2, padx=padx, pady=pady, sticky="w")
+        if YtDlpEngine.is_available(): self.engine_switch.select()
+        ctk.CTkLabel(left, text="Detail Lookups:", font=ctk.CTkFont(size=12)).grid(row=12, column=0, padx=padx, pady=pady, sticky="w")
+        self.detail_workers_selector = ctk.CTkOptionMenu(left, values=[str(i) for i in range(1, 9)], font=ctk.CTkFont(size=12), dropdown_font=ctk.CTkFont(size=12), corner_radius=8, width=80, command=lambda v: self.detail_fetcher.configure(int(v)))
+        self.detail_workers_selector.grid(row=12, column=1, padx=padx, pady=pady, sticky="e")
+        self.detail_workers_selector.set(str(self.detail_fetcher.max_workers))
+        self.cache_stats_label = ctk.CTkLabel(left, text="", font=ctk.CTkFont(size=10, slant="italic"), anchor="w")
+        self.cache_stats_label.grid(row=13, column=0, columnspan=2, padx=padx, pady=(0, pady[1]), sticky="w")
+        ctk.CTkLabel(left, text="Subscriptions", font=ctk.CTkFont(size=14, weight="bold")).grid(row=14, column=0, columnspan=2, pady=(15, 10), sticky="w")
+        ctk.CTkButton(left, text="Subscribe to URL", command=self.subscribe_current_url, font=ctk.CTkFont(size=12)).grid(row=15, column=0, padx=padx, pady=pady, sticky="ew")
+        ctk.CTkButton(left, text="Sync All", command=self.sync_subscriptions, font=ctk.CTkFont(size=12)).grid(row=15, column=1, padx=padx, pady=pady, sticky="ew")
+        self.subscriptions_label = ctk.CTkLabel(left, text="", font=ctk.CTkFont(size=10, slant="italic"), anchor="w")
+        self.subscriptions_label.grid(row=16, column=0, columnspan=2, padx=padx, pady=(0, pady[1]), sticky="w")
         right = ctk.CTkFrame(self.settings_frame, fg_color="transparent")
         right.grid(row=0, column=1, padx=(5, 10), pady=5, sticky="new")
         right.grid_columnconfigure(1, weight=1)
@@ -188,55 +429,82 @@ class App(ctk.CTk):
         ctk.CTkLabel(right, text="Concurrent Jobs:", font=ctk.CTkFont(size=12)).grid(row=1, column=0, padx=padx, pady=pady, sticky="w")
         self.concurrency_selector = ctk.CTkOptionMenu(right, values=[str(i) for i in range(1, 6)], font=ctk.CTkFont(size=12), dropdown_font=ctk.CTkFont(size=12), corner_radius=8, width=80)
         self.concurrency_selector.grid(row=1, column=1, padx=padx, pady=pady, sticky="e")
-        ctk.CTkLabel(right, text="Audio Bitrate (MP3):", font=ctk.CTkFont(size=12)).grid(row=2, column=0, padx=padx, pady=pady, sticky="w")
+        self.adaptive_switch = ctk.CTkSwitch(right, text="Adapt to available bandwidth", font=ctk.CTkFont(size=12))
+        self.adaptive_switch.grid(row=2, column=0, columnspan=2, padx=(padx[0] + 20, padx[1]), pady=pady, sticky="w")
+        self.adaptive_switch.select()
+        self.shortest_first_switch = ctk.CTkSwitch(right, text="Shortest videos first", font=ctk.CTkFont(size=12))
+        self.shortest_first_switch.grid(row=3, column=0, columnspan=2, padx=padx, pady=pady, sticky="w")
+        ctk.CTkLabel(right, text="Audio Bitrate (MP3/Opus encode):", font=ctk.CTkFont(size=12)).grid(row=4, column=0, padx=padx, pady=pady, sticky="w")
         self.bitrate_selector = ctk.CTkOptionMenu(right, values=["128K", "192K", "256K", "320K"], font=ctk.CTkFont(size=12), dropdown_font=ctk.CTkFont(size=12), corner_radius=8, width=80)
-        self.bitrate_selector.grid(row=2, column=1, padx=padx, pady=pady, sticky="e")
+        self.bitrate_selector.grid(row=4, column=1, padx=padx, pady=pady, sticky="e")
         self.metadata_switch = ctk.CTkSwitch(right, text="Embed file metadata", font=ctk.CTkFont(size=12))
-        self.metadata_switch.grid(row=3, column=0, columnspan=2, padx=padx, pady=pady, sticky="w")
-        ctk.CTkLabel(right, text="Note: Recommended to keep on.", font=ctk.CTkFont(size=10, slant="italic")).grid(row=4, column=0, columnspan=2, padx=(padx[0]+20, padx[1]), pady=(0, pady[1]), sticky="w")
-        self.thumbnail_switch = ctk.CTkSwitch(right, text="Embed thumbnail (for MP3)", font=ctk.CTkFont(size=12))
-        self.thumbnail_switch.grid(row=5, column=0, columnspan=2, padx=padx, pady=pady, sticky="w")
-        ctk.CTkLabel(right, text="Subtitles", font=ctk.CTkFont(size=14, weight="bold")).grid(row=6, column=0, columnspan=2, pady=(15, 10), sticky="w")
+        self.metadata_switch.grid(row=5, column=0, columnspan=2, padx=padx, pady=pady, sticky="w")
+        ctk.CTkLabel(right, text="Note: Recommended to keep on.", font=ctk.CTkFont(size=10, slant="italic")).grid(row=6, column=0, columnspan=2, padx=(padx[0]+20, padx[1]), pady=(0, pady[1]), sticky="w")
+        self.thumbnail_switch = ctk.CTkSwitch(right, text="Embed thumbnail (MP3/M4A)", font=ctk.CTkFont(size=12))
+        self.thumbnail_switch.grid(row=7, column=0, columnspan=2, padx=padx, pady=pady, sticky="w")
+        ctk.CTkLabel(right, text="Also Save Audio:", font=ctk.CTkFont(size=12)).grid(row=8, column=0, padx=padx, pady=pady, sticky="w")
+        self.extra_audio_selector = ctk.CTkOptionMenu(right, values=["None", *AppConfig.AUDIO_MODES], font=ctk.CTkFont(size=12), dropdown_font=ctk.CTkFont(size=12), corner_radius=8)
+        self.extra_audio_selector.grid(row=8, column=1, padx=padx, pady=pady, sticky="ew")
+        ctk.CTkLabel(right, text="Subtitles", font=ctk.CTkFont(size=14, weight="bold")).grid(row=9, column=0, columnspan=2, pady=(15, 10), sticky="w")
         self.subtitle_switch = ctk.CTkSwitch(right, text="Download subtitle if available", font=ctk.CTkFont(size=12), command=self._toggle_subtitle_options)
-        self.subtitle_switch.grid(row=7, column=0, columnspan=2, padx=padx, pady=pady, sticky="w")
+        self.subtitle_switch.grid(row=10, column=0, columnspan=2, padx=padx, pady=pady, sticky="w")
         self.subtitle_all_switch = ctk.CTkSwitch(right, text="Download all languages", font=ctk.CTkFont(size=12), command=lambda: self._toggle_lang_selector(self.subtitle_all_switch, self.subtitle_lang_selector, parent_enabled=self.subtitle_switch.get()))
-        self.subtitle_all_switch.grid(row=8, column=0, columnspan=2, padx=(padx[0] + 20, padx[1]), pady=pady, sticky="w")
+        self.subtitle_all_switch.grid(row=11, column=0, columnspan=2, padx=(padx[0] + 20, padx[1]), pady=pady, sticky="w")
         self.srt_caution_label = ctk.CTkLabel(right, text="Note: Embeds best with VLC.", font=ctk.CTkFont(size=10, slant="italic"))
-        self.srt_caution_label.grid(row=9, column=0, columnspan=2, padx=(padx[0] + 20, padx[1]), pady=(0, pady[1]), sticky="w")
-        ctk.CTkLabel(right, text="Language:", font=ctk.CTkFont(size=12)).grid(row=10, column=0, padx=(padx[0] + 20, padx[1]), pady=pady, sticky="w")
+        self.srt_caution_label.grid(row=12, column=0, columnspan=2, padx=(padx[0] + 20, padx[1]), pady=(0, pady[1]), sticky="w")
+        ctk.CTkLabel(right, text="Language:", font=ctk.CTkFont(size=12)).grid(row=13, column=0, padx=(padx[0] + 20, padx[1]), pady=pady, sticky="w")
         self.subtitle_lang_selector = ctk.CTkOptionMenu(right, font=ctk.CTkFont(size=12), corner_radius=8, values=AppConfig.LANGUAGE_OPTIONS, dropdown_font=ctk.CTkFont(size=12))
-        self.subtitle_lang_selector.grid(row=10, column=1, padx=padx, pady=pady, sticky="ew")
+        self.subtitle_lang_selector.grid(row=13, column=1, padx=padx, pady=pady, sticky="ew")
+        self.subtitle_files_switch = ctk.CTkSwitch(right, text="Also save as separate files", font=ctk.CTkFont(size=12))
+        self.subtitle_files_switch.grid(row=14, column=0, columnspan=2, padx=(padx[0] + 20, padx[1]), pady=pady, sticky="w")
+        ctk.CTkLabel(right, text="Staging Folder", font=ctk.CTkFont(size=14, weight="bold")).grid(row=15, column=0, columnspan=2, pady=(15, 10), sticky="w")
+        ctk.CTkButton(right, text="Select Fast Local Folder", command=self.select_staging_path, font=ctk.CTkFont(size=12)).grid(row=16, column=0, padx=padx, pady=pady, sticky="ew")
+        ctk.CTkButton(right, text="Turn Off", command=lambda: self.staging_path.set(AppConfig.NO_STAGING_FOLDER), font=ctk.CTkFont(size=12), fg_color="#585858", hover_color="#686868").grid(row=16, column=1, padx=padx, pady=pady, sticky="ew")
+        self.staging_path = tk.StringVar(value=AppConfig.NO_STAGING_FOLDER)
+        ctk.CTkEntry(right, textvariable=self.staging_path, font=ctk.CTkFont(size=12), corner_radius=8, state=AppConfig.STATE_READONLY).grid(row=17, column=0, columnspan=2, padx=padx, pady=(0, pady[1]), sticky="ew")
         action_frame = ctk.CTkFrame(self.settings_frame, fg_color="transparent")
         action_frame.grid(row=1, column=0, columnspan=2, padx=10, pady=(10, 5), sticky="ew")
         action_frame.grid_columnconfigure(0, weight=1)
         self.update_yt_dlp_button = ctk.CTkButton(action_frame, text="Update Downloader Engine (yt-dlp)", command=self.start_update_thread)
         self.update_yt_dlp_button.grid(row=0, column=0, columnspan=2, padx=padx, pady=(pady[1] * 2, pady[1]), sticky="ew")
-        ctk.CTkButton(action_frame, text="Save Settings", command=self.save_settings).grid(row=1, column=0, columnspan=2, padx=padx, pady=(0, pady[1] + 5), sticky="ew")
+        ctk.CTkButton(action_frame, text="Pipeline Stats", command=self.show_stats, fg_color="#585858", hover_color="#686868").grid(row=1, column=0, columnspan=2, padx=padx, pady=(0, pady[1]), sticky="ew")
+        ctk.CTkButton(action_frame, text="Save Settings", command=self.save_settings).grid(row=2, column=0, columnspan=2, padx=padx, pady=(0, pady[1] + 5), sticky="ew")
+        self._apply_settings_to_panel(self.settings_values)
 
     def toggle_settings(self):
+        if self.settings_frame is None:
+            with self.metrics.span("settings_panel"): self._create_settings_panel()
         if self.settings_visible:
             self.settings_frame.grid_remove()
             self.geometry(f"{AppConfig.WIDTH}x{AppConfig.MIN_HEIGHT}")
         else:
             self.settings_frame.grid(row=4, column=0, padx=20, pady=10, sticky="ew")
+            self._refresh_cache_stats()
+            self._refresh_subscription_stats()
             self.geometry(f"{AppConfig.WIDTH}x{AppConfig.MAX_HEIGHT}")
         self.settings_visible = not self.settings_visible
 
     def toggle_quality_selector(self, choice: str):
         is_video = "Audio" not in choice
         self.quality_selector.configure(state=AppConfig.STATE_NORMAL if is_video else AppConfig.STATE_DISABLED)
+        if self.settings_frame is None: return
         self.subtitle_switch.configure(state=AppConfig.STATE_NORMAL if is_video else AppConfig.STATE_DISABLED)
+        self.extra_audio_selector.configure(state=AppConfig.STATE_NORMAL if is_video else AppConfig.STATE_DISABLED)
         if not is_video: self.subtitle_switch.deselect()
         self._toggle_subtitle_options()
 
     def _toggle_subtitle_options(self):
+        if self.settings_frame is None: return
         is_video = "Audio" not in self.format_selector.get()
         is_enabled = self.subtitle_switch.get() == 1 and is_video
         state = AppConfig.STATE_NORMAL if is_enabled else AppConfig.STATE_DISABLED
         color = AppConfig.COLOR_MAP["white"] if is_enabled else AppConfig.COLOR_MAP["disabled"]
         self.subtitle_all_switch.configure(state=state)
+        self.subtitle_files_switch.configure(state=state)
         self.srt_caution_label.configure(state=state, text_color=color)
-        if not is_enabled: self.subtitle_all_switch.deselect()
+        if not is_enabled:
+            self.subtitle_all_switch.deselect()
+            self.subtitle_files_switch.deselect()
         self._toggle_lang_selector(self.subtitle_all_switch, self.subtitle_lang_selector, parent_enabled=is_enabled)
         
     def _toggle_lang_selector(self, all_switch: ctk.CTkSwitch, lang_selector: ctk.CTkOptionMenu, parent_enabled: bool = True):
@@ -244,205 +512,345 @@ class App(ctk.CTk):
         lang_selector.configure(state=AppConfig.STATE_NORMAL if parent_enabled and not is_all else AppConfig.STATE_DISABLED)
             
     def _check_dependencies(self):
-        if not shutil.which("ffmpeg"):
-            FFmpegMissingDialog(self)
+        try:
+            with open(AppConfig.DEPENDENCY_CACHE_FILE, 'r') as f: cached = json.load(f)
+        except (OSError, ValueError): cached = None
+        if cached: self._apply_dependencies(cached)
+        else: self.update_status("Checking for yt-dlp and ffmpeg...", "yellow")
+        self._revalidate_dependencies()
+
+    def _revalidate_dependencies(self):
+        threading.Thread(target=lambda: self.events.call(self._on_dependencies_probed, skylark_engine.probe_dependencies()), daemon=True).start()
+
+    def _on_dependencies_probed(self, probe: Dict[str, Any]):
+        try:
+            with open(AppConfig.DEPENDENCY_CACHE_FILE, 'w') as f: json.dump(probe, f, indent=4)
+        except OSError as e: print(f"Error caching dependency check: {e}")
+        changed = self.dependencies is None or any(self.dependencies.get(key) != probe.get(key) for key in ("yt_dlp", "ffmpeg", "yt_dlp_version"))
+        if changed: self._apply_dependencies(probe)
+        else: self.dependencies = probe
+
+    def _apply_dependencies(self, probe: Dict[str, Any]):
+        self.dependencies = probe
+        if not probe.get("ffmpeg"):
+            if self.ffmpeg_dialog is None: self.ffmpeg_dialog = FFmpegMissingDialog(self)
             return
-        if not shutil.which("yt-dlp"):
+        # The cached probe said ffmpeg was missing, the fresh one found it.
+        if self.ffmpeg_dialog is not None:
+            self.ffmpeg_dialog.grab_release()
+            self.ffmpeg_dialog.destroy()
+            self.ffmpeg_dialog = None
+        if not probe.get("yt_dlp"):
             self.update_status("Error: yt-dlp not found. Please install it.", "red")
             self.add_button.configure(state=AppConfig.STATE_DISABLED)
-        else: self.update_status("Ready. Paste a URL to begin.", "green")
-        self.deiconify()
+        else:
+            if not self.ingest_session: self.add_button.configure(state=AppConfig.STATE_NORMAL)
+            self.update_status(f"Ready. Paste a URL to begin. (yt-dlp {probe.get('yt_dlp_version') or 'unknown version'})", "green")
+
+    def _mark_interactive(self):
+        # Time from process start until the Tk loop first goes idle with the window mapped.
+        if self.time_to_interactive is not None: return
+        self.time_to_interactive = time.perf_counter() - STARTED
+        self.metrics.record("startup", self.time_to_interactive, {"imports": round(IMPORTED - STARTED, 6), "dependencies_cached": self.dependencies is not None})
 
     def select_default_path(self):
         if path := filedialog.askdirectory():
             self.default_save_path.set(path)
             self.update_status("Default save path selected.", "green")
 
-    def save_settings(self):
-        settings = {
-            "concurrent_downloads": self.concurrency_selector.get(), "prefix_text": self.prefix_entry.get(),
+    def select_staging_path(self):
+        if path := filedialog.askdirectory():
+            self.staging_path.set(path)
+            self.update_status("Staging folder selected.", "green")
+
+    def _settings_dict(self) -> Dict[str, Any]:
+        if self.settings_frame is None: return dict(self.settings_values, format=self.format_selector.get(), quality=self.quality_selector.get(), default_save_path=self.default_save_path.get())
+        return {
+            "format": self.format_selector.get(), "concurrent_downloads": self.concurrency_selector.get(), "prefix_text": self.prefix_entry.get(),
             "add_numbering": self.numbering_switch.get(), "default_save_path": self.default_save_path.get(),
             "use_default_path": self.use_default_path_switch.get(), "create_playlist_folder": self.playlist_folder_switch.get(),
             "audio_bitrate": self.bitrate_selector.get(), "embed_metadata": self.metadata_switch.get(),
             "embed_thumbnail": self.thumbnail_switch.get(), "download_subtitles": self.subtitle_switch.get(),
             "download_all_subtitles": self.subtitle_all_switch.get(), "subtitle_lang": self.subtitle_lang_selector.get(),
-            "quality": self.quality_selector.get()}
+            "quality": self.quality_selector.get(), "inprocess_engine": self.engine_switch.get(), "adaptive_concurrency": self.adaptive_switch.get(), "shortest_first": self.shortest_first_switch.get(),
+            "detail_fetch_workers": self.detail_workers_selector.get(), "use_download_archive": self.archive_switch.get(),
+            "use_library_index": self.library_switch.get(), "extra_audio": self.extra_audio_selector.get(), "subtitle_files": self.subtitle_files_switch.get(),
+            "staging_dir": "" if self.staging_path.get() == AppConfig.NO_STAGING_FOLDER else self.staging_path.get()}
+
+    def _settings_snapshot(self) -> DownloadSettings:
+        settings = self._settings_dict()
+        return DownloadSettings.from_dict({**settings, "download_archive": AppConfig.DOWNLOAD_ARCHIVE_FILE if settings["use_download_archive"] else "",
+                                           "library_index": AppConfig.LIBRARY_INDEX_FILE if settings["use_library_index"] else ""})
+
+    def save_settings(self):
+        settings = self._settings_dict()
+        self.settings_values.update(settings)
         try:
             with open(AppConfig.SETTINGS_FILE, 'w') as f: json.dump(settings, f, indent=4)
             self.update_status("Settings saved successfully!", "green")
         except IOError as e: self.update_status(f"Error saving settings: {e}", "red")
 
     def load_settings(self):
+        # Settings live in `settings_values` until the panel exists; only the main window's widgets are set here.
         try:
-            if not os.path.exists(AppConfig.SETTINGS_FILE): return
-            with open(AppConfig.SETTINGS_FILE, 'r') as f: settings = json.load(f)
-            def apply_setting(widget, key, default):
-                value = settings.get(key, default)
-                if isinstance(widget, (ctk.CTkOptionMenu, tk.StringVar)): widget.set(value)
-                elif isinstance(widget, ctk.CTkEntry):
-                    widget.delete(0, 'end')
-                    widget.insert(0, value)
-                elif isinstance(widget, ctk.CTkSwitch):
-                    if value: widget.select()
-                    else: widget.deselect()
-            apply_setting(self.concurrency_selector, "concurrent_downloads", "3")
-            apply_setting(self.prefix_entry, "prefix_text", "Skylark")
-            apply_setting(self.numbering_switch, "add_numbering", False)
-            apply_setting(self.default_save_path, "default_save_path", "No default folder selected.")
-            apply_setting(self.use_default_path_switch, "use_default_path", False)
-            apply_setting(self.playlist_folder_switch, "create_playlist_folder", True)
-            apply_setting(self.bitrate_selector, "audio_bitrate", "192K")
-            apply_setting(self.metadata_switch, "embed_metadata", True)
-            apply_setting(self.thumbnail_switch, "embed_thumbnail", True)
-            apply_setting(self.subtitle_switch, "download_subtitles", False)
-            apply_setting(self.subtitle_all_switch, "download_all_subtitles", False)
-            apply_setting(self.subtitle_lang_selector, "subtitle_lang", "English (en)")
-            apply_setting(self.quality_selector, "quality", "1080p")
+            if os.path.exists(AppConfig.SETTINGS_FILE):
+                with open(AppConfig.SETTINGS_FILE, 'r') as f: self.settings_values.update(json.load(f))
+            for name in ("format", "extra_audio"): self.settings_values[name] = skylark_engine.RENAMED_FORMATS.get(self.settings_values[name], self.settings_values[name])
         except (json.JSONDecodeError, KeyError): self.update_status("Settings file corrupted, using defaults.", "yellow")
         except Exception as e: self.update_status(f"Error loading settings: {e}", "red")
+        self.format_selector.set(self.settings_values["format"])
+        self.quality_selector.set(self.settings_values["quality"])
+        self.default_save_path.set(self.settings_values["default_save_path"] or AppConfig.NO_DEFAULT_FOLDER)
+        try: self.detail_fetcher.configure(int(self.settings_values["detail_fetch_workers"]))
+        except (TypeError, ValueError): pass
+        self.toggle_quality_selector(self.format_selector.get())
+        self._sync_engine_choice()
+
+    def _apply_settings_to_panel(self, settings: Dict[str, Any]):
+        def apply_setting(widget, key):
+            value = settings[key]
+            if isinstance(widget, ctk.CTkOptionMenu): widget.set(str(value))
+            elif isinstance(widget, ctk.CTkEntry):
+                widget.delete(0, 'end')
+                widget.insert(0, value)
+            elif isinstance(widget, ctk.CTkSwitch):
+                if value: widget.select()
+                else: widget.deselect()
+        for widget, key in ((self.concurrency_selector, "concurrent_downloads"), (self.prefix_entry, "prefix_text"), (self.numbering_switch, "add_numbering"),
+                            (self.use_default_path_switch, "use_default_path"), (self.playlist_folder_switch, "create_playlist_folder"), (self.bitrate_selector, "audio_bitrate"),
+                            (self.metadata_switch, "embed_metadata"), (self.thumbnail_switch, "embed_thumbnail"), (self.subtitle_switch, "download_subtitles"),
+                            (self.subtitle_all_switch, "download_all_subtitles"), (self.subtitle_lang_selector, "subtitle_lang"), (self.engine_switch, "inprocess_engine"),
+                            (self.adaptive_switch, "adaptive_concurrency"), (self.shortest_first_switch, "shortest_first"), (self.detail_workers_selector, "detail_fetch_workers"), (self.archive_switch, "use_download_archive"),
+                            (self.library_switch, "use_library_index"), (self.extra_audio_selector, "extra_audio"), (self.subtitle_files_switch, "subtitle_files")):
+            apply_setting(widget, key)
+        self.staging_path.set(settings["staging_dir"] or AppConfig.NO_STAGING_FOLDER)
+        if not YtDlpEngine.is_available(): self.engine_switch.deselect()
+        self.toggle_quality_selector(self.format_selector.get())
         self._toggle_subtitle_options()
 
     def add_to_queue(self):
+        if self.ingest_session: return self._cancel_ingest()
         url = self.url_entry.get().strip()
         if not url: return self.update_status("Error: Please enter a URL.", "red")
-        if not re.match(r'^(https?://)?(www\.)?((music\.)?youtube\.com|youtu\.be)/.+$', url):
+        if not re.match(AppConfig.URL_PATTERN, url):
             return self.update_status("Error: Invalid YouTube URL format.", "red")
         if self.add_button.cget('state') == AppConfig.STATE_DISABLED: return
         self.update_status("Fetching info...", "yellow")
+        self.ingest_session = IngestSession(url)
+        self.add_button.configure(text="Cancel")
+        threading.Thread(target=self._fetch_url_metadata, args=(url, self.ingest_session, self.active_engine), daemon=True).start()
+
+    def _cancel_ingest(self):
+        self.ingest_session.cancel_event.set()
         self.add_button.configure(state=AppConfig.STATE_DISABLED)
-        threading.Thread(target=self._fetch_url_metadata, args=(url,), daemon=True).start()
+        self.update_status("Cancelling...", "yellow")
+
+    def _sync_engine_choice(self):
+        # Mirrors the engine switch into a plain attribute so worker threads never read the widget.
+        enabled = str(self._settings_dict()["inprocess_engine"]).lower() in ("1", "true")
+        self.active_engine = self.engine if enabled and YtDlpEngine.is_available() else None
 
-    def _fetch_url_metadata(self, url: str):
+    def _fetch_url_metadata(self, url: str, session: "IngestSession", engine: Optional[YtDlpEngine]):
+        span = {'url': url, 'items': 0}
+        started = time.perf_counter()
         try:
-            command = ['yt-dlp', '-j', '--flat-playlist', '--ignore-errors', '--no-warnings', url]
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace', creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-            video_entries_to_process = [json.loads(line) for line in iter(process.stdout.readline, '') if line.strip()]
-            self.after(0, self._process_and_add_entries, video_entries_to_process)
-            process.stdout.close()
-            return_code = process.wait()
-            stderr_output = process.stderr.read()
-            process.stderr.close()
-            if return_code != 0 and not video_entries_to_process:
-                last_error = stderr_output.strip().splitlines()[-1] if stderr_output else "Unknown yt-dlp error."
-                self.after(0, self.update_status, f"Error: {last_error}", "red")
-        except FileNotFoundError: self.after(0, self.update_status, "Error: yt-dlp not found.", "red")
-        except Exception as e: self.after(0, self.update_status, f"An unexpected error occurred: {e}", "red")
-        finally: self.after(10, self._update_ui_after_fetch)
-    
-    def _process_and_add_entries(self, entries: List[Dict[str, Any]]):
-        if not entries: return self.update_status("No videos found at the URL.", "yellow")
-        is_playlist = len(entries) > 1 or 'entries' in entries[0]
-        items_added, skipped_count = 0, 0
-        for info in entries:
-            if info.get('title') in ["[Deleted video]", "[Private video]"]:
-                skipped_count += 1
-                continue
-            url = info.get('webpage_url', info.get('url'))
-            if any(item['url'] == url for item in self.download_queue): continue
-            needs_details, thumbnail_url = 'duration' not in info, info.get('thumbnail')
-            if not needs_details and (thumbnails := info.get('thumbnails', [])):
-                best_thumb = next((t['url'] for t in reversed(thumbnails) if t.get('width', 0) and t['width'] <= 480), None)
-                thumbnail_url = best_thumb or thumbnails[-1].get('url')
-            video_entry = {'url': url, 'title': info.get('title', 'Untitled'), 'playlist_title': info.get('playlist_title'), 'uploader': info.get('uploader', 'N/A'), 'subtitles': sorted(list(info.get('subtitles', {}).keys())), 'thumbnail_url': thumbnail_url, 'duration': info.get('duration', 0), 'view_count': info.get('view_count', 0), 'needs_details': needs_details}
-            self.download_queue.append(video_entry)
-            self._add_queue_item_ui(video_entry)
-            items_added += 1
-        if items_added > 0:
-            status_msg = f"Added {items_added} item(s) to the queue."
-            if is_playlist:
-                if any(e.get('needs_details') for e in self.download_queue): status_msg += " Fetching details in background..."
-                if skipped_count > 0: status_msg += f" (Skipped {skipped_count} private/deleted)"
-            self.update_status(status_msg, "green")
-            self.url_entry.delete(0, 'end')
+            video_id = canonical_video_id(url)
+            if video_id and 'list=' not in url and video_id in self.metadata_cache:
+                # Known single video: skip enumeration, _process_and_add_entries fills it from the cache.
+                span.update(items=1, cached=True)
+                return self.events.call(self._queue_entries, session, [{'id': video_id, 'webpage_url': canonical_video_url(video_id)}])
+            for entries, stderr_output in skylark_engine.extract_stream(url, session.cancel_event, engine, AppConfig.INGEST_BATCH, AppConfig.INGEST_FLUSH_INTERVAL):
+                if entries:
+                    if not span['items']: span['first_batch_seconds'] = round(time.perf_counter() - started, 6)
+                    span['items'] += len(entries)
+                    self.events.call(self._queue_entries, session, entries)
+                if stderr_output.strip(): session.error = f"Error: {stderr_output.strip().splitlines()[-1]}"
+        except FileNotFoundError: session.error = "Error: yt-dlp not found."
+        except Exception as e: session.error = f"An unexpected error occurred: {e}"
+        finally:
+            if session.error: span['error'] = session.error
+            self.metrics.record("enumerate", time.perf_counter() - started, dict(span, cancelled=session.cancel_event.is_set()))
+            self.events.call(self._queue_entries, session, None)
+
+    def _queue_entries(self, session: "IngestSession", entries: Optional[List[Dict[str, Any]]]):
+        if entries is None: session.enumeration_done = True
+        else:
+            session.pending.extend(entries)
+            session.seen += len(entries)
+        if not session.draining:
+            session.draining = True
+            self._drain_ingest(session)
+
+    def _drain_ingest(self, session: "IngestSession"):
+        # Builds queue items a chunk at a time so the Tk loop keeps handling events during big ingests.
+        chunk = [session.pending.popleft() for _ in range(min(AppConfig.INGEST_CHUNK, len(session.pending)))]
+        if chunk: self._process_and_add_entries(chunk, session)
+        if session.pending: return self.after(1, self._drain_ingest, session)
+        session.draining = False
+        if session.enumeration_done: self._finish_ingest(session)
+        elif session.added: self.update_status(f"Fetching... {session.added} item(s) added so far (first after {session.first_item_at - session.started:.2f}s)", "yellow")
+
+    def _finish_ingest(self, session: "IngestSession"):
+        if self.ingest_session is session: self.ingest_session = None
+        self.add_button.configure(text="Add to Queue")
+        self._update_ui_after_fetch()
+        first_item = f" First item after {session.first_item_at - session.started:.2f}s." if session.first_item_at else ""
+        if session.cancel_event.is_set(): self.update_status(f"Fetch cancelled. Added {session.added} item(s) to the queue.{first_item}", "yellow")
+        elif session.error and not session.seen: self.update_status(session.error, "red")
+        elif not session.seen: self.update_status("Subscriptions are up to date." if session.url == AppConfig.SYNC_SESSION else "No videos found at the URL.", "yellow")
+        elif session.added > 0:
+            status_msg = f"Added {session.added} item(s) to the queue."
+            if session.cached: status_msg += f" ({session.cached} from cache)"
+            if session.seen > 1:
+                if session.pending_details: status_msg += " Fetching details in background..."
+                if session.skipped > 0: status_msg += f" (Skipped {session.skipped} private/deleted)"
+            self.update_status(status_msg + first_item, "green")
+            if self.url_entry.get().strip() == session.url: self.url_entry.delete(0, 'end')
         else: self.update_status("URL already in queue or no new items found.", "yellow")
+        self._refresh_cache_stats()
+        self._refresh_subscription_stats()
 
-    def _fetch_and_update_details(self, item_data: Dict[str, Any], item_frame: ctk.CTkFrame):
+    def subscribe_current_url(self):
+        url = self.url_entry.get().strip()
+        if not re.match(AppConfig.URL_PATTERN, url) or not ('list=' in url or re.search(r'youtube\.com/(@|channel/|c/|user/)', url)):
+            return self.update_status("Error: Enter a playlist or channel URL to subscribe.", "red")
+        if self.subscriptions.add(url): self.update_status("Subscribed. Use Sync All to queue its videos.", "green")
+        else: self.update_status("Already subscribed to this URL.", "yellow")
+        self._refresh_subscription_stats()
+
+    def sync_subscriptions(self):
+        # Runs as an ingest session, so the new entries take the usual path into the queue and Cancel stops the sync.
+        if self.ingest_session: return self.update_status("Wait for the current fetch to finish.", "yellow")
+        if not self.subscriptions.all(): return self.update_status("No subscriptions yet. Enter a playlist or channel URL and subscribe.", "yellow")
+        self.update_status("Syncing subscriptions...", "yellow")
+        self.ingest_session = session = IngestSession(AppConfig.SYNC_SESSION)
+        self.add_button.configure(text="Cancel")
+        threading.Thread(target=self._run_sync, args=(session, self.active_engine), daemon=True).start()
+
+    def _run_sync(self, session: "IngestSession", engine: Optional[YtDlpEngine]):
+        def on_synced(url: str, entries: List[Dict[str, Any]], error: str):
+            if error: session.error = f"Error syncing {url}: {error}"
+            if entries: self.events.call(self._queue_entries, session, entries)
         try:
-            command = ['yt-dlp', '-j', item_data['url']]
-            process = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace', creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-            if process.returncode != 0:
-                print(f"Failed to fetch details for {item_data['url']}: {process.stderr}")
-                return self.after(0, lambda: item_frame.uploader_label.configure(text="Error fetching details."))
-            info = json.loads(process.stdout)
-            thumbnail_url = info.get('thumbnail')
-            if thumbnails := info.get('thumbnails', []):
-                best_thumb = next((t['url'] for t in reversed(thumbnails) if t.get('width', 0) and t['width'] <= 480), None)
-                thumbnail_url = best_thumb or thumbnails[-1].get('url')
-            item_data.update({'uploader': info.get('uploader', 'N/A'), 'subtitles': sorted(list(info.get('subtitles', {}).keys())), 'thumbnail_url': thumbnail_url, 'duration': info.get('duration', 0), 'view_count': info.get('view_count', 0), 'needs_details': False})
-            self.after(0, self._update_queue_item_ui, item_data, item_frame)
+            with self.metrics.span("sync") as span:
+                results = sync_all(self.subscriptions, session.cancel_event, engine, AppConfig.SYNC_WORKERS, on_synced=on_synced)
+                span.update(subscriptions=len(results), new=sum(len(entries) for entries, _ in results.values()))
+        except Exception as e: session.error = f"An unexpected error occurred: {e}"
+        finally: self.events.call(self._queue_entries, session, None)
+
+    def _refresh_subscription_stats(self):
+        if self.settings_frame is None: return
+        subs = self.subscriptions.all()
+        synced = [sub['last_synced'] for sub in subs if sub['last_synced']]
+        last = f", last sync {time.strftime('%Y-%m-%d %H:%M', time.localtime(max(synced)))}" if synced else ""
+        self.subscriptions_label.configure(text=f"{len(subs)} subscription(s){last}")
+
+    def _process_and_add_entries(self, entries: List[Dict[str, Any]], session: "IngestSession"):
+        with self.metrics.span("queue_add", items=len(entries)) as span: span['added'] = self._add_entries(entries, session)
+
+    def _add_entries(self, entries: List[Dict[str, Any]], session: "IngestSession") -> int:
+        # Entries already queued are dropped before the cache lookup so they do not count as hits.
+        fresh: List[QueueItem] = []
+        for info in entries:
+            if (video_entry := skylark_engine.item_from_entry(info)) is None: session.skipped += 1
+            elif video_entry.key not in self.download_queue: fresh.append(video_entry)
+        cached = self.metadata_cache.get_many([video_entry.video_id for video_entry in fresh if video_entry.needs_details])
+        fetched_details: Dict[str, Dict[str, Any]] = {}
+        added: List[QueueItem] = []
+        for video_entry in fresh:
+            video_id = video_entry.video_id
+            if video_entry.key in self.download_queue: continue
+            if not video_entry.needs_details:
+                if video_id: fetched_details[video_id] = video_entry.details()
+            elif hit := cached.get(video_id):
+                video_entry.update(hit[0], needs_details=False, stale_details=hit[1])
+                session.cached += 1
+            self.download_queue.add(video_entry)
+            added.append(video_entry)
+            if video_entry.needs_details:
+                session.pending_details += 1
+                self._fetch_and_update_details(video_entry, use_cache=False)
+            elif video_entry.stale_details: self._fetch_and_update_details(video_entry, use_cache=False, revalidate=True)
+            session.added += 1
+            if session.first_item_at is None: session.first_item_at = time.perf_counter()
+        if session.added:
+            self.queue_view.request_refresh()
+            self.download_button.configure(state=AppConfig.STATE_NORMAL if not self.is_downloading else AppConfig.STATE_DISABLED)
+        self.metadata_cache.put_many(fetched_details)
+        self.journal.add_many(added)
+        if added and self.download_runner is not None: self.download_runner.add(added)
+        return len(added)
+
+    def _restore_journal(self):
+        # Rebuilds the unfinished queue of the previous session (items queued, mid-download or failed).
+        restored = [item for item in self.journal.pending(include_failed=True) if self.download_queue.add(item)]
+        if not restored: return
+        for item in restored:
+            if item.needs_details: self._fetch_and_update_details(item)
+        self.queue_view.request_refresh()
+        self._update_ui_after_fetch()
+        failed = sum(1 for item in restored if item.error)
+        self.update_status(f"Restored {len(restored)} unfinished item(s) from the last session{f' ({failed} failed)' if failed else ''}.", "green")
+
+    def _refresh_cache_stats(self):
+        if self.settings_frame is None: return
+        stats = self.metadata_cache.stats()
+        self.cache_stats_label.configure(text=f"Metadata cache: {stats['entries']} entries, {stats['hits']} hits / {stats['misses']} misses ({stats['stale']} stale)")
+
+    def _fetch_and_update_details(self, item_data: QueueItem, use_cache: bool = True, revalidate: bool = False):
+        hit = None
+        if use_cache:
+            with self.metrics.span("details_cache") as span: span['hit'] = bool(hit := self.metadata_cache.get(item_data.video_id))
+        if hit:
+            item_data.update(hit[0], needs_details=False)
+            self._update_queue_item_ui(item_data)
+            if not hit[1]: return
+            revalidate = True
+        callback = lambda info, error: self._on_details_fetched(item_data, info, error, revalidate)
+        priority = len(self.download_queue) + (AppConfig.REVALIDATE_PRIORITY if revalidate else 0)
+        self.detail_fetcher.submit(item_data.url, callback, priority=priority)
+        if not self.detail_poll_active:
+            self.detail_poll_active = True
+            self.after(250, self._prioritize_visible_details)
+
+    def _prioritize_visible_details(self):
+        if not self.detail_fetcher.pending_count():
+            self.detail_poll_active = False
+            return
+        self.detail_fetcher.prioritize(item.url for item in self.queue_view.visible_items() if item.needs_details)
+        self.after(250, self._prioritize_visible_details)
+
+    def _on_details_fetched(self, item_data: QueueItem, info: Dict[str, Any], error: str, revalidate: bool = False):
+        try:
+            if not info:
+                print(f"Failed to fetch details for {item_data.url}: {error}")
+                if revalidate: return
+                item_data.update(uploader="Error fetching details.", needs_details=False)
+                return self.events.item_changed(item_data)
+            details = skylark_engine.details_from_info(info)
+            self.metadata_cache.put(item_data.video_id or info.get('id'), details)
+            item_data.update(details, needs_details=False, stale_details=False)
+            self.journal.update_details(item_data)
+            self.events.item_changed(item_data)
         except Exception as e:
-            print(f"Exception fetching details for {item_data['url']}: {e}")
-            self.after(0, lambda: item_frame.uploader_label.configure(text="Error processing details."))
+            print(f"Exception fetching details for {item_data.url}: {e}")
+            item_data.update(uploader="Error processing details.", needs_details=False)
+            self.events.item_changed(item_data)
     
-    def _update_queue_item_ui(self, item_data: Dict[str, Any], item_frame: ctk.CTkFrame):
-        item_frame.uploader_label.configure(text=item_data['uploader'])
-        item_frame.duration_label.configure(text=f"🕒 {self._format_duration(item_data.get('duration', 0))}")
-        item_frame.views_label.configure(text=f"👁️ {self._format_views(item_data.get('view_count', 0))}")
-        self._update_subtitle_indicator(item_frame, item_data)
-        if item_data.get('thumbnail_url'):
-            threading.Thread(target=self._load_thumbnail, args=(item_frame.thumbnail_label, item_data['thumbnail_url']), daemon=True).start()
-        else: item_frame.thumbnail_label.configure(text="No Thumbnail", image=None)
-
-    def _update_subtitle_indicator(self, item_frame: ctk.CTkFrame, item_data: Dict[str, Any]):
-        if hasattr(item_frame, 'sub_indicator'):
-            item_frame.sub_indicator.destroy()
-            delattr(item_frame, 'sub_indicator')
-        if subtitles := item_data.get('subtitles'):
-            info_frame = item_frame.views_label.master
-            sub_indicator = ctk.CTkLabel(info_frame, text="S", font=ctk.CTkFont(size=11, weight="bold"), text_color="white", fg_color="#555555", corner_radius=5, width=20, height=20)
-            sub_indicator.pack(side="left", padx=(10,0), anchor="w")
-            Tooltip(sub_indicator, "Available Subtitles:\n" + "\n".join(subtitles))
-            item_frame.sub_indicator = sub_indicator
-
-    def _add_queue_item_ui(self, item_data: Dict[str, Any]):
-        item_frame = ctk.CTkFrame(self.queue_frame, corner_radius=8, fg_color="#333333")
-        item_frame.pack(fill="x", padx=5, pady=(0, 5))
-        item_frame.grid_columnconfigure(1, weight=1)
-        item_frame.thumbnail_label = ctk.CTkLabel(item_frame, text="Loading...", width=120, height=68, fg_color="#2b2b2b", corner_radius=6)
-        item_frame.thumbnail_label.grid(row=0, column=0, rowspan=2, padx=10, pady=10)
-        details_frame = ctk.CTkFrame(item_frame, fg_color="transparent")
-        details_frame.grid(row=0, column=1, padx=(0, 10), pady=(10, 5), sticky="new")
-        details_frame.grid_columnconfigure(0, weight=1)
-        ctk.CTkLabel(details_frame, text=item_data['title'], wraplength=420, justify="left", anchor="w", font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, column=0, sticky="ew")
-        item_frame.uploader_label = ctk.CTkLabel(details_frame, text=item_data['uploader'], justify="left", anchor="w", font=ctk.CTkFont(size=12), text_color="gray")
-        item_frame.uploader_label.grid(row=1, column=0, sticky="w", pady=(2, 0))
-        info_frame = ctk.CTkFrame(item_frame, fg_color="transparent")
-        info_frame.grid(row=1, column=1, padx=(0, 10), pady=(0, 10), sticky="sew")
-        item_frame.duration_label = ctk.CTkLabel(info_frame, text=f"🕒 {self._format_duration(item_data.get('duration', 0))}", font=ctk.CTkFont(size=12))
-        item_frame.duration_label.pack(side="left", anchor="w")
-        item_frame.views_label = ctk.CTkLabel(info_frame, text=f"👁️ {self._format_views(item_data.get('view_count', 0))}", font=ctk.CTkFont(size=12))
-        item_frame.views_label.pack(side="left", padx=(10, 0), anchor="w")
-        if item_data.get('needs_details', False):
-            item_frame.uploader_label.configure(text="Fetching details...")
-            item_frame.duration_label.configure(text="🕒 --:--")
-            item_frame.views_label.configure(text="👁️ --")
-            threading.Thread(target=self._fetch_and_update_details, args=(item_data, item_frame), daemon=True).start()
-        else:
-            if item_data.get('thumbnail_url'): threading.Thread(target=self._load_thumbnail, args=(item_frame.thumbnail_label, item_data['thumbnail_url']), daemon=True).start()
-            self._update_subtitle_indicator(item_frame, item_data)
-        remove_button = ctk.CTkButton(item_frame, text="✕", font=ctk.CTkFont(size=16), width=30, height=30, fg_color="#C0392B", hover_color="#E74C3C", command=lambda f=item_frame, u=item_data['url']: self._remove_queue_item(f, u))
-        remove_button.grid(row=0, column=2, rowspan=2, padx=10, pady=10)
+    def _update_queue_item_ui(self, item_data: QueueItem):
+        self.queue_view.refresh_item(item_data)
 
-    def _load_thumbnail(self, label_widget: ctk.CTkLabel, url: str):
-        try:
-            if url.startswith('//'): url = 'https:' + url
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-            with requests.get(url, stream=True, timeout=10, headers=headers) as r:
-                r.raise_for_status()
-                img_data = r.content
-            pil_image = Image.open(BytesIO(img_data))
-            ctk_image = CTkImage(pil_image, size=(120, 68))
+    def _load_thumbnail(self, row: ctk.CTkFrame, url: str):
+        if (ctk_image := self.thumbnail_loader.get_cached(url)) is not None:
+            return row.thumbnail_label.configure(image=ctk_image, text="")
+        row.thumbnail_label.configure(text="Loading...", image=None)
+        def on_loaded(ctk_image, error):
             def update_ui():
-                if label_widget.winfo_exists():
-                    label_widget.configure(image=ctk_image, text="")
-                    label_widget.image = ctk_image
-            self.after(0, update_ui)
-        except requests.exceptions.RequestException as e:
-            print(f"Network error loading thumbnail: {e}")
-            self.after(0, lambda: label_widget.configure(text="Network Error", image=None) if label_widget.winfo_exists() else None)
-        except Exception as e:
-            print(f"Error processing thumbnail: {e}")
-            self.after(0, lambda: label_widget.configure(text="No Thumbnail", image=None) if label_widget.winfo_exists() else None)
+                if row.thumbnail_url != url: return
+                if ctk_image is None: return row.thumbnail_label.configure(text=error, image=None)
+                row.thumbnail_label.configure(image=ctk_image, text="")
+            self.events.call(update_ui)
+        self.thumbnail_loader.load(url, on_loaded)
 
     def _format_duration(self, seconds: int) -> str:
         if not isinstance(seconds, (int, float)) or seconds < 0: return "N/A"
@@ -458,116 +866,181 @@ class App(ctk.CTk):
         if views < 1_000_000_000: return f"{views / 1_000_000:.1f}M"
         return f"{views / 1_000_000_000:.1f}B"
 
-    def _remove_queue_item(self, item_frame: ctk.CTkFrame, url: str):
-        self.download_queue = [item for item in self.download_queue if item['url'] != url]
-        item_frame.destroy()
+    def _format_speed(self, bytes_per_second: Optional[float]) -> str:
+        if not bytes_per_second: return "-- MB/s"
+        for unit in ("B/s", "KB/s", "MB/s"):
+            if bytes_per_second < 1024: return f"{bytes_per_second:.1f} {unit}"
+            bytes_per_second /= 1024
+        return f"{bytes_per_second:.1f} GB/s"
+
+    def _format_progress(self, item: QueueItem) -> str:
+        if item.paused: return "⏸ Paused"
+        if item.error: return f"✖ {item.error if len(item.error) <= 60 else item.error[:57] + '...'}"
+        if item.progress is None: return ""
+        if item.progress >= 1 and item.speed is None: return "✔ Done"
+        eta = f" · ETA {self._format_duration(item.eta)}" if item.eta is not None else ""
+        return f"⬇ {item.progress:.0%} · {self._format_speed(item.speed)}{eta}"
+
+    def _remove_queue_item(self, item_data: QueueItem):
+        # A running item is cancelled too: its process is stopped and its slot goes to the next item.
+        if self.download_runner is not None: self.download_runner.cancel(item_data.key)
+        self.download_queue.remove(item_data)
+        self.journal.remove_many([item_data.key])
+        self.queue_view.request_refresh()
         if not self.download_queue: self.download_button.configure(state=AppConfig.STATE_DISABLED)
 
+    def _run_queue_item_next(self, item_data: QueueItem):
+        # Moves the item to the top with a priority above every other item, so a running batch starts it on the next free slot.
+        item_data.priority = max((item.priority for item in self.download_queue), default=0) + 1
+        self.download_queue.move(item_data, 0)
+        self._apply_queue_order(item_data)
+
+    def _move_queue_item(self, item_data: QueueItem, offset: int):
+        # One place up (-1) or down (+1). Priorities never increase down the queue, so the item takes
+        # the priority of the one it passes and the batch runs them in the order shown.
+        index = self.download_queue.position(item_data)
+        if index < 0 or not (neighbour := self.download_queue.window(index + offset, 1) if index + offset >= 0 else []): return
+        item_data.priority = neighbour[0].priority
+        self.download_queue.move(item_data, index + offset)
+        self._apply_queue_order(item_data)
+
+    def _apply_queue_order(self, item_data: QueueItem):
+        changed = {item.key: item for item in self.download_queue.normalize_priorities()}
+        changed[item_data.key] = item_data
+        keys = [item.key for item in self.download_queue]
+        for item in changed.values():
+            if self.download_runner is not None: self.download_runner.prioritize(item.key, item.priority)
+            self.journal.update_details(item)
+        if self.download_runner is not None: self.download_runner.reorder(keys)
+        self.journal.reorder(keys)
+        self.queue_view.request_refresh()
+
+    def _toggle_pause_item(self, item_data: QueueItem):
+        # Pausing stops a running download but keeps its partial files; resuming adds the item back to
+        # the running batch (or leaves it for the next Start Download), where yt-dlp continues them.
+        item_data.paused = not item_data.paused
+        if item_data.paused:
+            if self.download_runner is not None: self.download_runner.pause(item_data.key)
+            item_data.progress = item_data.speed = item_data.eta = None
+        elif self.download_runner is not None and self.download_runner.add([item_data]): item_data.error = None
+        self.journal.update_details(item_data)
+        self.queue_view.refresh_item(item_data)
+
     def confirm_clear_queue(self):
         if not self.download_queue: return
         dialog = ConfirmationDialog(self, title="Confirm", message="Are you sure you want to clear the entire queue?")
         if dialog.wait_for_response():
+            if self.download_runner is not None:
+                for item in self.download_queue: self.download_runner.cancel(item.key)
             self.download_queue.clear()
-            for widget in self.queue_frame.winfo_children(): widget.destroy()
+            self.journal.clear_pending()
+            self.detail_fetcher.cancel_all()
+            self.queue_view.scroll_to(0)
             self.download_button.configure(state=AppConfig.STATE_DISABLED)
             self.update_status("Queue cleared.", "yellow")
 
     def _update_ui_after_fetch(self):
-        self.add_button.configure(state=AppConfig.STATE_NORMAL)
+        # "Cancel" must stay clickable; "Add to Queue" stays disabled while yt-dlp is known to be missing.
+        usable = self.ingest_session or self.dependencies is None or self.dependencies.get("yt_dlp")
+        self.add_button.configure(state=AppConfig.STATE_NORMAL if usable else AppConfig.STATE_DISABLED, text="Cancel" if self.ingest_session else "Add to Queue")
         self.download_button.configure(state=AppConfig.STATE_NORMAL if self.download_queue and not self.is_downloading else AppConfig.STATE_DISABLED)
 
     def start_download_thread(self):
+        # Everything the run needs is read from the widgets here, on the Tk thread; the worker only
+        # sees the frozen snapshot and reports back through the event bus.
         if self.is_downloading or not self.download_queue: return
+        if not (items := [item for item in self.download_queue if not item.paused]): return self.update_status("Every item in the queue is paused.", "yellow")
+        settings = self._settings_snapshot()
+        save_path = settings.default_save_path if settings.use_default_path and os.path.isdir(settings.default_save_path) else filedialog.askdirectory()
+        if not save_path: return self.update_status("Download cancelled: No folder selected.", "yellow")
+        self.is_downloading, self.last_save_path = True, save_path
+        self.progress_tracker = ProgressTracker()
         self.open_folder_button.grid_remove()
-        threading.Thread(target=self.run_download_process, daemon=True).start()
-    
-    def run_download_process(self):
-        self.is_downloading = True
-        self.after(0, lambda: self.download_button.configure(state=AppConfig.STATE_DISABLED, text="Downloading..."))
-        self.after(0, lambda: self.progress_bar.set(0))
-        use_default, default_path = self.use_default_path_switch.get() == 1, self.default_save_path.get()
-        save_path = default_path if use_default and os.path.isdir(default_path) else filedialog.askdirectory()
-        if not save_path:
-            self.update_status("Download cancelled: No folder selected.", "yellow")
-            self.is_downloading = False
-            self.after(0, self._update_ui_after_fetch)
-            return self.after(0, lambda: self.download_button.configure(text="Start Download"))
-        self.last_save_path = save_path
-        queue_copy, max_workers = list(self.download_queue), int(self.concurrency_selector.get())
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(self._download_single_video, item, save_path, idx): item for idx, item in enumerate(queue_copy)}
-            for i, _ in enumerate(concurrent.futures.as_completed(futures), 1):
-                self.after(0, self.update_overall_progress, i, len(queue_copy))
-        self.is_downloading = False
-        self.download_queue.clear()
-        self.after(0, lambda: [w.destroy() for w in self.queue_frame.winfo_children()])
-        self.after(0, lambda: self.download_button.configure(text="Start Download", state=AppConfig.STATE_DISABLED))
-        self.update_status("All downloads completed!", "green")
-        self.after(0, lambda: self.open_folder_button.grid(row=1, column=1, sticky="e"))
-
-    def _download_single_video(self, video_item: Dict, save_path: str, idx: int):
-        try:
-            command = self._build_yt_dlp_command(video_item, save_path, idx)
-            process = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace', creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-            stderr = process.stderr
-            if process.returncode != 0:
-                error_msg = f"Download failed for {video_item['title'][:30]}..."
-                if "ffmpeg" in stderr.lower() and "not found" in stderr.lower(): error_msg = "Error: FFmpeg is required for MP3 conversion."
-                elif stderr: error_msg = stderr.strip().split('\n')[-1]
-                return self.update_status(f"Failed: {error_msg}", "red")
-            warning_messages = []
-            if self.subtitle_switch.get() == 1 and "has no subtitles" in stderr: warning_messages.append("subtitles not found")
-            if warning_messages: self.update_status(f"Downloaded '{video_item['title'][:20]}...' but {', '.join(warning_messages)}.", "yellow")
-        except Exception as e: self.update_status(f"An unexpected error occurred for '{video_item['title'][:20]}...': {e}", "red")
-
-    def _get_lang_code(self, lang_string: str) -> str:
-        match = re.search(r'\((\w+)\)', lang_string)
-        return match.group(1) if match else "en"
-
-    def _build_yt_dlp_command(self, video_item: Dict, save_path: str, idx: int) -> List[str]:
-        prefix = "".join(i for i in self.prefix_entry.get().strip() if i not in r'\/:*?"<>|')
-        filename_prefix = f"[{prefix}] " if prefix else ""
-        number_prefix = f"{idx + 1:02d} - " if self.numbering_switch.get() == 1 else ""
-        final_path = save_path
-        if self.playlist_folder_switch.get() and video_item.get('playlist_title'):
-            sane_playlist_title = "".join(i for i in video_item['playlist_title'] if i not in r'\/:*?"<>|')
-            final_path = os.path.join(save_path, sane_playlist_title)
-        filename = f"{number_prefix}{filename_prefix}%(title)s"
-        command = ['yt-dlp']
-        is_audio = "Audio" in self.format_selector.get()
-        if is_audio:
-            command.extend(['-x', '--audio-format', 'mp3', '-f', 'bestaudio', '--audio-quality', self.bitrate_selector.get()])
-            if self.thumbnail_switch.get(): command.append('--embed-thumbnail')
-        else:
-            quality = self.quality_selector.get()
-            filename += f" - {quality}"
-            video_format, audio_format = AppConfig.QUALITY_MAP.get(quality, AppConfig.QUALITY_MAP["Highest"])
-            command.extend(['-f', f"{video_format}+{audio_format}", '--merge-output-format', 'mp4'])
-        if self.metadata_switch.get(): command.append('--add-metadata')
-        if self.subtitle_switch.get() and not is_audio:
-            command.extend(['--embed-subs', '--convert-subs', 'srt'])
-            if self.subtitle_all_switch.get(): command.append('--all-subs')
-            else: command.extend(['--sub-langs', self._get_lang_code(self.subtitle_lang_selector.get())])
-        output_template = os.path.join(final_path, f"{filename}.%(ext)s")
-        command.extend(['--ignore-errors', '--no-progress', '-o', output_template, video_item['url']])
-        return command
+        self.download_button.configure(state=AppConfig.STATE_DISABLED, text="Downloading...")
+        self.progress_bar.set(0)
+        for item in items: item.error = item.progress = None
+        self.download_runner = runner = DownloadRunner(settings, self.active_engine, self.progress_tracker, self.journal, metrics=self.metrics)
+        threading.Thread(target=self.run_download_process, args=(runner, items, save_path), daemon=True).start()
+        self.after(AppConfig.PROGRESS_REFRESH_MS, self._refresh_progress)
+
+    def run_download_process(self, runner: DownloadRunner, items: List[QueueItem], save_path: str):
+        # A batch that fails outright still has to end, or the app stays stuck in "Downloading...".
+        try: self.events.call(self._finish_download, runner.run(items, save_path, self._on_download_result))
+        except Exception as e: self.events.call(self._finish_download, [], f"Download failed: {e}")
+
+    def _finish_download(self, results: List[Tuple[QueueItem, str, str]], error: Optional[str] = None):
+        # Finished items leave the queue; failed, paused and not yet started ones (added as the batch
+        # ended) stay, failed ones with their reason so they can be retried.
+        self.is_downloading, self.download_runner = False, None
+        self.progress_bar.set(1)
+        for item, level, _ in results:
+            if level in ("ok", "warning"): self.download_queue.remove(item)
+        self.queue_view.scroll_to(0)
+        self.download_button.configure(text="Start Download", state=AppConfig.STATE_NORMAL if self.download_queue else AppConfig.STATE_DISABLED)
+        if error: self.update_status(error, "red")
+        elif self.download_queue: self.update_status(f"Downloads finished. {len(self.download_queue)} item(s) kept in the queue ({sum(1 for item in self.download_queue if item.error)} failed).", "yellow")
+        else: self.update_status("All downloads completed!", "green")
+        self.open_folder_button.grid(row=1, column=1, sticky="e")
+
+    def _on_download_result(self, video_item: QueueItem, level: str, message: str):
+        if level != "ok": self.events.status(message, "red" if level == "error" else "yellow")
+
+    def _refresh_progress(self):
+        # Single fixed-rate consumer of the tracker, however many download workers are running.
+        if not self.is_downloading: return
+        changed, fraction, bandwidth = self.progress_tracker.snapshot()
+        for key, state in changed.items():
+            if (item := self.download_queue.get(key)) is None: continue
+            if state is None: item.progress, item.speed, item.eta = 1.0, None, None
+            else: item.progress, item.speed, item.eta = state['fraction'], state['speed'], state['eta']
+            self.queue_view.refresh_item(item)
+        self.progress_bar.set(fraction)
+        tracker = self.progress_tracker
+        if self.download_runner is not None and (paused := self.download_runner.breaker.remaining()):
+            self.update_status(f"Rate limited by YouTube. New downloads paused for {paused:.0f}s... ({tracker.completed}/{tracker.total}) complete", "yellow")
+        else: self.update_status(f"Downloading... ({tracker.completed}/{tracker.total}) complete · {self._format_speed(bandwidth)}")
+        self.after(AppConfig.PROGRESS_REFRESH_MS, self._refresh_progress)
 
     def start_update_thread(self):
         self.update_yt_dlp_button.configure(state=AppConfig.STATE_DISABLED)
         threading.Thread(target=self._run_yt_dlp_update, daemon=True).start()
 
     def _run_yt_dlp_update(self):
-        self.update_status("Updating yt-dlp...", "yellow")
+        self.events.status("Updating yt-dlp...", "yellow")
         try:
             command = ['yt-dlp', '-U']
-            process = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace', creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+            with self.metrics.span("update") as span:
+                process = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace', creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+                span['exit_code'] = process.returncode
             if process.returncode == 0:
                 msg = "yt-dlp is already up to date."
-                if "Updating to" in process.stdout: msg = "yt-dlp updated successfully!"
-                self.update_status(msg, "green")
-            else: self.update_status(f"Update failed: {process.stderr.strip()}", "red")
-        except Exception as e: self.update_status(f"Update error: {e}", "red")
-        finally: self.update_yt_dlp_button.configure(state=AppConfig.STATE_NORMAL)
+                if "Updating to" in process.stdout:
+                    msg = "yt-dlp updated successfully!"
+                    self._revalidate_dependencies()
+                self.events.status(msg, "green")
+            else: self.events.status(f"Update failed: {process.stderr.strip()}", "red")
+        except Exception as e: self.events.status(f"Update error: {e}", "red")
+        finally: self.events.call(lambda: self.update_yt_dlp_button.configure(state=AppConfig.STATE_NORMAL))
+
+    def show_stats(self):
+        if self.stats_window is not None and self.stats_window.winfo_exists(): return self.stats_window.focus()
+        self.stats_window = StatsWindow(self)
+
+    def _write_metrics_snapshot(self, reschedule: bool = True):
+        try: self.metrics.write_snapshot(AppConfig.METRICS_FILE)
+        except OSError as e: print(f"Error writing metrics snapshot: {e}")
+        if reschedule: self.after(AppConfig.METRICS_SNAPSHOT_MS, self._write_metrics_snapshot)
+
+    def _on_close(self):
+        self._write_metrics_snapshot(reschedule=False)
+        self.metrics.close()
+        self.engine.shutdown()
+        self.detail_fetcher.cancel_all()
+        self.metadata_cache.close()
+        self.journal.close()
+        self.subscriptions.close()
+        self.thumbnail_loader.shutdown()
+        self.destroy()
 
     def open_last_folder(self):
         if self.last_save_path and os.path.isdir(self.last_save_path):
@@ -576,13 +1049,21 @@ class App(ctk.CTk):
                 else: subprocess.Popen(["open" if sys.platform == "darwin" else "xdg-open", self.last_save_path])
             except Exception as e: self.update_status(f"Error opening folder: {e}", "red")
 
-    def update_overall_progress(self, completed: int, total: int):
-        self.progress_bar.set(completed / total)
-        self.update_status(f"Downloading... ({completed}/{total}) complete")
-        
     def update_status(self, message: str, color: str = "white"):
-        self.after(0, lambda: self.status_label.configure(text=f"Status: {message}", text_color=AppConfig.COLOR_MAP.get(color, "white")))
+        self.events.status(message, color)
+
+    def _drain_events(self):
+        # The only consumer of the event bus: applies queued worker events once per EVENT_DRAIN_MS.
+        self.drain_timer.tick(AppConfig.EVENT_DRAIN_MS / 1000)
+        calls, items, status = self.events.drain()
+        for call in calls:
+            try: call.fn(*call.args)
+            except Exception as e: print(f"Error handling {getattr(call.fn, '__name__', call.fn)}: {e}")
+        for item in items.values(): self.queue_view.refresh_item(item)
+        if status is not None: self.status_label.configure(text=f"Status: {status.message}", text_color=AppConfig.COLOR_MAP.get(status.color, "white"))
+        self.after(AppConfig.EVENT_DRAIN_MS, self._drain_events)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = App()
     app.mainloop()
@@ -0,0 +1,628 @@
+import concurrent.futures, dataclasses, importlib.util, json, multiprocessing, os, queue, re, shutil, subprocess, threading, heapq, itertools, time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable, Iterator
+from skylark_queue import QueueItem, canonical_video_id, canonical_video_url
+from skylark_metrics import Metrics
+
+HEAVY_INFO_KEYS = ("formats", "requested_formats", "automatic_captions", "heatmap", "requested_downloads")
+MAX_CACHED_INSTANCES = 8
+PROGRESS_PREFIX = "[skylark-progress]"
+PROGRESS_FIELDS = ("status", "downloaded_bytes", "total_bytes", "total_bytes_estimate", "speed", "eta")
+PROGRESS_TEMPLATE = "download:" + PROGRESS_PREFIX + " " + "|".join(f"%(progress.{field})s" for field in PROGRESS_FIELDS)
+PROGRESS_INTERVAL = 0.25
+FILE_PREFIX, META_PREFIX = "[skylark-file]", "[skylark-meta]"
+META_FIELDS = ("title", "track", "artist", "album", "uploader", "upload_date", "description", "webpage_url")
+# Audio format label -> (yt-dlp format, output extension). MP3 is always transcoded; M4A and Opus
+# copy the downloaded stream when the video offers one in that codec and transcode otherwise, and
+# None keeps whatever container fits the source codec.
+AUDIO_MODES = {"MP3 - Audio Only": ("bestaudio", "mp3"), "M4A - Audio Only (Original Stream When Available)": ("bestaudio[ext=m4a]/bestaudio", "m4a"),
+               "Opus - Audio Only (Original Stream When Available)": ("bestaudio[acodec=opus]/bestaudio", "opus"), "Original - Audio Only (Fastest)": ("bestaudio", None)}
+# Earlier labels still found in saved settings -> current label.
+RENAMED_FORMATS = {"M4A - Audio Only (Lossless)": "M4A - Audio Only (Original Stream When Available)", "Opus - Audio Only (Lossless)": "Opus - Audio Only (Original Stream When Available)"}
+FORMAT_OPTIONS = ["MP4 - Video", *AUDIO_MODES]
+QUALITY_MAP = {"Highest": ("bestvideo", "bestaudio"), "1080p": ("bestvideo[height<=1080]", "bestaudio"), "720p": ("bestvideo[height<=720]", "bestaudio"), "480p": ("bestvideo[height<=480]", "bestaudio"), "Lowest": ("worstvideo", "worstaudio")}
+INVALID_FILENAME_CHARS = r'\/:*?"<>|'
+UNAVAILABLE_TITLES = ("[Deleted video]", "[Private video]")
+VIDEO_ERROR_PATTERN = re.compile(r'^ERROR: \[[^\]]+\] ([\w-]+):')
+POPEN_FLAGS = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+
+class EngineUnavailable(RuntimeError):
+    pass
+
+class _CapturingLogger:
+    def __init__(self): self.reset()
+    def reset(self): self.stdout, self.stderr = [], []
+    def debug(self, msg: str):
+        if not msg.startswith('[debug] '): self.stdout.append(msg)
+    def info(self, msg: str): self.stdout.append(msg)
+    def warning(self, msg: str): self.stderr.append(msg if msg.startswith('WARNING:') else f"WARNING: {msg}")
+    def error(self, msg: str): self.stderr.append(msg)
+
+# Worker-process state: one logger and a small LRU of YoutubeDL instances keyed by their
+# options (minus the output template), so extractors and HTTP sessions survive across jobs.
+_logger: Optional[_CapturingLogger] = None
+_instances: "OrderedDict[str, Any]" = OrderedDict()
+_progress_sink: Dict[str, Any] = {'queue': None, 'cancel': None, 'last': 0.0, 'files': [], 'meta': None}
+
+def _init_worker():
+    global _logger
+    import yt_dlp  # noqa: F401  (pay the extractor-registry import once per worker)
+    _logger = _CapturingLogger()
+
+def _get_ydl(params: Dict[str, Any]):
+    import yt_dlp
+    params = dict(params)
+    outtmpl = params.pop('outtmpl', None)
+    key = json.dumps(params, sort_keys=True, default=str)
+    ydl = _instances.pop(key, None)
+    if ydl is None:
+        ydl = yt_dlp.YoutubeDL(dict(params, logger=_logger))
+        ydl.add_progress_hook(_forward_progress)
+        ydl.add_postprocessor_hook(_record_filepath)
+        if len(_instances) >= MAX_CACHED_INSTANCES: _instances.popitem(last=False)[1].close()
+    _instances[key] = ydl
+    # download() returns `_download_retcode`, which yt-dlp sets on any error and never clears.
+    ydl._download_retcode = 0
+    if outtmpl is not None: ydl.params['outtmpl'].update(outtmpl if isinstance(outtmpl, dict) else {'default': outtmpl})
+    return ydl
+
+def _forward_progress(d: Dict[str, Any]):
+    # Progress hook shared by all cached instances; forwards at most one update per
+    # PROGRESS_INTERVAL (plus every 'finished') to the queue of the job currently running, and
+    # aborts the download at the same rate once the parent has set the job's cancel event.
+    if (out_queue := _progress_sink['queue']) is None: return
+    now = time.monotonic()
+    if d.get('status') == 'downloading' and now - _progress_sink['last'] < PROGRESS_INTERVAL: return
+    _progress_sink['last'] = now
+    if (cancel := _progress_sink['cancel']) is not None and cancel.is_set():
+        import yt_dlp
+        raise yt_dlp.utils.DownloadCancelled("Download cancelled.")
+    out_queue.put({field: d.get(field) for field in PROGRESS_FIELDS})
+
+def _record_filepath(d: Dict[str, Any]):
+    # Postprocessor hook: collects every downloaded stream (one per requested format) once it has
+    # been moved into place, plus the metadata the post-processing stage needs.
+    if d.get('status') != 'finished' or not (info := d.get('info_dict') or {}).get('filepath'): return
+    if info['filepath'] not in _progress_sink['files']: _progress_sink['files'].append(info['filepath'])
+    _progress_sink['meta'] = {field: info.get(field) for field in META_FIELDS}
+
+def output_paths_from(output: str) -> List[str]:
+    return list(dict.fromkeys(line[len(FILE_PREFIX):].strip() for line in output.splitlines() if line.startswith(FILE_PREFIX)))
+
+def metadata_from(output: str) -> Dict[str, Any]:
+    for line in reversed(output.splitlines()):
+        if line.startswith(META_PREFIX):
+            try: return json.loads(line[len(META_PREFIX):])
+            except ValueError: break
+    return {}
+
+def parse_progress_line(line: str) -> Optional[Dict[str, Any]]:
+    if not line.startswith(PROGRESS_PREFIX): return None
+    values = line[len(PROGRESS_PREFIX):].strip().split("|")
+    if len(values) != len(PROGRESS_FIELDS): return None
+    event: Dict[str, Any] = {"status": values[0]}
+    for field, value in zip(PROGRESS_FIELDS[1:], values[1:]):
+        try: event[field] = float(value)
+        except ValueError: event[field] = None
+    return event
+
+def _slim_info(ydl, info: Dict[str, Any]) -> Dict[str, Any]:
+    info = ydl.sanitize_info(info)
+    for key in HEAVY_INFO_KEYS: info.pop(key, None)
+    return info
+
+def _extract_stream_job(url: str, out_queue, cancel_event, batch_size: int, playlist_start: int = 1):
+    # Streams a --flat-playlist style enumeration back to the parent in batches of `batch_size`
+    # entries (from the 1-based `playlist_start`), ending with a None sentinel; stops early once
+    # `cancel_event` is set.
+    import yt_dlp
+    _logger.reset()
+    ydl = _get_ydl({'quiet': True, 'no_warnings': True, 'ignoreerrors': True, 'skip_download': True, 'extract_flat': 'in_playlist'})
+    try:
+        info = ydl.extract_info(url, download=False, process=False)
+        if info and info.get('_type') in ('playlist', 'multi_video'):
+            playlist_fields, batch = {'playlist_title': info.get('title'), 'playlist_id': info.get('id')}, []
+            for entry in itertools.islice(info.get('entries') or [], playlist_start - 1, None):
+                if cancel_event.is_set(): break
+                if not entry: continue
+                batch.append(_slim_info(ydl, {**playlist_fields, **entry}))
+                if len(batch) >= batch_size:
+                    out_queue.put((batch, ""))
+                    batch = []
+            out_queue.put((batch, "\n".join(_logger.stderr)))
+        elif info:
+            info = ydl.process_ie_result(info, download=False)
+            out_queue.put(([_slim_info(ydl, info)] if info else [], "\n".join(_logger.stderr)))
+        else: out_queue.put(([], "\n".join(_logger.stderr)))
+    except Exception as e: out_queue.put(([], str(e) if isinstance(e, yt_dlp.utils.DownloadError) else f"ERROR: {e}"))
+    finally: out_queue.put(None)
+
+def _download_job(url: str, options: Dict[str, Any], progress_queue=None, cancel_event=None) -> Tuple[int, str, str]:
+    import yt_dlp
+    _logger.reset()
+    _progress_sink.update(queue=progress_queue, cancel=cancel_event, last=0.0, files=[], meta=None)
+    try: return_code = _get_ydl(options).download([url])
+    except (yt_dlp.utils.DownloadError, yt_dlp.utils.DownloadCancelled) as e:
+        _logger.stderr.append(str(e))
+        return_code = 1
+    except Exception as e:
+        _logger.stderr.append(f"ERROR: {e}")
+        return_code = 1
+    finally: _progress_sink['queue'] = _progress_sink['cancel'] = None
+    _logger.stdout.extend(f"{FILE_PREFIX} {filepath}" for filepath in _progress_sink['files'])
+    if _progress_sink['meta']: _logger.stdout.append(f"{META_PREFIX} {json.dumps(_progress_sink['meta'])}")
+    return return_code, "\n".join(_logger.stdout), "\n".join(_logger.stderr)
+
+def _extract_batch_job(urls: List[str]) -> List[Tuple[str, Optional[Dict[str, Any]], str]]:
+    import yt_dlp
+    ydl = _get_ydl({'quiet': True, 'no_warnings': True, 'ignoreerrors': True, 'skip_download': True, 'noplaylist': True})
+    results = []
+    for url in urls:
+        _logger.reset()
+        try: info = ydl.extract_info(url, download=False)
+        except yt_dlp.utils.DownloadError as e: info, _logger.stderr = None, [str(e)]
+        results.append((url, _slim_info(ydl, info) if info else None, "\n".join(_logger.stderr)))
+    return results
+
+class YtDlpEngine:
+    # Runs yt-dlp in worker processes: extraction (playlist listing, detail lookups) on a pool of
+    # `max_workers`, downloads on a pool of their own that a DownloadRunner sizes with `resize()`,
+    # so starting a batch never restarts the workers a detail lookup is using.
+    def __init__(self, max_workers: int = 2, download_workers: Optional[int] = None):
+        self.max_workers, self.download_workers = max_workers, download_workers or max_workers
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._download_executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._download_executor_size, self._downloads_active = 0, 0
+        self._manager = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_available() -> bool:
+        return importlib.util.find_spec("yt_dlp") is not None
+
+    def _pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                if not self.is_available(): raise EngineUnavailable("yt_dlp module is not installed.")
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+            return self._executor
+
+    def _submit(self, fn, *args):
+        try: return self._pool().submit(fn, *args).result()
+        except concurrent.futures.process.BrokenProcessPool as e:
+            with self._lock: self._executor = None
+            raise EngineUnavailable(f"Engine worker crashed: {e}") from e
+
+    def resize(self, download_workers: int):
+        # Takes effect once no download is running; a pool with downloads in flight is kept until then.
+        with self._lock: self.download_workers = download_workers
+
+    def _begin_download(self) -> concurrent.futures.ProcessPoolExecutor:
+        # The download pool, rebuilt first if `resize()` changed its size while it was idle.
+        with self._lock:
+            old = None
+            if self._download_executor is not None and self._download_executor_size != self.download_workers and not self._downloads_active:
+                old, self._download_executor = self._download_executor, None
+            if self._download_executor is None:
+                if not self.is_available(): raise EngineUnavailable("yt_dlp module is not installed.")
+                self._download_executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.download_workers, initializer=_init_worker)
+                self._download_executor_size = self.download_workers
+            self._downloads_active += 1
+            executor = self._download_executor
+        if old: old.shutdown(wait=False)
+        return executor
+
+    def _end_download(self, broken: bool = False):
+        with self._lock:
+            self._downloads_active -= 1
+            if broken: self._download_executor = None
+
+    def extract_stream(self, url: str, cancel_event: threading.Event, batch_size: int = 50, playlist_start: int = 1) -> Iterator[Tuple[List[Dict[str, Any]], str]]:
+        with self._lock:
+            if self._manager is None: self._manager = multiprocessing.Manager()
+            out_queue, remote_cancel = self._manager.Queue(), self._manager.Event()
+        future = self._pool().submit(_extract_stream_job, url, out_queue, remote_cancel, batch_size, playlist_start)
+        while True:
+            if cancel_event.is_set(): remote_cancel.set()
+            try: message = out_queue.get(timeout=0.2)
+            except queue.Empty:
+                if not future.done(): continue
+                try: future.result()
+                except concurrent.futures.process.BrokenProcessPool as e:
+                    with self._lock: self._executor = None
+                    raise EngineUnavailable(f"Engine worker crashed: {e}") from e
+                return
+            if message is None: return
+            yield message
+
+    def extract_batch(self, urls: List[str]) -> List[Tuple[str, Optional[Dict[str, Any]], str]]:
+        return self._submit(_extract_batch_job, urls)
+
+    def _manager_queue(self):
+        with self._lock:
+            if self._manager is None: self._manager = multiprocessing.Manager()
+            return self._manager.Queue()
+
+    def download(self, url: str, options: Dict[str, Any], on_progress: Optional[Callable[[Dict[str, Any]], None]] = None, cancel_event: Optional[threading.Event] = None) -> subprocess.CompletedProcess:
+        # Setting `cancel_event` aborts the job at its next progress update; the worker process stays in the pool.
+        executor, broken = self._begin_download(), False
+        try:
+            if on_progress is None and cancel_event is None: return_code, stdout, stderr = executor.submit(_download_job, url, options).result()
+            else:
+                progress_queue, remote_cancel = self._manager_queue(), self._manager.Event() if cancel_event is not None else None
+                future = executor.submit(_download_job, url, options, progress_queue, remote_cancel)
+                while not future.done() or not progress_queue.empty():
+                    if cancel_event is not None and cancel_event.is_set(): remote_cancel.set()
+                    try:
+                        event = progress_queue.get(timeout=0.2)
+                        if on_progress: on_progress(event)
+                    except queue.Empty: pass
+                return_code, stdout, stderr = future.result()
+        except concurrent.futures.process.BrokenProcessPool as e:
+            broken = True
+            raise EngineUnavailable(f"Engine worker crashed: {e}") from e
+        finally: self._end_download(broken)
+        return subprocess.CompletedProcess(['yt_dlp', url], return_code, stdout, stderr)
+
+    def shutdown(self):
+        with self._lock:
+            executors, manager, self._manager = (self._executor, self._download_executor), self._manager, None
+            self._executor = self._download_executor = None
+        for executor in executors:
+            if executor: executor.shutdown(wait=False, cancel_futures=True)
+        if manager: manager.shutdown()
+
+class DetailFetcher:
+    # Bounded scheduler for per-video detail lookups: a priority heap of pending URLs drained
+    # in batches by at most `max_workers` threads, each batch being one yt-dlp run.
+    def __init__(self, fetch_batch: Callable[[List[str]], Iterable[Tuple[str, Optional[Dict[str, Any]], str]]], max_workers: int = 3, batch_size: int = 25, linger: float = 0.05, metrics: Optional[Metrics] = None):
+        self._fetch_batch, self.max_workers, self.batch_size, self.linger = fetch_batch, max_workers, batch_size, linger
+        self.metrics = metrics or Metrics()
+        self._heap: List[Tuple[int, int, str]] = []
+        self._pending: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._active_workers = 0
+
+    def submit(self, url: str, callback: Callable[[Optional[Dict[str, Any]], str], None], priority: int = 0):
+        with self._lock:
+            if entry := self._pending.get(url):
+                entry[2].append(callback)
+                if priority < entry[0]: self._push(url, entry, priority)
+            else:
+                entry = [priority, 0, [callback], time.monotonic()]
+                self._pending[url] = entry
+                self._push(url, entry, priority)
+            self._spawn_workers()
+
+    def prioritize(self, urls: Iterable[str], priority: int = -1):
+        with self._lock:
+            for url in urls:
+                if (entry := self._pending.get(url)) and priority < entry[0]: self._push(url, entry, priority)
+
+    def configure(self, max_workers: int):
+        with self._lock:
+            self.max_workers = max(1, max_workers)
+            self._spawn_workers()
+
+    def cancel_all(self):
+        with self._lock:
+            self._heap.clear()
+            self._pending.clear()
+
+    def pending_count(self) -> int:
+        with self._lock: return len(self._pending)
+
+    def _push(self, url: str, entry: List[Any], priority: int):
+        entry[0], entry[1] = priority, next(self._seq)
+        heapq.heappush(self._heap, (priority, entry[1], url))
+
+    def _spawn_workers(self):
+        while self._active_workers < self.max_workers and self._active_workers * self.batch_size < len(self._pending):
+            self._active_workers += 1
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def _take_batch(self) -> Tuple[Dict[str, List[Callable]], float]:
+        # Returns the batch and how long its oldest URL waited in the heap.
+        batch: Dict[str, List[Callable]] = {}
+        submitted = time.monotonic()
+        while self._heap and len(batch) < self.batch_size:
+            priority, seq, url = heapq.heappop(self._heap)
+            entry = self._pending.get(url)
+            if entry and entry[1] == seq:
+                batch[url] = self._pending.pop(url)[2]
+                submitted = min(submitted, entry[3])
+        return batch, time.monotonic() - submitted
+
+    def _worker(self):
+        time.sleep(self.linger)
+        while True:
+            with self._lock:
+                batch, queue_wait = ({}, 0.0) if self._active_workers > self.max_workers else self._take_batch()
+                if not batch:
+                    self._active_workers -= 1
+                    return
+            error = "No details returned."
+            with self.metrics.span("details", items=len(batch), queue_wait=round(queue_wait, 6)) as span:
+                try:
+                    for url, info, message in self._fetch_batch(list(batch)):
+                        for callback in batch.pop(url, []): callback(info, message)
+                except Exception as e: error = span['error'] = str(e)
+                span['missing'] = len(batch)
+            for callbacks in batch.values():
+                for callback in callbacks: callback(None, error)
+
+class ProgressTracker:
+    # Collects per-item progress from download workers under a lock; the UI polls `snapshot()`
+    # at a fixed rate instead of being called back for every progress line.
+    def __init__(self, total: int = 0):
+        self.total, self.completed = total, 0
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+
+    def start(self, key: str, streams: int = 1):
+        with self._lock:
+            self._items[key] = {'streams': max(1, streams), 'streams_done': 0, 'fraction': 0.0, 'speed': None, 'eta': None, 'bytes': 0.0, 'stream_bytes': 0.0}
+            self._dirty.add(key)
+
+    def update(self, key: str, event: Dict[str, Any]):
+        with self._lock:
+            if (state := self._items.get(key)) is None: return
+            downloaded = event.get('downloaded_bytes') or 0.0
+            total = event.get('total_bytes') or event.get('total_bytes_estimate')
+            if event.get('status') == 'finished':
+                state['streams_done'] = min(state['streams'], state['streams_done'] + 1)
+                state['bytes'] += downloaded or state['stream_bytes']
+                state['stream_bytes'], stream_fraction = 0.0, 0.0
+            else:
+                state['stream_bytes'] = downloaded
+                stream_fraction = min(1.0, downloaded / total) if total else 0.0
+            state['fraction'] = min(1.0, (state['streams_done'] + stream_fraction) / state['streams'])
+            state['speed'], state['eta'] = event.get('speed'), event.get('eta')
+            self._dirty.add(key)
+
+    def finish(self, key: str):
+        with self._lock:
+            self.completed += 1
+            if state := self._items.pop(key, None): self._dirty.add(key)
+
+    def add_total(self, count: int):
+        # Items joining a batch that is already running.
+        with self._lock: self.total += count
+
+    def drop(self, key: str):
+        # Takes a cancelled or paused item out of the batch instead of counting it as completed.
+        with self._lock:
+            self.total = max(0, self.total - 1)
+            self._items.pop(key, None)
+            self._dirty.discard(key)
+
+    def report(self, key: str, fraction: float, speed: Optional[float] = None, eta: Optional[float] = None):
+        # Progress already computed elsewhere (a remote worker's tracker).
+        with self._lock:
+            if (state := self._items.get(key)) is None: return
+            state['fraction'], state['speed'], state['eta'] = min(1.0, max(0.0, fraction)), speed, eta
+            self._dirty.add(key)
+
+    def state(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock: return dict(self._items[key]) if key in self._items else None
+
+    def bandwidth(self) -> float:
+        with self._lock: return sum(state['speed'] or 0.0 for state in self._items.values())
+
+    def snapshot(self) -> Tuple[Dict[str, Optional[Dict[str, Any]]], float, float]:
+        # Returns ({key: state or None when finished} for items changed since the last call,
+        # overall fraction complete, aggregate bandwidth in bytes/s).
+        with self._lock:
+            changed = {key: dict(self._items[key]) if key in self._items else None for key in self._dirty}
+            self._dirty.clear()
+            active = sum(state['fraction'] for state in self._items.values())
+            bandwidth = sum(state['speed'] or 0.0 for state in self._items.values())
+            return changed, (self.completed + active) / self.total if self.total else 0.0, bandwidth
+
+@dataclasses.dataclass(frozen=True)
+class DownloadSettings:
+    # Immutable snapshot of everything that shapes a download; field names match settings.json.
+    format: str = FORMAT_OPTIONS[0]
+    quality: str = "1080p"
+    concurrent_downloads: int = 3
+    prefix_text: str = "Skylark"
+    add_numbering: bool = False
+    default_save_path: str = ""
+    use_default_path: bool = False
+    create_playlist_folder: bool = True
+    audio_bitrate: str = "192K"
+    embed_metadata: bool = True
+    embed_thumbnail: bool = True
+    download_subtitles: bool = False
+    download_all_subtitles: bool = False
+    subtitle_lang: str = "English (en)"
+    inprocess_engine: bool = True
+    adaptive_concurrency: bool = True
+    detail_fetch_workers: int = 3
+    download_archive: str = ""
+    extra_audio: str = "None"
+    subtitle_files: bool = False
+    library_index: str = ""
+    staging_dir: str = ""
+    max_retries: int = 3
+    shortest_first: bool = False
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "DownloadSettings":
+        kwargs = {}
+        for field in dataclasses.fields(cls):
+            if field.name not in values or values[field.name] is None: continue
+            value = values[field.name]
+            if field.name in ("format", "extra_audio"): value = RENAMED_FORMATS.get(value, value)
+            if field.type in (bool, "bool"): kwargs[field.name] = value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "yes", "on")
+            elif field.type in (int, "int"): kwargs[field.name] = int(value)
+            else: kwargs[field.name] = str(value)
+        return cls(**kwargs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dataclasses.asdict(self)
+
+    def replace(self, **changes) -> "DownloadSettings":
+        return dataclasses.replace(self, **changes)
+
+    @property
+    def is_audio(self) -> bool:
+        return "Audio" in self.format
+
+    @property
+    def audio_mode(self) -> Tuple[str, Optional[str]]:
+        return AUDIO_MODES.get(self.format, AUDIO_MODES["MP3 - Audio Only"])
+
+    def output_settings(self) -> List["DownloadSettings"]:
+        # One settings variant per output of a job: the selected format, plus an audio file derived
+        # from the same download when a video job also asks for one.
+        outputs = [self]
+        if not self.is_audio and self.extra_audio in AUDIO_MODES: outputs.append(self.replace(format=self.extra_audio, extra_audio="None"))
+        return outputs
+
+    @property
+    def writes_thumbnail(self) -> bool:
+        return self.embed_thumbnail and any(output.is_audio for output in self.output_settings())
+
+    @property
+    def subtitle_code(self) -> str:
+        match = re.search(r'\((\w+)\)', self.subtitle_lang)
+        return match.group(1) if match else "en"
+
+def probe_dependencies(timeout: float = 15) -> Dict[str, Any]:
+    # Locates yt-dlp and ffmpeg and asks yt-dlp for its version; slow enough (a process start) that
+    # callers cache the result and re-run this in the background.
+    yt_dlp, ffmpeg, version = shutil.which("yt-dlp"), shutil.which("ffmpeg"), None
+    if yt_dlp:
+        try: version = subprocess.run([yt_dlp, '--version'], capture_output=True, text=True, timeout=timeout, creationflags=POPEN_FLAGS).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError): pass
+    return {"yt_dlp": yt_dlp, "ffmpeg": ffmpeg, "yt_dlp_version": version, "checked_at": time.time()}
+
+def details_from_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    thumbnail_url = info.get('thumbnail')
+    if thumbnails := info.get('thumbnails', []):
+        best_thumb = next((t['url'] for t in reversed(thumbnails) if t.get('width', 0) and t['width'] <= 480), None)
+        thumbnail_url = best_thumb or thumbnails[-1].get('url')
+    return {'title': info.get('title', 'Untitled'), 'uploader': info.get('uploader', 'N/A'), 'subtitles': sorted(list(info.get('subtitles', {}).keys())), 'thumbnail_url': thumbnail_url, 'duration': info.get('duration', 0), 'view_count': info.get('view_count', 0)}
+
+def item_from_entry(info: Dict[str, Any]) -> Optional[QueueItem]:
+    # Turns one yt-dlp -j / --flat-playlist entry into a queue item; None for private/deleted videos.
+    if info.get('title') in UNAVAILABLE_TITLES: return None
+    raw_url = info.get('webpage_url', info.get('url'))
+    video_id = info.get('id') if info.get('ie_key', 'Youtube') == 'Youtube' and info.get('id') else canonical_video_id(raw_url)
+    needs_details = 'duration' not in info
+    item = QueueItem(canonical_video_url(video_id) if video_id else raw_url, video_id=video_id, title=info.get('title', 'Untitled'), playlist_title=info.get('playlist_title'), uploader=info.get('uploader', 'N/A'), subtitles=sorted(list(info.get('subtitles', {}).keys())), thumbnail_url=info.get('thumbnail'), duration=info.get('duration', 0), view_count=info.get('view_count', 0), needs_details=needs_details)
+    if not needs_details: item.update(details_from_info(info))
+    return item
+
+def extract_stream(url: str, cancel_event: threading.Event, engine: Optional[YtDlpEngine] = None, batch_size: int = 50, flush_interval: float = 0.25, playlist_start: int = 1) -> Iterator[Tuple[List[Dict[str, Any]], str]]:
+    # Yields (entries, stderr) batches of a --flat-playlist enumeration as they arrive.
+    if engine is not None:
+        try: return (yield from engine.extract_stream(url, cancel_event, batch_size, playlist_start))
+        except EngineUnavailable as e: print(f"In-process engine unavailable, falling back to subprocess: {e}")
+    command = ['yt-dlp', '-j', '--flat-playlist', '--ignore-errors', '--no-warnings', *(['--playlist-start', str(playlist_start)] if playlist_start > 1 else []), url]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace', creationflags=POPEN_FLAGS)
+    batch, last_flush = [], time.monotonic()
+    for line in iter(process.stdout.readline, ''):
+        if cancel_event.is_set():
+            process.terminate()
+            break
+        if not line.strip(): continue
+        batch.append(json.loads(line))
+        if len(batch) >= batch_size or time.monotonic() - last_flush > flush_interval:
+            yield batch, ""
+            batch, last_flush = [], time.monotonic()
+    process.stdout.close()
+    return_code = process.wait()
+    stderr_output = process.stderr.read()
+    process.stderr.close()
+    yield batch, stderr_output if return_code != 0 and not cancel_event.is_set() else ""
+
+def fetch_details_batch(urls: List[str], engine: Optional[YtDlpEngine] = None) -> Iterable[Tuple[str, Optional[Dict[str, Any]], str]]:
+    if engine is not None:
+        try: return engine.extract_batch(urls)
+        except EngineUnavailable as e: print(f"In-process engine unavailable, falling back to subprocess: {e}")
+    return _fetch_details_batch_subprocess(urls)
+
+def _fetch_details_batch_subprocess(urls: List[str]) -> Iterator[Tuple[str, Optional[Dict[str, Any]], str]]:
+    command = ['yt-dlp', '-j', '--no-playlist', '--ignore-errors', '--no-warnings', *urls]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace', creationflags=POPEN_FLAGS)
+    remaining = set(urls)
+    for line in iter(process.stdout.readline, ''):
+        if not line.strip(): continue
+        info = json.loads(line)
+        if url := next((u for u in (info.get('original_url'), info.get('webpage_url')) if u in remaining), None):
+            remaining.discard(url)
+            yield url, info, ""
+    process.stdout.close()
+    process.wait()
+    stderr_output = process.stderr.read()
+    process.stderr.close()
+    # "ERROR: [youtube] <id>: ..." lines go to their video; the others (network errors and the
+    # like) are reported for every URL that has no line of its own.
+    by_video: Dict[str, List[str]] = {}
+    general: List[str] = []
+    for line in stderr_output.splitlines():
+        if match := VIDEO_ERROR_PATTERN.match(line): by_video.setdefault(match.group(1), []).append(line)
+        elif line.strip(): general.append(line)
+    for url in urls:
+        if url in remaining: yield url, None, "\n".join(by_video.get(canonical_video_id(url) or "", general)) or "Unknown yt-dlp error."
+
+def output_template(settings: DownloadSettings, item: QueueItem, save_path: str, idx: int) -> str:
+    prefix = "".join(i for i in settings.prefix_text.strip() if i not in INVALID_FILENAME_CHARS)
+    filename_prefix = f"[{prefix}] " if prefix else ""
+    number_prefix = f"{idx + 1:02d} - " if settings.add_numbering else ""
+    final_path = save_path
+    if settings.create_playlist_folder and item.playlist_title:
+        sane_playlist_title = "".join(i for i in item.playlist_title if i not in INVALID_FILENAME_CHARS)
+        final_path = os.path.join(save_path, sane_playlist_title)
+    filename = f"{number_prefix}{filename_prefix}%(title)s"
+    if not settings.is_audio: filename += f" - {settings.quality}"
+    return os.path.join(final_path, f"{filename}.%(ext)s")
+
+def stream_format(settings: DownloadSettings) -> str:
+    # Streams are fetched as separate files ("v,a" rather than "v+a"); merging and transcoding are
+    # left to the post-processing stage so the network slot is released as soon as bytes are in.
+    if settings.is_audio: return settings.audio_mode[0]
+    video_format, audio_format = QUALITY_MAP.get(settings.quality, QUALITY_MAP["Highest"])
+    # The extra audio output is cut from this same stream, so ask for the codec its mode copies
+    # (AAC for M4A) when the quality leaves the choice open; otherwise it has to be transcoded.
+    if settings.extra_audio in AUDIO_MODES and audio_format == "bestaudio": audio_format = AUDIO_MODES[settings.extra_audio][0]
+    return f"{video_format},{audio_format}"
+
+def work_templates(work_dir: str) -> Dict[str, str]:
+    return {'default': os.path.join(work_dir, "media.%(format_id)s.%(ext)s"), 'subtitle': os.path.join(work_dir, "media.%(ext)s"), 'thumbnail': os.path.join(work_dir, "media.%(ext)s")}
+
+def build_command(settings: DownloadSettings, item: QueueItem, work_dir: str) -> List[str]:
+    command = ['yt-dlp', '-f', stream_format(settings)]
+    if settings.writes_thumbnail: command.extend(['--write-thumbnail', '--convert-thumbnails', 'jpg'])
+    if settings.download_subtitles and not settings.is_audio: command.extend(['--write-subs', '--sub-langs', 'all' if settings.download_all_subtitles else settings.subtitle_code])
+    # --print implies --quiet; --progress keeps the progress lines and --no-simulate the download.
+    command.extend(['--ignore-errors', '--continue', '--no-simulate', '--progress', '--print', f"after_move:{FILE_PREFIX} %(filepath)s", '--print', f"after_move:{META_PREFIX} %(.{{{','.join(META_FIELDS)}}})j"])
+    for kind, template in work_templates(work_dir).items(): command.extend(['-o', template if kind == 'default' else f"{kind}:{template}"])
+    command.extend(['--newline', '--progress-template', PROGRESS_TEMPLATE, item.url])
+    return command
+
+def build_options(settings: DownloadSettings, item: QueueItem, work_dir: str) -> Dict[str, Any]:
+    # Mirrors build_command as YoutubeDL params, so both backends leave identical files behind.
+    options: Dict[str, Any] = {'ignoreerrors': True, 'noprogress': True, 'continuedl': True, 'format': stream_format(settings), 'outtmpl': work_templates(work_dir), 'postprocessors': []}
+    if settings.writes_thumbnail:
+        options['writethumbnail'] = True
+        options['postprocessors'].append({'key': 'FFmpegThumbnailsConvertor', 'format': 'jpg', 'when': 'before_dl'})
+    if settings.download_subtitles and not settings.is_audio: options.update({'writesubtitles': True, 'subtitleslangs': ['all'] if settings.download_all_subtitles else [settings.subtitle_code]})
+    return options
+
+def run_download_subprocess(command: List[str], on_progress: Callable[[Dict[str, Any]], None], on_start: Optional[Callable[[subprocess.Popen], None]] = None) -> subprocess.CompletedProcess:
+    # yt-dlp prints one machine-readable progress line per update (see PROGRESS_TEMPLATE); the
+    # remaining output is kept for error reporting. `on_start` gets the process, so it can be terminated.
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace', creationflags=POPEN_FLAGS)
+    if on_start: on_start(process)
+    output = []
+    for line in iter(process.stdout.readline, ''):
+        if (event := parse_progress_line(line)) is not None: on_progress(event)
+        elif line.strip(): output.append(line.rstrip())
+    process.stdout.close()
+    output_text = "\n".join(output)
+    return subprocess.CompletedProcess(command, process.wait(), output_text, output_text)
@@ -0,0 +1,64 @@
+import collections, time
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple, Callable, Optional
+
+@dataclass(frozen=True)
+class StatusEvent:
+    message: str
+    color: str = "white"
+
+@dataclass(frozen=True)
+class ItemChanged:
+    item: Any
+
+@dataclass(frozen=True)
+class CallEvent:
+    fn: Callable
+    args: Tuple = ()
+
+class EventBus:
+    # Worker threads `post()` typed events onto a deque (append/popleft are atomic, so no lock);
+    # the Tk loop calls `drain()` on a fixed timer. Only the newest StatusEvent survives a drain and
+    # ItemChanged events collapse to one per item, so a burst of worker messages costs the main
+    # loop one status update and one row refresh per item instead of one callback per message.
+    def __init__(self):
+        self._events: collections.deque = collections.deque()
+        self.coalesced = 0
+
+    def post(self, event): self._events.append(event)
+
+    def status(self, message: str, color: str = "white"): self.post(StatusEvent(message, color))
+    def item_changed(self, item): self.post(ItemChanged(item))
+    def call(self, fn: Callable, *args): self.post(CallEvent(fn, args))
+
+    def pending_count(self) -> int:
+        return len(self._events)
+
+    def drain(self, max_events: Optional[int] = None) -> Tuple[List[CallEvent], Dict[int, Any], Optional[StatusEvent]]:
+        # Takes at most the events present on entry, so workers posting during a drain cannot starve the loop.
+        count = len(self._events) if max_events is None else min(max_events, len(self._events))
+        calls: List[CallEvent] = []
+        items: Dict[int, Any] = {}
+        status: Optional[StatusEvent] = None
+        for _ in range(count):
+            event = self._events.popleft()
+            if isinstance(event, StatusEvent): status = event
+            elif isinstance(event, ItemChanged): items[id(event.item)] = event.item
+            else: calls.append(event)
+        self.coalesced += count - len(calls) - len(items) - (status is not None)
+        return calls, items, status
+
+class DrainTimer:
+    # Tracks how late the periodic drain fires; `lateness()` is the Tk loop latency seen by workers.
+    def __init__(self, window: int = 256):
+        self._late: collections.deque = collections.deque(maxlen=window)
+        self._expected: Optional[float] = None
+
+    def tick(self, interval: float):
+        now = time.perf_counter()
+        if self._expected is not None: self._late.append(max(0.0, now - self._expected))
+        self._expected = now + interval
+
+    def lateness(self) -> Dict[str, Optional[float]]:
+        values = sorted(self._late)
+        return {"p50": values[len(values) // 2] if values else None, "max": values[-1] if values else None}
@@ -0,0 +1,63 @@
+import json, threading, time
+from typing import List, Iterable, Optional
+from skylark_queue import QueueItem
+from skylark_db import connect, transaction
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+JOURNAL_FIELDS = ('url', 'video_id', 'title', 'playlist_title', 'uploader', 'subtitles', 'thumbnail_url', 'duration', 'view_count', 'needs_details', 'priority', 'paused')
+
+class JobJournal:
+    # Durable record of every queued download (SQLite, WAL): one row per item key with its state,
+    # output path and last error, written as the state changes so a crash or restart can rebuild
+    # the unfinished part of the queue in its original order. Finished rows are kept for
+    # `retention` seconds as history and then pruned.
+    def __init__(self, path: str, retention: float = 30 * 24 * 3600):
+        self.path, self.retention = path, retention
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS jobs (key TEXT PRIMARY KEY, position INTEGER NOT NULL, data TEXT NOT NULL, state TEXT NOT NULL, output_path TEXT, error TEXT, updated_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, position)")
+        with self._lock: self._conn.execute("DELETE FROM jobs WHERE state = ? AND updated_at < ?", (DONE, time.time() - retention))
+
+    def add_many(self, items: Iterable[QueueItem]):
+        now = time.time()
+        with self._lock, transaction(self._conn):
+            position = self._conn.execute("SELECT COALESCE(MAX(position), 0) FROM jobs").fetchone()[0]
+            rows = [(item.key, position + i, json.dumps({name: getattr(item, name) for name in JOURNAL_FIELDS}), QUEUED, now) for i, item in enumerate(items, 1)]
+            self._conn.executemany("INSERT OR REPLACE INTO jobs (key, position, data, state, output_path, error, updated_at) VALUES (?, ?, ?, ?, NULL, NULL, ?)", rows)
+
+    def update_details(self, item: QueueItem):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET data = ? WHERE key = ?", (json.dumps({name: getattr(item, name) for name in JOURNAL_FIELDS}), item.key))
+
+    def mark(self, key: str, state: str, output_path: Optional[str] = None, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET state = ?, output_path = COALESCE(?, output_path), error = ?, updated_at = ? WHERE key = ?", (state, output_path, error, time.time(), key))
+
+    def reorder(self, keys: List[str]):
+        # Gives `keys` the positions they already hold between them, in the new order, so a restart keeps a manual reordering.
+        with self._lock, transaction(self._conn):
+            rows = self._conn.execute(f"SELECT key, position FROM jobs WHERE key IN ({','.join('?' * len(keys))})", keys).fetchall()
+            present = set(key for key, _ in rows)
+            self._conn.executemany("UPDATE jobs SET position = ? WHERE key = ?", list(zip(sorted(position for _, position in rows), [key for key in keys if key in present])))
+
+    def remove_many(self, keys: Iterable[str]):
+        with self._lock, transaction(self._conn):
+            self._conn.executemany("DELETE FROM jobs WHERE key = ? AND state != ?", [(key, DONE) for key in keys])
+
+    def clear_pending(self):
+        with self._lock: self._conn.execute("DELETE FROM jobs WHERE state != ?", (DONE,))
+
+    def pending(self, include_failed: bool = False) -> List[QueueItem]:
+        # Items still queued, or running when the previous session ended; yt-dlp resumes their
+        # .part files because the output template is rebuilt identically. Failed items come back
+        # with their reason in `error` when asked for.
+        states = (QUEUED, RUNNING, FAILED) if include_failed else (QUEUED, RUNNING)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT data, error FROM jobs WHERE state IN ({','.join('?' * len(states))}) ORDER BY position", states).fetchall()
+        items = [QueueItem(**json.loads(data)) for data, _ in rows]
+        for item, (_, error) in zip(items, rows): item.error = error
+        return items
+
+    def close(self):
+        with self._lock: self._conn.close()
@@ -0,0 +1,149 @@
+import contextlib, hashlib, json, os, re, shutil, struct, threading, time
+from typing import List, Dict, Any, Optional, Tuple
+from skylark_engine import DownloadSettings, RENAMED_FORMATS
+from skylark_db import connect, transaction
+
+MEDIA_EXTENSIONS = (".mp4", ".m4a", ".mp3", ".opus", ".mka", ".webm", ".ogg")
+# Custom tags naming the output profile and the source URL of a file Skylark wrote.
+PROFILE_TAG, URL_TAG = "skylark_profile", "skylark_url"
+HEAD_BYTES, TAIL_BYTES = 256 * 1024, 64 * 1024
+FICLONE = 0x40049409
+PROFILE_FORMAT_NAMES = {label: earlier for earlier, label in RENAMED_FORMATS.items()}
+# A tag's name and value sit a few bytes apart in every container ("name=value" in Vorbis comments
+# and the MP4 keywords atom, "name\0value" in ID3 TXXX frames, EBML headers in Matroska).
+_PROFILE_PATTERN = re.compile(rb"(?i:" + PROFILE_TAG.encode('ascii') + rb").{1,16}?([0-9a-f]{12})", re.DOTALL)
+_VIDEO_ID_PATTERN = re.compile(rb"(?i:" + URL_TAG.encode('ascii') + rb").{1,16}?https?://[^\s\x00]*?(?:youtube\.com/watch\?v=|youtu\.be/)([A-Za-z0-9_-]{11})", re.DOTALL)
+
+def output_profile(settings: DownloadSettings) -> str:
+    # Short hash of the settings that change the bytes of one output; filename options are left
+    # out, so the same video rendered the same way matches whatever folder or name it ended up with.
+    # Renamed formats hash under their earlier label so files indexed before the rename still match.
+    profile: Dict[str, Any] = {"format": PROFILE_FORMAT_NAMES.get(settings.format, settings.format), "metadata": settings.embed_metadata}
+    if settings.is_audio:
+        # Opus files carry no cover art, so the thumbnail option does not change them.
+        if settings.audio_mode[1] != "opus": profile["thumbnail"] = settings.embed_thumbnail
+        if settings.audio_mode[1] in ("mp3", "opus"): profile["bitrate"] = settings.audio_bitrate
+    else:
+        profile["quality"] = settings.quality
+        if settings.download_subtitles: profile["subtitles"] = "all" if settings.download_all_subtitles else settings.subtitle_lang
+    return hashlib.sha1(json.dumps(profile, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+def _mp4_udta(f) -> bytes:
+    # Walks the top-level boxes to moov and returns its udta box, which carries the iTunes tags.
+    def boxes(end: int):
+        while f.tell() + 8 <= end:
+            start = f.tell()
+            size, kind = struct.unpack(">I4s", f.read(8))
+            if size == 1: size = struct.unpack(">Q", f.read(8))[0]
+            elif size == 0: size = end - start
+            if size < 8: return
+            yield kind, start, size
+            f.seek(start + size)
+    end = f.seek(0, os.SEEK_END)
+    f.seek(0)
+    for kind, start, size in boxes(end):
+        if kind != b"moov": continue
+        f.seek(start + 8)
+        for child, child_start, child_size in boxes(start + size):
+            if child == b"udta":
+                f.seek(child_start)
+                return f.read(min(child_size, HEAD_BYTES))
+    return b""
+
+def read_tags(path: str) -> Optional[Tuple[str, str]]:
+    # (video ID, profile) from the URL and profile tags written with embedded metadata;
+    # only the tag area is read (udta for MP4/M4A, head and tail of the file otherwise).
+    try:
+        with open(path, 'rb') as f:
+            if path.lower().endswith((".mp4", ".m4a")): data = _mp4_udta(f)
+            else:
+                data = f.read(HEAD_BYTES)
+                size = f.seek(0, os.SEEK_END)
+                if size > HEAD_BYTES:
+                    f.seek(max(HEAD_BYTES, size - TAIL_BYTES))
+                    data += f.read()
+    except (OSError, struct.error): return None
+    profile, video_id = _PROFILE_PATTERN.search(data), _VIDEO_ID_PATTERN.search(data)
+    return (video_id.group(1).decode('ascii'), profile.group(1).decode('ascii')) if profile and video_id else None
+
+def _reflink(source: str, target: str):
+    import fcntl
+    with open(source, 'rb') as src, open(target, 'wb') as dst: fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+def place_file(source: str, target: str) -> str:
+    # Puts a copy of `source` at `target` as cheaply as the filesystem allows: a reflink (shared
+    # copy-on-write blocks), else a hardlink, else a plain copy. Returns the method used.
+    if os.path.exists(target) and os.path.samefile(source, target): return "existing"
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    part = target + ".part"
+    with contextlib.suppress(FileNotFoundError): os.remove(part)
+    for method, place in (("reflink", _reflink), ("hardlink", os.link), ("copy", shutil.copyfile)):
+        try:
+            place(source, part)
+            break
+        except (OSError, ImportError):
+            with contextlib.suppress(FileNotFoundError): os.remove(part)
+            if method == "copy": raise
+    os.replace(part, target)
+    return method
+
+class LibraryIndex:
+    # SQLite (WAL) map of video ID + output profile to finished files. Each save folder is scanned
+    # once for files carrying our tags; after that the runner records every output it writes or
+    # places. A row whose file went missing or changed size is dropped when it is looked up.
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, video_id TEXT NOT NULL, profile TEXT NOT NULL, size INTEGER NOT NULL, added_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_video ON files (video_id, profile)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY, scanned_at REAL NOT NULL)")
+
+    def add(self, video_id: str, profile: str, path: str):
+        path = os.path.abspath(path)
+        with self._lock: self._conn.execute("INSERT OR REPLACE INTO files (path, video_id, profile, size, added_at) VALUES (?, ?, ?, ?, ?)", (path, video_id, profile, os.path.getsize(path), time.time()))
+
+    def lookup(self, video_id: Optional[str], profile: str) -> Optional[str]:
+        if not video_id: return None
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size FROM files WHERE video_id = ? AND profile = ? ORDER BY added_at DESC", (video_id, profile)).fetchall()
+            for path, size in rows:
+                try:
+                    if os.path.getsize(path) == size:
+                        self.hits += 1
+                        return path
+                except OSError: pass
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self.misses += 1
+        return None
+
+    def is_scanned(self, root: str) -> bool:
+        root = os.path.abspath(root)
+        with self._lock: roots = [path for path, in self._conn.execute("SELECT path FROM roots")]
+        return any(root == path or root.startswith(path.rstrip(os.sep) + os.sep) for path in roots)
+
+    def scan(self, root: str, skip_dirs: Tuple[str, ...] = ()) -> int:
+        # One pass over `root`; files that are already indexed are not opened again. Returns the number of files added.
+        root = os.path.abspath(root)
+        with self._lock: known = {path for path, in self._conn.execute("SELECT path FROM files")}
+        found: List[Tuple[str, str, str, int]] = []
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d not in skip_dirs]
+            for name in files:
+                path = os.path.join(directory, name)
+                if not name.lower().endswith(MEDIA_EXTENSIONS) or path in known: continue
+                if tags := read_tags(path):
+                    with contextlib.suppress(OSError): found.append((path, *tags, os.path.getsize(path)))
+        now = time.time()
+        with self._lock, transaction(self._conn):
+            self._conn.executemany("INSERT OR REPLACE INTO files (path, video_id, profile, size, added_at) VALUES (?, ?, ?, ?, ?)", [(path, video_id, profile, size, now) for path, video_id, profile, size in found])
+            self._conn.execute("INSERT OR REPLACE INTO roots (path, scanned_at) VALUES (?, ?)", (root, now))
+        return len(found)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock: files, = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()
+        return {"files": files, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock: self._conn.close()
@@ -0,0 +1,102 @@
+import contextlib, json, logging, logging.handlers, os, threading, time
+from collections import deque
+from typing import List, Dict, Any, Optional, Iterator
+
+QUANTILES = (0.5, 0.95)
+
+def _quantile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values: return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+class _StageStats:
+    __slots__ = ('count', 'errors', 'seconds', 'bytes', 'durations', 'waits')
+
+    def __init__(self, reservoir: int):
+        self.count = self.errors = self.bytes = 0
+        self.seconds = 0.0
+        self.durations: deque = deque(maxlen=reservoir)
+        self.waits: deque = deque(maxlen=reservoir)
+
+class Metrics:
+    # Lightweight stage tracing: `span()` times one unit of work and takes free-form attributes
+    # (bytes, exit_code, queue_wait, ...). Every span is appended to a rotating JSON-lines trace
+    # file (when `trace_path` is set) and folded into per-stage counters and a bounded reservoir of
+    # recent durations for p50/p95, which `summary()` and `prometheus_text()` report.
+    def __init__(self, trace_path: Optional[str] = None, max_bytes: int = 5_000_000, backups: int = 3, reservoir: int = 1024, throughput_window: float = 10.0, throughput_stages=("download",)):
+        self.throughput_window, self.throughput_stages = throughput_window, set(throughput_stages)
+        self._reservoir = reservoir
+        self._stages: Dict[str, _StageStats] = {}
+        self._transfers: deque = deque()
+        self._lock = threading.Lock()
+        # The rotating handler is owned by this instance and fed directly, not through a named logger,
+        # which the logging module would keep registered for the life of the process.
+        self._trace: Optional[logging.handlers.RotatingFileHandler] = None
+        if trace_path:
+            os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+            self._trace = logging.handlers.RotatingFileHandler(trace_path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True)
+            self._trace.setFormatter(logging.Formatter('%(message)s'))
+
+    @contextlib.contextmanager
+    def span(self, stage: str, **attrs) -> Iterator[Dict[str, Any]]:
+        started_at, started = time.time(), time.perf_counter()
+        try: yield attrs
+        except BaseException as e:
+            attrs.setdefault('error', repr(e)[:200])
+            raise
+        finally: self.record(stage, time.perf_counter() - started, attrs, started_at)
+
+    def record(self, stage: str, seconds: float, attrs: Optional[Dict[str, Any]] = None, started_at: Optional[float] = None):
+        attrs = attrs or {}
+        failed = bool(attrs.get('error')) or attrs.get('exit_code') not in (None, 0)
+        size = int(attrs.get('bytes') or 0)
+        with self._lock:
+            stats = self._stages.get(stage) or self._stages.setdefault(stage, _StageStats(self._reservoir))
+            stats.count += 1
+            stats.errors += failed
+            stats.seconds += seconds
+            stats.bytes += size
+            stats.durations.append(seconds)
+            if attrs.get('queue_wait') is not None: stats.waits.append(attrs['queue_wait'])
+            if size and stage in self.throughput_stages: self._transfers.append((time.monotonic(), size))
+        if (trace := self._trace) is not None: trace.handle(logging.makeLogRecord({'levelno': logging.INFO, 'levelname': 'INFO', 'msg': json.dumps({"stage": stage, "start": round(started_at or time.time() - seconds, 6), "seconds": round(seconds, 6), **attrs}, default=str)}))
+
+    def throughput(self) -> float:
+        # Bytes/s of spans in `throughput_stages` that finished within the last window.
+        cutoff = time.monotonic() - self.throughput_window
+        with self._lock:
+            while self._transfers and self._transfers[0][0] < cutoff: self._transfers.popleft()
+            return sum(size for _, size in self._transfers) / self.throughput_window
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock: stages = {name: (stats.count, stats.errors, stats.seconds, stats.bytes, sorted(stats.durations), sorted(stats.waits)) for name, stats in self._stages.items()}
+        return {name: {"count": count, "errors": errors, "seconds": seconds, "bytes": size, "p50": _quantile(durations, 0.5), "p95": _quantile(durations, 0.95), "wait_p50": _quantile(waits, 0.5), "wait_p95": _quantile(waits, 0.95)}
+                for name, (count, errors, seconds, size, durations, waits) in sorted(stages.items())}
+
+    def prometheus_text(self) -> str:
+        lines = ["# HELP skylark_stage_duration_seconds Duration of pipeline stages.", "# TYPE skylark_stage_duration_seconds summary"]
+        summary = self.summary()
+        for stage, stats in summary.items():
+            for q in QUANTILES:
+                if (value := stats[f"p{int(q * 100)}"]) is not None: lines.append(f'skylark_stage_duration_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'skylark_stage_duration_seconds_sum{{stage="{stage}"}} {stats["seconds"]:.6f}')
+            lines.append(f'skylark_stage_duration_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        for name, key, help_text in (("skylark_stage_errors_total", "errors", "Failed spans per stage."), ("skylark_stage_bytes_total", "bytes", "Bytes handled per stage.")):
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} counter"])
+            lines.extend(f'{name}{{stage="{stage}"}} {stats[key]}' for stage, stats in summary.items())
+        lines.extend(["# HELP skylark_stage_queue_wait_seconds Time spent waiting for a worker before the stage started.", "# TYPE skylark_stage_queue_wait_seconds gauge"])
+        for stage, stats in summary.items():
+            for q in QUANTILES:
+                if (value := stats[f"wait_p{int(q * 100)}"]) is not None: lines.append(f'skylark_stage_queue_wait_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+        lines.extend(["# HELP skylark_throughput_bytes_per_second Recent download throughput.", "# TYPE skylark_throughput_bytes_per_second gauge", f"skylark_throughput_bytes_per_second {self.throughput():.1f}"])
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f: f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def close(self):
+        if self._trace:
+            self._trace.close()
+            self._trace = None
@@ -0,0 +1,660 @@
+import concurrent.futures, contextlib, glob, hashlib, heapq, itertools, os, random, re, shutil, subprocess, threading, time
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from skylark_engine import YtDlpEngine, EngineUnavailable, ProgressTracker, DownloadSettings, INVALID_FILENAME_CHARS, POPEN_FLAGS, build_command, build_options, output_template, run_download_subprocess, output_paths_from, metadata_from
+from skylark_journal import QUEUED, RUNNING, DONE, FAILED
+from skylark_library import LibraryIndex, PROFILE_TAG, URL_TAG, output_profile, place_file
+from skylark_metrics import Metrics
+from skylark_queue import QueueItem
+
+WORK_DIR_NAME = ".skylark-work"
+MAX_DOWNLOADS = 16
+SUBTITLE_EXTENSIONS, THUMBNAIL_EXTENSIONS = (".srt", ".vtt", ".ass"), (".jpg", ".jpeg", ".png")
+# Output extension -> (ffmpeg muxer, takes cover art); SOURCE_AUDIO_EXTENSIONS picks the container a
+# downloaded audio stream can be copied into unchanged.
+AUDIO_CONTAINERS = {"mp3": ("mp3", True), "m4a": ("ipod", True), "opus": ("opus", False), "mka": ("matroska", False)}
+SOURCE_AUDIO_EXTENSIONS = {".webm": "opus", ".weba": "opus", ".opus": "opus", ".ogg": "opus", ".m4a": "m4a", ".mp4": "m4a", ".aac": "m4a", ".mp3": "mp3"}
+FFMPEG_MISSING = "Error: FFmpeg is required for merging and audio conversion."
+# Space estimates for admission control: rough stream bitrates (kbit/s) per quality, a duration for
+# items whose length is unknown, and the free space always left untouched.
+VIDEO_KBPS = {"Highest": 20000, "1080p": 5000, "720p": 2500, "480p": 1200, "Lowest": 300}
+AUDIO_KBPS, UNKNOWN_DURATION, MIN_FREE_BYTES = 160, 600, 512 * 1024 * 1024
+# Download failures are retried with jittered exponential backoff unless they are permanent; rate
+# limiting also trips the runner's CircuitBreaker. Anything unrecognised counts as retryable.
+RETRYABLE, RATE_LIMITED, PERMANENT = "retryable", "rate_limited", "permanent"
+RETRY_BASE_DELAY, RETRY_MAX_DELAY = 2.0, 60.0
+RATE_LIMIT_PATTERNS = re.compile(r"HTTP Error 429|Too Many Requests|confirm you.re not a bot|rate.limit|try again later", re.IGNORECASE)
+# Result levels of jobs stopped from outside, besides "ok", "warning" and "error": a cancelled job's
+# work files are removed, a paused one keeps them so its .part files resume when it is added again.
+CANCELLED, PAUSED = "cancelled", "paused"
+PERMANENT_PATTERNS = re.compile(r"Video unavailable|Private video|video is private|has been removed|copyright|members.only|Join this channel|confirm your age|Unsupported URL|not a valid URL|Requested format is not available|not available in your country|Premieres in|is not available|FFmpeg is required", re.IGNORECASE)
+# Exit codes that repeat on every try: yt-dlp's usage error (2) and a tool that cannot be run (126/127).
+PERMANENT_EXIT_CODES = (2, 126, 127)
+
+class DownloadArchive:
+    # yt-dlp compatible archive ("youtube <id>" per line). Checked before a job is started and only
+    # appended once its output is finalized, so a job that fails in post-processing is retried.
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f: self._entries = {line.strip() for line in f if line.strip()}
+
+    def __contains__(self, item: QueueItem) -> bool:
+        return bool(item.video_id) and f"youtube {item.video_id}" in self._entries
+
+    def add(self, item: QueueItem):
+        if not item.video_id or item in self: return
+        with self._lock:
+            self._entries.add(f"youtube {item.video_id}")
+            with open(self.path, 'a', encoding='utf-8') as f: f.write(f"youtube {item.video_id}\n")
+
+class DiskSpaceGuard:
+    # Admission control on free disk space. A job reserves its estimated bytes on each filesystem it
+    # writes to before it starts, and waits while free space minus the outstanding reservations minus
+    # `min_free` cannot hold it. Free space is re-read on every check, so space freed elsewhere is
+    # noticed within `poll` seconds. A job that is alone is always admitted, so an oversized job
+    # fails on its own instead of blocking the batch.
+    def __init__(self, min_free: int = MIN_FREE_BYTES, poll: float = 5.0):
+        self.min_free, self.poll = min_free, poll
+        self._cond = threading.Condition()
+        self._jobs: Dict[str, Dict[int, int]] = {}
+        self._reserved: Dict[int, int] = {}
+        self._paths: Dict[int, str] = {}
+
+    @staticmethod
+    def _existing(path: str) -> str:
+        path = os.path.abspath(path)
+        while not os.path.exists(path) and os.path.dirname(path) != path: path = os.path.dirname(path)
+        return path
+
+    def _fits(self, needs: Dict[int, int]) -> bool:
+        if not self._jobs: return True
+        for device, size in needs.items():
+            try: free = shutil.disk_usage(self._paths[device]).free
+            except OSError: continue
+            if free - self._reserved.get(device, 0) - self.min_free < size: return False
+        return True
+
+    def acquire(self, key: str, needs: Dict[str, int], stop: Optional[threading.Event] = None) -> float:
+        # `needs` maps a path to the bytes the job writes below it; returns the seconds spent waiting.
+        # Gives up without reserving anything once `stop` is set (see `wake()`).
+        by_device: Dict[int, int] = {}
+        for path, size in needs.items():
+            path = self._existing(path)
+            device = os.stat(path).st_dev
+            self._paths.setdefault(device, path)
+            by_device[device] = by_device.get(device, 0) + size
+        started = time.monotonic()
+        with self._cond:
+            while not self._fits(by_device):
+                if stop is not None and stop.is_set(): return time.monotonic() - started
+                self._cond.wait(self.poll)
+            self._jobs[key] = by_device
+            for device, size in by_device.items(): self._reserved[device] = self._reserved.get(device, 0) + size
+        return time.monotonic() - started
+
+    def release(self, key: str):
+        with self._cond:
+            for device, size in self._jobs.pop(key, {}).items(): self._reserved[device] -= size
+            self._cond.notify_all()
+
+    def wake(self):
+        with self._cond: self._cond.notify_all()
+
+def classify_error(stderr: str, returncode: Optional[int] = None) -> str:
+    # Rate limiting is checked first: YouTube's bot check also reads "video is not available" at times.
+    # A process killed by a signal (a negative code from Popen, 128+N through a shell) never got to
+    # its own verdict, so whatever it printed before is not taken as permanent.
+    if RATE_LIMIT_PATTERNS.search(stderr): return RATE_LIMITED
+    if returncode is not None and (returncode < 0 or 128 < returncode < 160): return RETRYABLE
+    if returncode in PERMANENT_EXIT_CODES: return PERMANENT
+    if PERMANENT_PATTERNS.search(stderr) or ("ffmpeg" in stderr.lower() and "not found" in stderr.lower()): return PERMANENT
+    return RETRYABLE
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    # "Equal jitter": half of the exponential delay is fixed, the other half random, so retries of a failed burst spread out.
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class CircuitBreaker:
+    # Pauses new downloads while the site is rate limiting. `trip()` opens the circuit for a
+    # cooldown that doubles with each consecutive trip (up to `max_cooldown`). When it expires, a
+    # single probe job is let through (half-open); any outcome of that probe other than another
+    # rate limit closes the circuit, and another rate limit re-opens it. Jobs pass a token (their
+    # ScheduledJob) so a late success from a job started before the trip is not taken for the probe's.
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, cooldown: float = 30.0, max_cooldown: float = 600.0):
+        self.cooldown, self.max_cooldown = cooldown, max_cooldown
+        self.state, self.trips = self.CLOSED, 0
+        self._consecutive, self._until, self._probing, self._prober = 0, 0.0, False, None
+        self._cond = threading.Condition()
+
+    def remaining(self) -> float:
+        return max(0.0, self._until - time.monotonic()) if self.state == self.OPEN else 0.0
+
+    def wait(self, stop: Optional[threading.Event] = None, token: Any = None) -> float:
+        # Blocks until a new job may start, or `stop` is set (see `wake()`); returns the seconds spent waiting.
+        started = time.monotonic()
+        with self._cond:
+            while self.state != self.CLOSED and not (stop is not None and stop.is_set()):
+                if self.state == self.OPEN:
+                    if (left := self._until - time.monotonic()) > 0:
+                        self._cond.wait(left)
+                        continue
+                    self.state, self._probing = self.HALF_OPEN, False
+                if not self._probing:
+                    self._probing, self._prober = True, token
+                    break
+                self._cond.wait()
+        return time.monotonic() - started
+
+    def trip(self) -> bool:
+        # Returns False when the circuit is already open (other jobs of the same burst failing).
+        with self._cond:
+            if self.state == self.OPEN: return False
+            self._consecutive += 1
+            self.trips += 1
+            self.state, self._probing = self.OPEN, False
+            self._until = time.monotonic() + min(self.max_cooldown, self.cooldown * 2 ** (self._consecutive - 1))
+            self._cond.notify_all()
+            return True
+
+    def record_success(self, token: Any = None):
+        with self._cond:
+            if self.state != self.HALF_OPEN or not self._probing or self._prober is not token: return
+            self.state, self._consecutive, self._probing = self.CLOSED, 0, False
+            self._cond.notify_all()
+
+    def abandon(self, token: Any = None):
+        # A probe stopped before it got an answer hands the probe to the next job.
+        with self._cond:
+            if self.state != self.HALF_OPEN or not self._probing or self._prober is not token: return
+            self._probing = False
+            self._cond.notify_all()
+
+    def wake(self):
+        with self._cond: self._cond.notify_all()
+
+class AdaptiveLimiter:
+    # Concurrency limit for network downloads that climbs while aggregate throughput keeps
+    # improving, steps back when it drops, and halves when too many downloads fail. Evaluated at
+    # most once per `window` seconds, whenever a slot is released.
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = MAX_DOWNLOADS, throughput: Optional[Callable[[], float]] = None, window: float = 3.0, error_threshold: float = 0.25):
+        self.minimum, self.maximum = minimum, max(minimum, maximum)
+        self.limit = min(self.maximum, max(minimum, initial))
+        self.throughput, self.window, self.error_threshold = throughput or (lambda: 0.0), window, error_threshold
+        self.active = 0
+        self._cond = threading.Condition()
+        self._window_start, self._completed, self._failed, self._best = time.monotonic(), 0, 0, 0.0
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit: self._cond.wait()
+            self.active += 1
+
+    def release(self, ok: bool = True, counted: bool = True):
+        # `counted=False` gives back a slot that did not carry a finished download (stopped or never used).
+        with self._cond:
+            self.active -= 1
+            if counted:
+                self._completed += 1
+                self._failed += 0 if ok else 1
+                self._adjust()
+            self._cond.notify_all()
+
+    def throttle(self):
+        # Immediate halving (rate limiting detected); growth restarts from the new level.
+        with self._cond:
+            self.limit, self._best = max(self.minimum, self.limit // 2), 0.0
+            self._window_start, self._completed, self._failed = time.monotonic(), 0, 0
+
+    def _adjust(self):
+        now = time.monotonic()
+        if now - self._window_start < self.window or self.maximum == self.minimum: return
+        rate, error_rate = self.throughput(), self._failed / self._completed
+        if error_rate > self.error_threshold: self.limit, self._best = max(self.minimum, self.limit // 2), 0.0
+        elif rate > self._best * 1.1: self.limit, self._best = min(self.maximum, self.limit + 1), rate
+        elif rate < self._best * 0.9: self.limit, self._best = max(self.minimum, self.limit - 1), rate
+        self._window_start, self._completed, self._failed = now, 0, 0
+
+def sanitize_filename(name: str) -> str:
+    return "".join(c for c in name if c not in INVALID_FILENAME_CHARS and ord(c) >= 32).strip().rstrip(".") or "Untitled"
+
+def final_path(template: str, title: str, ext: str) -> str:
+    return template.replace("%(title)s", sanitize_filename(title)).replace("%(ext)s", ext)
+
+def work_root(settings: DownloadSettings, save_path: str) -> str:
+    # Streams, .part files and renders go to the staging folder when one is set, else next to the outputs.
+    return os.path.join(settings.staging_dir or save_path, WORK_DIR_NAME)
+
+def work_dir_for(root: str, item: QueueItem) -> str:
+    return os.path.join(root, item.video_id or hashlib.sha1(item.url.encode('utf-8')).hexdigest()[:16])
+
+def estimate_job_bytes(settings: DownloadSettings, item: QueueItem) -> Tuple[int, int]:
+    # (downloaded streams, rendered outputs) from the queue's duration and the chosen quality, with 10% slack.
+    seconds = item.duration or UNKNOWN_DURATION
+    rate = lambda kbps: int(seconds * kbps * 1000 / 8 * 1.1)
+    streams = rate(AUDIO_KBPS if settings.is_audio else VIDEO_KBPS.get(settings.quality, VIDEO_KBPS["Highest"]) + AUDIO_KBPS)
+    outputs = sum(rate(int(output.audio_bitrate.rstrip("Kk") or AUDIO_KBPS) if output.audio_mode[1] in ("mp3", "opus") else AUDIO_KBPS) if output.is_audio else streams for output in settings.output_settings())
+    return streams, outputs
+
+def finalize(staged: str, target: str):
+    # Atomic at the destination: a rename on the same filesystem, else a copy to "<target>.part" that is renamed into place.
+    try: os.replace(staged, target)
+    except OSError:
+        shutil.copyfile(staged, target + ".part")
+        os.replace(target + ".part", target)
+        os.remove(staged)
+
+def output_extension(settings: DownloadSettings, streams: List[str]) -> str:
+    if not settings.is_audio: return "mp4"
+    return settings.audio_mode[1] or SOURCE_AUDIO_EXTENSIONS.get(os.path.splitext(streams[0])[1].lower(), "mka")
+
+def audio_codec_args(settings: DownloadSettings, source: str, extension: str) -> List[str]:
+    # Stream copy unless the target needs a different codec: always for MP3, for M4A when the source
+    # is not AAC/ALAC (the ipod muxer takes nothing else) and for Opus when it is not Opus, which
+    # happens when the format fallback delivered something else.
+    codec = SOURCE_AUDIO_EXTENSIONS.get(os.path.splitext(source)[1].lower())
+    if extension == "mp3": return ['-c:a', 'libmp3lame', '-b:a', settings.audio_bitrate.lower(), '-id3v2_version', '3']
+    if extension == "m4a" and codec != "m4a": return ['-c:a', 'aac', '-b:a', settings.audio_bitrate.lower()]
+    if extension == "opus" and codec != "opus": return ['-c:a', 'libopus', '-b:a', settings.audio_bitrate.lower()]
+    return ['-c:a', 'copy']
+
+def build_postprocess_command(settings: DownloadSettings, streams: List[str], work_dir: str, meta: Dict[str, Any], target: str, threads: int = 1) -> List[str]:
+    # One ffmpeg run per item: merge (stream copy), audio copy or MP3 transcode, plus subtitles,
+    # cover art and metadata. `-threads` keeps a pool of concurrent encodes from oversubscribing the CPU.
+    # Every -i has to precede the output options, so inputs and output options are collected apart.
+    inputs, output = [path for path in streams], []
+    extras = sorted(glob.glob(os.path.join(glob.escape(work_dir), "media.*")))
+    extension = output_extension(settings, streams)
+    if settings.is_audio:
+        muxer, takes_cover = AUDIO_CONTAINERS[extension]
+        output.extend(['-map', '0:a:0'])
+        thumbnails = [p for p in extras if p.lower().endswith(THUMBNAIL_EXTENSIONS)] if settings.embed_thumbnail and takes_cover else []
+        if thumbnails:
+            inputs.append(thumbnails[0])
+            output.extend(['-map', f'{len(streams)}:v:0', '-c:v', 'mjpeg', '-disposition:v:0', 'attached_pic', '-metadata:s:v', 'title=Album cover', '-metadata:s:v', 'comment=Cover (front)'])
+        output.extend(audio_codec_args(settings, streams[0], extension))
+    else:
+        muxer = 'mp4'
+        output.extend(['-map', '0:v:0', '-map', '1:a:0'] if len(streams) > 1 else ['-map', '0'])
+        subtitles = [p for p in extras if p.lower().endswith(SUBTITLE_EXTENSIONS)] if settings.download_subtitles else []
+        for n, path in enumerate(subtitles):
+            language = os.path.basename(path).split(".")[-2] if os.path.basename(path).count(".") >= 2 else "und"
+            inputs.append(path)
+            output.extend(['-map', f'{len(streams) + n}:s:0', f'-metadata:s:s:{n}', f'language={language}'])
+        output.extend(['-c', 'copy', '-c:s', 'mov_text', '-movflags', '+faststart'])
+    if settings.embed_metadata:
+        # The fields yt-dlp's --add-metadata writes, plus the profile and URL tags a library scan
+        # recognises the file by. The MP4 muxers drop custom tags unless every tag is written in the
+        # QuickTime form, which iTunes-style players don't read, so there they share the keywords atom.
+        url, description = meta.get('webpage_url'), meta.get('description')
+        tags = {'title': meta.get('track') or meta.get('title'), 'artist': meta.get('artist') or meta.get('uploader'), 'album': meta.get('album'), 'date': meta.get('upload_date'),
+                'description': description, 'synopsis': description, 'purl': url, 'comment': url}
+        library_tags = {PROFILE_TAG: output_profile(settings), URL_TAG: url}
+        if muxer in ('mp4', 'ipod'): tags['keywords'] = " ".join(f"{key}={value}" for key, value in library_tags.items() if value)
+        else: tags.update(library_tags)
+        for key, value in tags.items():
+            if value: output.extend(['-metadata', f"{key}={value}"])
+    command = ['ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'error', '-y']
+    for path in inputs: command.extend(['-i', path])
+    command.extend([*output, '-threads', str(threads), '-f', muxer, target])
+    return command
+
+def copy_subtitle_files(work_dir: str, target: str):
+    # Sidecar copies named like the output ("<name>.en.vtt"), next to the embedded track.
+    for path in sorted(glob.glob(os.path.join(glob.escape(work_dir), "media.*"))):
+        if path.lower().endswith(SUBTITLE_EXTENSIONS): shutil.copyfile(path, os.path.splitext(target)[0] + os.path.basename(path)[len("media"):])
+
+def error_message(stderr: str, item: QueueItem) -> str:
+    error_lines = [line for line in stderr.strip().split('\n') if line.startswith('ERROR')] or stderr.strip().split('\n')
+    if "ffmpeg" in stderr.lower() and "not found" in stderr.lower(): return FFMPEG_MISSING
+    return error_lines[-1] if stderr.strip() else f"Download failed for {item.title[:30]}..."
+
+def schedule_key(item: QueueItem, shortest_first: bool, seq: int) -> Tuple[int, float, int]:
+    # Higher priority first; then, with shortest_first, the shorter item (unknown lengths count as
+    # UNKNOWN_DURATION) so more items finish per minute; then queue order.
+    return (-(item.priority or 0), (item.duration or UNKNOWN_DURATION) if shortest_first else 0, seq)
+
+class ScheduledJob:
+    # One item of a running batch: its place in the heap, whether a dispatcher has taken it, and
+    # the process it is running (yt-dlp or ffmpeg) so `cancel()`/`pause()` can terminate it.
+    __slots__ = ('item', 'idx', 'seq', 'entry', 'started', 'stop', 'event', 'process')
+
+    def __init__(self, item: QueueItem, idx: int, seq: int):
+        self.item, self.idx, self.seq, self.entry = item, idx, seq, None
+        self.started, self.stop, self.event, self.process = False, None, threading.Event(), None
+
+class DownloadRunner:
+    # Two-stage pipeline over a fixed settings snapshot. Stage one fetches the raw streams of an
+    # item into a work directory under an AdaptiveLimiter; stage two runs ffmpeg on a separate pool
+    # sized to the CPU, so encodes never hold a network slot and downloads never wait on merges.
+    # Each result is a (level, message) pair where level is "ok", "warning" or "error"; with a
+    # journal every state change (running, done with its output path, failed with its reason) is
+    # recorded. With a library index, a job whose outputs already exist anywhere in the library is
+    # satisfied by placing those files instead of downloading it again. With a staging folder all
+    # intermediate files live there and only finished outputs are moved into the save folder; a
+    # DiskSpaceGuard holds jobs back until their estimated size fits on the disks they write to.
+    # Failed downloads are classified: permanent errors fail at once, others are retried with
+    # backoff up to `max_retries` times, and rate limiting trips a CircuitBreaker that pauses new
+    # starts and halves the concurrency.
+    # Jobs wait in a heap ordered by `schedule_key` and a dispatcher only picks the next one once it
+    # holds a limiter slot, so priority changes and items added with `add()` count until the moment
+    # a download starts. The batch ends when every job has finished; `cancel()` and `pause()` end a
+    # job early, terminating its process.
+    def __init__(self, settings: DownloadSettings, engine: Optional[YtDlpEngine] = None, tracker: Optional[ProgressTracker] = None, journal=None, postprocess_workers: Optional[int] = None, metrics: Optional[Metrics] = None):
+        self.settings, self.engine, self.journal = settings, engine, journal
+        self.metrics = metrics or Metrics()
+        self.tracker = tracker or ProgressTracker()
+        self.postprocess_workers = postprocess_workers or os.cpu_count() or 1
+        self.postprocess_threads = max(1, (os.cpu_count() or 1) // self.postprocess_workers)
+        maximum = MAX_DOWNLOADS if settings.adaptive_concurrency else settings.concurrent_downloads
+        self.limiter = AdaptiveLimiter(settings.concurrent_downloads, maximum=maximum, throughput=self.tracker.bandwidth)
+        self.archive = DownloadArchive(settings.download_archive) if settings.download_archive else None
+        self.library: Optional[LibraryIndex] = None
+        self.space = DiskSpaceGuard()
+        self.breaker = CircuitBreaker()
+        self._results: List[Tuple[QueueItem, str, str]] = []
+        self._results_lock = threading.Lock()
+        self._on_result: Optional[Callable[[QueueItem, str, str], None]] = None
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._resumed: Dict[str, QueueItem] = {}
+        self._heap: List[Tuple[Tuple[int, float, int], str]] = []
+        self._cond = threading.Condition()
+        self._open, self._save_path = False, ""
+        self._seq, self._indices = itertools.count(), itertools.count()
+
+    def run(self, items: List[QueueItem], save_path: str, on_result: Optional[Callable[[QueueItem, str, str], None]] = None, first_index: int = 0) -> List[Tuple[QueueItem, str, str]]:
+        self._results, self._on_result, self._save_path = [], on_result, save_path
+        with self._cond:
+            self._jobs, self._resumed, self._heap, self._indices, self._open = {}, {}, [], itertools.count(first_index), True
+            self._schedule(items)
+            self._open = bool(self._jobs)
+        try:
+            if self.engine is not None: self.engine.resize(self.limiter.maximum)
+            if self.settings.library_index: self.library = self._open_library(save_path)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.postprocess_workers, thread_name_prefix="postprocess") as postprocess:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=self.limiter.maximum, thread_name_prefix="download") as downloads:
+                    for future in [downloads.submit(self._dispatch, postprocess) for _ in range(self.limiter.maximum)]: future.result()
+        finally:
+            # A setup failure (e.g. an unopenable library index) ends the batch so `add()` stops accepting items.
+            with self._cond: self._open = False
+            if self.library is not None: self.library.close()
+            self.library = None
+        try: os.rmdir(work_root(self.settings, save_path))
+        except OSError: pass
+        return self._results
+
+    def add(self, items: List[QueueItem]) -> bool:
+        # Joins items to the running batch; False once the batch has ended (start a new run instead).
+        # An item whose job is still being paused or cancelled is scheduled again once that job ends.
+        with self._cond:
+            if not self._open: return False
+            self._schedule(items)
+            return True
+
+    def prioritize(self, key: str, priority: int) -> bool:
+        with self._cond:
+            if (job := self._jobs.get(key)) is None: return False
+            job.item.priority = priority
+            if not job.started: self._push(job)
+            return True
+
+    def reorder(self, keys: List[str]) -> bool:
+        # Hands the waiting jobs among `keys` the queue positions they already hold between them, in
+        # the new order, so jobs of equal priority start in the order shown.
+        with self._cond:
+            jobs = [job for key in keys if (job := self._jobs.get(key)) is not None and not job.started]
+            for job, seq in zip(jobs, sorted(job.seq for job in jobs)):
+                if job.seq == seq: continue
+                job.seq = seq
+                self._push(job)
+            return bool(jobs)
+
+    def cancel(self, key: str, level: str = CANCELLED) -> bool:
+        # Drops a waiting job, or stops a running one: its process is terminated and it finishes with
+        # `level` as soon as its worker notices, releasing the slot and any space reservation.
+        with self._cond:
+            if (job := self._jobs.get(key)) is None or job.stop: return False
+            job.stop = level
+            job.event.set()
+            waiting, process = not job.started, job.process
+        if waiting: self._stop(job)
+        elif process is not None and process.poll() is None: process.terminate()
+        self.breaker.wake()
+        self.space.wake()
+        return True
+
+    def pause(self, key: str) -> bool:
+        return self.cancel(key, PAUSED)
+
+    def _schedule(self, items: List[QueueItem]):
+        # Called with the lock held.
+        for item in items:
+            if (current := self._jobs.get(item.key)) is not None:
+                if current.stop: self._resumed[item.key] = item
+                continue
+            job = self._jobs[item.key] = ScheduledJob(item, next(self._indices), next(self._seq))
+            self.tracker.add_total(1)
+            self._push(job)
+        self._cond.notify_all()
+
+    def _push(self, job: ScheduledJob):
+        # A re-pushed job leaves its old entry behind; `_take()` skips entries that no longer match.
+        job.entry = schedule_key(job.item, self.settings.shortest_first, job.seq)
+        heapq.heappush(self._heap, (job.entry, job.item.key))
+        self._cond.notify_all()
+
+    def _take(self) -> Optional[ScheduledJob]:
+        while self._heap:
+            entry, key = heapq.heappop(self._heap)
+            if (job := self._jobs.get(key)) is not None and not job.started and not job.stop and job.entry == entry:
+                job.started = True
+                return job
+        return None
+
+    def _dispatch(self, postprocess: concurrent.futures.Executor):
+        # One per possible download slot. The next job is chosen only after a slot is free, and the
+        # slot is handed to `_fetch()` for its first attempt.
+        while True:
+            with self._cond:
+                while self._open and not self._heap: self._cond.wait()
+                if not self._open: return
+            self.limiter.acquire()
+            with self._cond: job = self._take()
+            if job is None:
+                self.limiter.release(counted=False)
+                continue
+            try: self._fetch(job, postprocess)
+            except Exception as e: self._finish(job.item, "error", f"An unexpected error occurred for '{job.item.title[:20]}...': {e}")
+
+    def _attach(self, job: ScheduledJob, process: Optional[subprocess.Popen]):
+        # Records the job's current process; one started after the job was stopped is terminated at once.
+        with self._cond:
+            job.process = process
+            stopped = job.stop is not None
+        if process is not None and stopped: process.terminate()
+
+    def _stop(self, job: ScheduledJob):
+        if job.stop == CANCELLED: shutil.rmtree(work_dir_for(work_root(self.settings, self._save_path), job.item), ignore_errors=True)
+        self._finish(job.item, job.stop, f"{'Cancelled' if job.stop == CANCELLED else 'Paused'} '{job.item.title[:20]}...'")
+
+    def _open_library(self, save_path: str) -> LibraryIndex:
+        library = LibraryIndex(self.settings.library_index)
+        if not library.is_scanned(save_path):
+            with self.metrics.span("library_scan", root=save_path) as span: span['files'] = library.scan(save_path, (WORK_DIR_NAME,))
+        return library
+
+    def _reuse(self, item: QueueItem, save_path: str, idx: int) -> Optional[Tuple[List[str], str]]:
+        # Places every output of the job from the library; returns (targets, method) only if all of them were found.
+        outputs = self.settings.output_settings()
+        sources = [self.library.lookup(item.video_id, output_profile(output)) for output in outputs]
+        if not all(sources): return None
+        targets, methods = [], set()
+        with self.metrics.span("library", key=item.key) as span:
+            try:
+                for output, source in zip(outputs, sources):
+                    target = final_path(output_template(output, item, save_path, idx), item.title, os.path.splitext(source)[1][1:])
+                    methods.add(place_file(source, target))
+                    self.library.add(item.video_id, output_profile(output), target)
+                    targets.append(target)
+                if self.settings.subtitle_files and self.settings.download_subtitles and not self.settings.is_audio:
+                    stem = os.path.splitext(sources[0])[0]
+                    for path in glob.glob(glob.escape(stem) + ".*"):
+                        if path.lower().endswith(SUBTITLE_EXTENSIONS): place_file(path, os.path.splitext(targets[0])[0] + path[len(stem):])
+            except OSError as e:
+                span['error'] = str(e)
+                return None
+            span.update(method=",".join(sorted(methods)), bytes=sum(os.path.getsize(target) for target in targets))
+        return targets, "/".join(sorted(methods))
+
+    def _finish(self, item: QueueItem, level: str, message: str):
+        with self._cond:
+            if self._jobs.pop(item.key, None) is None: return
+            resumed = self._resumed.pop(item.key, None)
+        self.space.release(item.key)
+        item.error = message if level == "error" else None
+        if level in (CANCELLED, PAUSED):
+            if self.journal is not None: self.journal.mark(item.key, QUEUED) if level == PAUSED else self.journal.remove_many([item.key])
+            self.tracker.drop(item.key)
+        else:
+            if self.journal is not None: self.journal.mark(item.key, FAILED if level == "error" else DONE, item.output_path, message if level == "error" else None)
+            self.tracker.finish(item.key)
+        with self._results_lock: self._results.append((item, level, message))
+        if self._on_result: self._on_result(item, level, message)
+        with self._cond:
+            if resumed is not None: self._schedule([resumed])
+            if not self._jobs: self._open = False
+            self._cond.notify_all()
+
+    def _fetch(self, job: ScheduledJob, postprocess: concurrent.futures.Executor):
+        # Entered holding a limiter slot for the first attempt. `held` tracks that slot across the
+        # setup and the attempts, and the outer finally gives it back on any path that keeps it.
+        item, idx, save_path, held = job.item, job.idx, self._save_path, True
+        try:
+            if self.library is not None and item.video_id and (reused := self._reuse(item, save_path, idx)) is not None:
+                self.tracker.start(item.key)
+                item.output_path = reused[0][0]
+                if self.archive is not None: self.archive.add(item)
+                return self._finish(item, "ok", f"Reused '{item.title[:20]}...' from the library ({reused[1]})")
+            if self.archive is not None and item in self.archive:
+                self.tracker.start(item.key)
+                return self._finish(item, "ok", f"Skipped '{item.title[:20]}...' (already downloaded)")
+            if self.journal is not None: self.journal.mark(item.key, RUNNING)
+            self.tracker.start(item.key, streams=1 if self.settings.is_audio else 2)
+            on_progress = lambda event: self.tracker.update(item.key, event)
+            root, ok, queued_at = work_root(self.settings, save_path), False, time.monotonic()
+            work_dir = work_dir_for(root, item)
+            streams_size, outputs_size = estimate_job_bytes(self.settings, item)
+            needs = {root: streams_size + outputs_size}
+            if self.settings.staging_dir: needs[save_path] = outputs_size
+            try: space_wait = self.space.acquire(item.key, needs, job.event)
+            except OSError as e: return self._finish(item, "error", f"Failed: cannot use the staging folder: {e}")
+            for attempt in itertools.count(1):
+                # The breaker is checked after taking a slot and tripped before giving it back, so no job
+                # queued on the limiter can slip past a trip.
+                if attempt > 1:
+                    self.limiter.acquire()
+                    held = True
+                breaker_wait = self.breaker.wait(job.event, job)
+                if job.event.is_set():
+                    self.breaker.abandon(job)
+                    return self._stop(job)
+                with self.metrics.span("download", key=item.key, attempt=attempt, queue_wait=round(time.monotonic() - queued_at, 6), space_wait=round(space_wait, 6), breaker_wait=round(breaker_wait, 6), concurrency=self.limiter.limit) as span:
+                    try:
+                        process = None
+                        if self.engine is not None:
+                            try: process = self.engine.download(item.url, build_options(self.settings, item, work_dir), on_progress, job.event)
+                            except EngineUnavailable as e: print(f"In-process engine unavailable, falling back to subprocess: {e}")
+                        if process is None: process = run_download_subprocess(build_command(self.settings, item, work_dir), on_progress, lambda started: self._attach(job, started))
+                        self._attach(job, None)
+                        streams = [path for path in output_paths_from(process.stdout) if os.path.exists(path)]
+                        span.update(exit_code=process.returncode, bytes=sum(os.path.getsize(path) for path in streams))
+                        if job.event.is_set(): span['stopped'] = job.stop
+                        else:
+                            ok = process.returncode == 0 and bool(streams)
+                            if not ok:
+                                span['error_class'] = kind = classify_error(process.stderr, process.returncode)
+                                if kind == RATE_LIMITED and self.breaker.trip(): self.limiter.throttle()
+                    except Exception as e:
+                        span['error'] = str(e)
+                        self.breaker.record_success(job)
+                        return self._finish(item, "error", f"An unexpected error occurred for '{item.title[:20]}...': {e}")
+                    finally:
+                        held = False
+                        self.limiter.release(ok, counted=not job.event.is_set())
+                if job.event.is_set():
+                    self.breaker.abandon(job)
+                    return self._stop(job)
+                if ok or kind != RATE_LIMITED: self.breaker.record_success(job)
+                if ok: break
+                if kind == PERMANENT or attempt > self.settings.max_retries:
+                    return self._finish(item, "error", f"Failed{f' after {attempt} attempts' if attempt > 1 else ''}: {error_message(process.stderr, item)}")
+                if kind == RETRYABLE and job.event.wait(backoff_delay(attempt)): return self._stop(job)
+                queued_at = time.monotonic()
+        finally:
+            if held: self.limiter.release(counted=False)
+        postprocess.submit(self._postprocess, job, streams, metadata_from(process.stdout), process.stderr, work_dir, time.monotonic())
+
+    def _postprocess(self, job: ScheduledJob, streams: List[str], meta: Dict[str, Any], stderr: str, work_dir: str, queued_at: float):
+        # Every output of the job is rendered from the same downloaded streams; the derived audio
+        # output only needs the audio stream, which "v,a" fetches last.
+        item, settings, targets = job.item, self.settings, []
+        try:
+            for output in settings.output_settings():
+                if job.event.is_set(): return self._stop(job)
+                sources = streams if output.is_audio == settings.is_audio else streams[-1:]
+                target = final_path(output_template(output, item, self._save_path, job.idx), meta.get('title') or item.title, output_extension(output, sources))
+                error = self._render(job, output, sources, work_dir, meta, target, queued_at)
+                if job.event.is_set(): return self._stop(job)
+                if error is not None: return self._finish(item, "error", error)
+                if self.library is not None and item.video_id: self.library.add(item.video_id, output_profile(output), target)
+                targets.append(target)
+            item.output_path = targets[0]
+            if settings.subtitle_files and settings.download_subtitles and not settings.is_audio: copy_subtitle_files(work_dir, targets[0])
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if self.archive is not None: self.archive.add(item)
+        except Exception as e: return self._finish(item, "error", f"An unexpected error occurred for '{item.title[:20]}...': {e}")
+        outputs = f" ({', '.join(os.path.splitext(target)[1][1:] for target in targets)})" if len(targets) > 1 else ""
+        warning_messages = []
+        if settings.download_subtitles and "has no subtitles" in stderr: warning_messages.append("subtitles not found")
+        if warning_messages: return self._finish(item, "warning", f"Downloaded '{item.title[:20]}...'{outputs} but {', '.join(warning_messages)}.")
+        self._finish(item, "ok", f"Downloaded '{item.title[:20]}...'{outputs}")
+
+    def _render(self, job: ScheduledJob, settings: DownloadSettings, streams: List[str], work_dir: str, meta: Dict[str, Any], target: str, queued_at: float) -> Optional[str]:
+        # Runs ffmpeg for one output into "<target>.part" (or into the work dir when staging) and
+        # moves it into place; returns the error message on failure. A stopped job's partial render is removed.
+        item, extension = job.item, os.path.splitext(target)[1][1:]
+        staged = os.path.join(work_dir, "render." + os.path.basename(target)) if self.settings.staging_dir else target + ".part"
+        mode = ('encode' if 'copy' not in audio_codec_args(settings, streams[0], extension) else 'copy') if settings.is_audio else 'merge'
+        with self.metrics.span("postprocess", key=item.key, queue_wait=round(time.monotonic() - queued_at, 6), mode=mode, ext=extension) as span:
+            try:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                command = build_postprocess_command(settings, streams, work_dir, meta, staged, self.postprocess_threads)
+                process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace', creationflags=POPEN_FLAGS)
+                self._attach(job, process)
+                _, stderr = process.communicate()
+                self._attach(job, None)
+                span['exit_code'] = process.returncode
+                if job.event.is_set():
+                    span['stopped'] = job.stop
+                    with contextlib.suppress(OSError): os.remove(staged)
+                    return job.stop
+                if process.returncode != 0:
+                    error_lines = stderr.strip().splitlines() or [f"ffmpeg exited with code {process.returncode}"]
+                    return f"Failed: {error_lines[-1]}"
+                span['bytes'] = os.path.getsize(staged)
+            except FileNotFoundError:
+                span['error'] = FFMPEG_MISSING
+                return f"Failed: {FFMPEG_MISSING}"
+            except Exception as e:
+                span['error'] = str(e)
+                return f"An unexpected error occurred for '{item.title[:20]}...': {e}"
+        with self.metrics.span("finalize", key=item.key, bytes=span['bytes'], staged=bool(self.settings.staging_dir)) as span:
+            try: finalize(staged, target)
+            except OSError as e:
+                span['error'] = str(e)
+                return f"Failed: could not move the output into place: {e}"
+        return None
@@ -0,0 +1,117 @@
+import re, threading
+from typing import Any, Dict, Iterator, List, Optional
+
+_VIDEO_ID_RE = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/live/|/embed/|/v/)([0-9A-Za-z_-]{11})(?![0-9A-Za-z_-])')
+
+def canonical_video_id(url: str) -> Optional[str]:
+    match = _VIDEO_ID_RE.search(url or "")
+    return match.group(1) if match else None
+
+def canonical_video_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+class QueueItem:
+    DETAIL_FIELDS = ('title', 'uploader', 'subtitles', 'thumbnail_url', 'duration', 'view_count')
+    __slots__ = ('url', 'video_id', 'title', 'playlist_title', 'uploader', 'subtitles', 'thumbnail_url', 'duration', 'view_count', 'needs_details', 'stale_details', 'priority', 'paused', 'progress', 'speed', 'eta', 'output_path', 'error')
+
+    def __init__(self, url: str, video_id: Optional[str] = None, title: str = 'Untitled', playlist_title: Optional[str] = None, uploader: str = 'N/A', subtitles: Optional[List[str]] = None, thumbnail_url: Optional[str] = None, duration: float = 0, view_count: int = 0, needs_details: bool = False, stale_details: bool = False, priority: int = 0, paused: bool = False):
+        self.url, self.video_id, self.title, self.playlist_title = url, video_id, title, playlist_title
+        self.uploader, self.subtitles, self.thumbnail_url = uploader, subtitles or [], thumbnail_url
+        self.duration, self.view_count = duration, view_count
+        self.needs_details, self.stale_details = needs_details, stale_details
+        self.priority, self.paused = priority, paused
+        self.progress = self.speed = self.eta = self.output_path = self.error = None
+
+    @property
+    def key(self) -> str:
+        return self.video_id or self.url
+
+    def update(self, fields: Optional[Dict[str, Any]] = None, **kwargs):
+        for name, value in {**(fields or {}), **kwargs}.items():
+            if name in self.__slots__: setattr(self, name, value)
+
+    def details(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.DETAIL_FIELDS}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"QueueItem({self.key!r}, {self.title!r})"
+
+class DownloadQueue:
+    # Insertion-ordered map of canonical video ID (or URL when there is none) to QueueItem: O(1)
+    # membership, append and removal. `_order` keeps the items in position order so a window of the
+    # queue view is a slice; removals only count as stale there and are swept out by the next
+    # positional read, so removing many items costs one pass instead of one per item.
+    def __init__(self):
+        self._items: Dict[str, QueueItem] = {}
+        self._order: List[QueueItem] = []
+        self._stale = 0
+        self._lock = threading.RLock()
+
+    def add(self, item: QueueItem) -> bool:
+        with self._lock:
+            if item.key in self._items: return False
+            self._items[item.key] = item
+            self._order.append(item)
+            return True
+
+    def remove(self, item: QueueItem) -> bool:
+        with self._lock:
+            if self._items.get(item.key) is not item: return False
+            del self._items[item.key]
+            self._stale += 1
+            return True
+
+    def _compact(self):
+        # Called with the lock held. Identity, not key, decides: a key removed and added again has a new item.
+        if not self._stale: return
+        self._order = [item for item in self._order if self._items.get(item.key) is item]
+        self._stale = 0
+
+    def move(self, item: QueueItem, index: int) -> bool:
+        # Reinserts the item at `index`; O(n), only used for manual reordering.
+        with self._lock:
+            if self._items.get(item.key) is not item: return False
+            self._compact()
+            self._order.remove(item)
+            self._order.insert(max(0, min(index, len(self._order))), item)
+            return True
+
+    def position(self, item: QueueItem) -> int:
+        # O(n); -1 when the item is not in the queue.
+        with self._lock:
+            if self._items.get(item.key) is not item: return -1
+            self._compact()
+            return self._order.index(item)
+
+    def normalize_priorities(self) -> List[QueueItem]:
+        # Renumbers the priorities in use as 0, 1, 2... in the same order, so repeated moves don't
+        # grow them without bound; returns the items whose priority changed.
+        with self._lock:
+            ranks = {priority: rank for rank, priority in enumerate(sorted({item.priority for item in self._items.values()}))}
+            changed = [item for item in self._items.values() if ranks[item.priority] != item.priority]
+            for item in changed: item.priority = ranks[item.priority]
+            return changed
+
+    def get(self, key: str) -> Optional[QueueItem]:
+        return self._items.get(key)
+
+    def clear(self):
+        with self._lock: self._items, self._order, self._stale = {}, [], 0
+
+    def window(self, start: int, count: int) -> List[QueueItem]:
+        with self._lock:
+            self._compact()
+            return self._order[max(0, start):max(0, start) + count]
+
+    def snapshot(self) -> List[QueueItem]:
+        with self._lock:
+            self._compact()
+            return list(self._order)
+
+    def __contains__(self, key: str) -> bool: return key in self._items
+    def __len__(self) -> int: return len(self._items)
+    def __bool__(self) -> bool: return bool(self._items)
+    def __iter__(self) -> Iterator[QueueItem]: return iter(self.snapshot())
@@ -0,0 +1,108 @@
+import concurrent.futures, re, threading, time
+from typing import List, Dict, Any, Optional, Tuple, Callable, Set
+from skylark_engine import YtDlpEngine, extract_stream
+from skylark_queue import canonical_video_id
+from skylark_db import connect, transaction
+
+NEWEST_FIRST, OLDEST_FIRST = "newest_first", "oldest_first"
+KNOWN_STREAK, OVERLAP = 3, 5
+
+def guess_ordering(url: str) -> str:
+    # Channel tabs and uploads playlists (UU...) list the newest video first; ordinary playlists append at the end.
+    if re.search(r'youtube\.com/(@|channel/|c/|user/)', url) or re.search(r'[?&]list=UU', url): return NEWEST_FIRST
+    return OLDEST_FIRST
+
+class SubscriptionStore:
+    # Saved playlists/channels (SQLite, WAL) with their sync state: the IDs seen so far with their
+    # playlist position, the ordering of the listing and the entry count at the last full sync.
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS subscriptions (url TEXT PRIMARY KEY, title TEXT, ordering TEXT NOT NULL, entry_count INTEGER NOT NULL DEFAULT 0, skip_existing INTEGER NOT NULL DEFAULT 0, added_at REAL NOT NULL, last_synced REAL, last_error TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seen (url TEXT NOT NULL, video_id TEXT NOT NULL, position INTEGER, first_seen REAL NOT NULL, PRIMARY KEY (url, video_id))")
+
+    def add(self, url: str, ordering: Optional[str] = None, skip_existing: bool = False) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("INSERT OR IGNORE INTO subscriptions (url, ordering, skip_existing, added_at) VALUES (?, ?, ?, ?)", (url, ordering or guess_ordering(url), int(skip_existing), time.time()))
+        return cursor.rowcount > 0
+
+    def remove(self, url: str):
+        with self._lock, transaction(self._conn):
+            self._conn.execute("DELETE FROM subscriptions WHERE url = ?", (url,))
+            self._conn.execute("DELETE FROM seen WHERE url = ?", (url,))
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        return next((sub for sub in self.all() if sub['url'] == url), None)
+
+    def all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            cursor = self._conn.execute("SELECT url, title, ordering, entry_count, skip_existing, added_at, last_synced, last_error FROM subscriptions ORDER BY added_at")
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def known_ids(self, url: str) -> Set[str]:
+        with self._lock: return {video_id for video_id, in self._conn.execute("SELECT video_id FROM seen WHERE url = ?", (url,))}
+
+    def record_sync(self, url: str, seen: List[Tuple[str, int]], title: Optional[str], entry_count: int):
+        now = time.time()
+        with self._lock, transaction(self._conn):
+            self._conn.executemany("INSERT OR REPLACE INTO seen (url, video_id, position, first_seen) VALUES (?, ?, ?, COALESCE((SELECT first_seen FROM seen WHERE url = ? AND video_id = ?), ?))", [(url, video_id, position, url, video_id, now) for video_id, position in seen])
+            self._conn.execute("UPDATE subscriptions SET title = COALESCE(?, title), entry_count = ?, skip_existing = 0, last_synced = ?, last_error = NULL WHERE url = ?", (title, entry_count, now, url))
+
+    def record_error(self, url: str, error: str):
+        with self._lock: self._conn.execute("UPDATE subscriptions SET last_error = ? WHERE url = ?", (error, url))
+
+    def close(self):
+        with self._lock: self._conn.close()
+
+def sync_subscription(store: SubscriptionStore, url: str, cancel_event: threading.Event, engine: Optional[YtDlpEngine] = None, batch_size: int = 50) -> Tuple[List[Dict[str, Any]], str]:
+    # Returns (new entries, error) for one subscription. Newest-first listings stop after
+    # KNOWN_STREAK known IDs in a row; oldest-first ones start OVERLAP entries before the previous
+    # end and fall back to a full listing if none of those is known (the playlist was reordered).
+    # State is only saved after an uninterrupted, error-free pass, so a cancelled sync never hides
+    # entries it did not reach.
+    sub = store.get(url)
+    if sub is None: return [], f"Not subscribed: {url}"
+    known = store.known_ids(url)
+    start = max(1, sub['entry_count'] - OVERLAP + 1) if known and sub['ordering'] == OLDEST_FIRST else 1
+    stop, new, seen, error, title = threading.Event(), [], [], "", None
+    position, streak, overlap_found = start - 1, 0, False
+    for entries, stderr_output in extract_stream(url, stop, engine, batch_size, playlist_start=start):
+        if cancel_event.is_set(): stop.set()
+        for info in entries:
+            if stop.is_set(): break
+            position += 1
+            title = title or info.get('playlist_title')
+            if not (video_id := info.get('id') or canonical_video_id(info.get('webpage_url', info.get('url')))): continue
+            seen.append((video_id, position))
+            if video_id in known:
+                overlap_found, streak = True, streak + 1
+                if sub['ordering'] == NEWEST_FIRST and streak >= KNOWN_STREAK: stop.set()
+                continue
+            streak = 0
+            new.append(info)
+        if stderr_output.strip(): error = stderr_output.strip().splitlines()[-1]
+    if cancel_event.is_set(): return new, error or "Cancelled."
+    if start > 1 and not overlap_found and not error:
+        store.record_sync(url, [], title, 0)
+        return sync_subscription(store, url, cancel_event, engine, batch_size)
+    if error and not seen:
+        store.record_error(url, error)
+        return [], error
+    entry_count = position if sub['ordering'] == OLDEST_FIRST else sub['entry_count'] + len(new)
+    store.record_sync(url, seen, title, entry_count)
+    return ([] if sub['skip_existing'] and not known else new), error
+
+def sync_all(store: SubscriptionStore, cancel_event: threading.Event, engine: Optional[YtDlpEngine] = None, max_workers: int = 4, urls: Optional[List[str]] = None, on_synced: Optional[Callable[[str, List[Dict[str, Any]], str], None]] = None) -> Dict[str, Tuple[List[Dict[str, Any]], str]]:
+    # Syncs every subscription (or `urls`) on a bounded pool; `on_synced` sees each result as it lands.
+    urls = urls if urls is not None else [sub['url'] for sub in store.all()]
+    results: Dict[str, Tuple[List[Dict[str, Any]], str]] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="sync") as executor:
+        futures = {executor.submit(sync_subscription, store, url, cancel_event, engine): url for url in urls}
+        for future in concurrent.futures.as_completed(futures):
+            url = futures[future]
+            try: results[url] = future.result()
+            except Exception as e: results[url] = ([], f"ERROR: {e}")
+            if on_synced: on_synced(url, *results[url])
+    return results
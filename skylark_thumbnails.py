@@ -0,0 +1,107 @@
+import concurrent.futures, hashlib, os, threading, time
+from collections import OrderedDict
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from skylark_metrics import Metrics
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+NETWORK_ERROR, DECODE_ERROR = "Network Error", "No Thumbnail"
+
+class ThumbnailLoader:
+    # Fetches thumbnails on a bounded pool over one keep-alive session, decodes them straight to
+    # `size` (JPEG draft mode + thumbnail), and keeps two cache tiers: an LRU of ready-to-display
+    # images (after `wrap`) in memory and the resized JPEGs on disk under `cache_dir`. requests is
+    # imported by the first fetch, on a pool thread, so it stays off the startup path (Pillow is
+    # already loaded by customtkinter in the GUI).
+    def __init__(self, cache_dir: str, size: Tuple[int, int] = (240, 136), max_workers: int = 4, memory_items: int = 512, wrap: Optional[Callable[[Any], Any]] = None, timeout: float = 10, metrics: Optional[Metrics] = None):
+        self.cache_dir, self.size, self.memory_items, self.timeout, self.max_workers = cache_dir, size, memory_items, timeout, max_workers
+        self.wrap = wrap or (lambda image: image)
+        self.metrics = metrics or Metrics()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.session = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail")
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._pending: Dict[str, List[Callable[[Any, Optional[str]], None]]] = {}
+        self._lock = threading.Lock()
+        self.memory_hits = self.disk_hits = self.downloads = 0
+
+    def load(self, url: str, callback: Callable[[Any, Optional[str]], None]):
+        if url.startswith('//'): url = 'https:' + url
+        if (image := self.get_cached(url)) is not None: return callback(image, None)
+        with self._lock:
+            if url in self._pending: return self._pending[url].append(callback)
+            self._pending[url] = [callback]
+        self._executor.submit(self._fetch, url, time.monotonic())
+
+    def get_cached(self, url: str) -> Any:
+        if url.startswith('//'): url = 'https:' + url
+        with self._lock:
+            if url in self._memory:
+                self._memory.move_to_end(url)
+                self.memory_hits += 1
+                return self._memory[url]
+        return None
+
+    def _disk_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + ".jpg")
+
+    def _get_session(self):
+        with self._lock:
+            if self.session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                self.session = requests.Session()
+                self.session.headers['User-Agent'] = USER_AGENT
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+                self.session.mount('http://', adapter)
+                self.session.mount('https://', adapter)
+            return self.session
+
+    def _decode(self, data: bytes) -> Any:
+        from PIL import Image
+        image = Image.open(BytesIO(data))
+        image.draft('RGB', self.size)
+        image = image.convert('RGB')
+        image.thumbnail(self.size)
+        return image
+
+    def _fetch(self, url: str, queued_at: float):
+        with self.metrics.span("thumbnail", queue_wait=round(time.monotonic() - queued_at, 6)) as span: self._fetch_into(url, span)
+
+    def _fetch_into(self, url: str, span: Dict[str, Any]):
+        import requests
+        from PIL import Image
+        image, error = None, None
+        path = self._disk_path(url)
+        try:
+            if os.path.exists(path):
+                with Image.open(path) as cached: image = cached.convert('RGB')
+                with self._lock: self.disk_hits += 1
+                span['source'] = 'disk'
+            else:
+                with self._get_session().get(url, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    data = response.content
+                with self._lock: self.downloads += 1
+                span.update(source='network', bytes=len(data))
+                image = self._decode(data)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                image.save(tmp_path, "JPEG", quality=85)
+                os.replace(tmp_path, path)
+            image = self.wrap(image)
+            with self._lock:
+                self._memory[url] = image
+                while len(self._memory) > self.memory_items: self._memory.popitem(last=False)
+        except requests.exceptions.RequestException as e:
+            print(f"Network error loading thumbnail: {e}")
+            image, error = None, NETWORK_ERROR
+        except Exception as e:
+            print(f"Error processing thumbnail: {e}")
+            image, error = None, DECODE_ERROR
+        if error: span['error'] = error
+        with self._lock: callbacks = self._pending.pop(url, [])
+        for callback in callbacks: callback(image, error)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.session is not None: self.session.close()
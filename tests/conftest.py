@@ -0,0 +1,14 @@
+import os, sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+@pytest.fixture
+def fake_tools(tmp_path, monkeypatch):
+    # The benchmark suite's fake yt-dlp/ffmpeg, first on PATH and quick enough for unit tests.
+    from bench import install_fake_tools
+    monkeypatch.setenv("PATH", os.environ.get("PATH", ""))
+    monkeypatch.setenv("SKYLARK_BENCH_SIZE", "20000")
+    install_fake_tools(str(tmp_path / "bin"))
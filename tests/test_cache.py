@@ -0,0 +1,27 @@
+import skylark_cache
+from skylark_cache import MetadataCache
+
+def test_entries_survive_a_restart_and_go_stale_after_the_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(skylark_cache.time, "time", lambda: now[0])
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"), ttl=60)
+    cache.put_many({"video000001": {"title": "One", "duration": 61}, "video000002": {"title": "Two", "duration": 62}})
+    cache.close()
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"), ttl=60)
+    assert cache.get_many(["video000001", "video000001", "missing0001", ""]) == {"video000001": ({"title": "One", "duration": 61}, False)}
+    now[0] += 61
+    assert cache.get("video000002") == ({"title": "Two", "duration": 62}, True)
+    assert cache.stats() == {"entries": 2, "hits": 2, "misses": 1, "stale": 1}
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(skylark_cache.time, "time", lambda: now[0])
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"), max_entries=2)
+    for n in range(3):
+        now[0] += 1
+        cache.put(f"video00000{n}", {"title": str(n)})
+    now[0] += 1
+    cache.get("video000000")
+    cache.close()
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"), max_entries=2)
+    assert "video000000" in cache and "video000001" not in cache and "video000002" in cache
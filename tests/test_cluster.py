@@ -0,0 +1,31 @@
+import threading, time
+from skylark_cluster import Coordinator, Worker
+from skylark_engine import DownloadSettings
+from skylark_queue import QueueItem
+
+def test_worker_stops_a_job_whose_lease_expired(fake_tools, tmp_path, monkeypatch):
+    # A two second download; its lease is expired under it, so the next heartbeat gets a 409.
+    monkeypatch.setenv("SKYLARK_BENCH_SIZE", "400000")
+    monkeypatch.setenv("SKYLARK_BENCH_SPEED", "200000")
+    item = QueueItem("https://www.youtube.com/watch?v=bench000001", video_id="bench000001", title="Benchmark video 1")
+    coordinator = Coordinator([item], DownloadSettings(format="MP3 - Audio Only", inprocess_engine=False), lease_seconds=0.6).start()
+    worker = Worker(coordinator.url, str(tmp_path / "out"), DownloadSettings(inprocess_engine=False), worker_id="worker-1", poll=0.05)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    try:
+        while not coordinator.status()["workers"]: time.sleep(0.01)
+        assert coordinator.status()["workers"] == {"worker-1": 1}
+        time.sleep(0.1)
+        with coordinator._cond:
+            coordinator.jobs[item.key].expires = 0.0
+            coordinator._reap()
+        expired = time.monotonic()
+        while not worker.results and time.monotonic() - expired < 1.5: time.sleep(0.01)
+        assert [(level, "Lease lost" in message) for _, level, message in worker.results] == [("cancelled", True)]
+        assert coordinator.results == [] and coordinator.expired == 1
+        # The job went back to the queue; the same worker leases it again and finishes it.
+        assert [level for _, level, _ in coordinator.wait(30)] == ["ok"]
+        coordinator.release_workers()
+        thread.join(10)
+        assert not thread.is_alive() and [level for _, level, _ in worker.results] == ["cancelled", "ok"]
+    finally: coordinator.stop()
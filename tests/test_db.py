@@ -0,0 +1,13 @@
+import pytest
+from skylark_db import connect, transaction
+
+def test_transaction_rolls_back_on_error(tmp_path):
+    conn = connect(str(tmp_path / "store.sqlite3"))
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.execute("CREATE TABLE t (n INTEGER)")
+    with transaction(conn): conn.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(RuntimeError):
+        with transaction(conn):
+            conn.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError("abort")
+    assert conn.execute("SELECT n FROM t").fetchall() == [(1,)]
@@ -0,0 +1,50 @@
+import threading, time
+from skylark_engine import DetailFetcher
+
+def collect(fetcher, urls, **kwargs):
+    results, done = {}, threading.Event()
+    def callback_for(url):
+        def callback(info, message):
+            results.setdefault(url, []).append((info, message))
+            if sum(map(len, results.values())) == len(urls): done.set()
+        return callback
+    for url in urls: fetcher.submit(url, callback_for(url), **kwargs)
+    return results, done
+
+def test_batches_follow_priority_and_share_a_lookup():
+    batches = []
+    def fetch_batch(urls):
+        batches.append(urls)
+        return [(url, {"id": url}, "") for url in urls]
+    fetcher = DetailFetcher(fetch_batch, max_workers=1, batch_size=2, linger=0.2)
+    results, done = collect(fetcher, ["a", "b", "c", "a"])
+    fetcher.submit("d", lambda info, message: None, priority=5)
+    fetcher.prioritize(["c", "d"], priority=-1)
+    assert done.wait(5)
+    assert batches == [["c", "d"], ["a", "b"]]
+    assert results["a"] == [({"id": "a"}, ""), ({"id": "a"}, "")]
+
+def test_failed_and_missing_lookups_still_answer_every_callback():
+    def fetch_batch(urls):
+        if "boom" in urls: raise OSError("yt-dlp crashed")
+        return [(urls[0], None, "ERROR: [youtube] x: Private video")]
+    fetcher = DetailFetcher(fetch_batch, max_workers=1, batch_size=2, linger=0.0)
+    results, done = collect(fetcher, ["private", "lost"])
+    assert done.wait(5)
+    assert results == {"private": [(None, "ERROR: [youtube] x: Private video")], "lost": [(None, "No details returned.")]}
+    results, done = collect(fetcher, ["boom"])
+    assert done.wait(5) and results == {"boom": [(None, "yt-dlp crashed")]}
+
+def test_worker_count_stays_bounded():
+    active, peak, lock = [0], [0], threading.Lock()
+    def fetch_batch(urls):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock: active[0] -= 1
+        return [(url, {}, "") for url in urls]
+    fetcher = DetailFetcher(fetch_batch, max_workers=3, batch_size=2, linger=0.0)
+    results, done = collect(fetcher, [str(n) for n in range(40)])
+    assert done.wait(10)
+    assert len(results) == 40 and 1 < peak[0] <= 3 and fetcher.pending_count() == 0
@@ -0,0 +1,39 @@
+import collections, threading, time
+import skylark_pipeline
+from skylark_pipeline import DiskSpaceGuard
+
+Usage = collections.namedtuple("Usage", "total used free")
+
+def test_jobs_wait_for_space_and_a_lone_job_is_always_admitted(tmp_path, monkeypatch):
+    free = [1000]
+    monkeypatch.setattr(skylark_pipeline.shutil, "disk_usage", lambda path: Usage(0, 0, free[0]))
+    guard, admitted = DiskSpaceGuard(min_free=100, poll=0.01), []
+    guard.acquire("huge", {str(tmp_path): 5000})
+    thread = threading.Thread(target=lambda: admitted.append(guard.acquire("small", {str(tmp_path / "not" / "yet"): 600})))
+    thread.start()
+    time.sleep(0.1)
+    assert not admitted
+    guard.release("huge")
+    thread.join(5)
+    assert admitted and guard._reserved == {tmp_path.stat().st_dev: 600}
+    # 1000 free - 600 reserved - 100 kept free leaves room for 300 more bytes, re-read on every poll.
+    guard.acquire("fits", {str(tmp_path): 300})
+    waiting = threading.Thread(target=lambda: guard.acquire("waits", {str(tmp_path): 1}))
+    waiting.start()
+    time.sleep(0.05)
+    assert waiting.is_alive()
+    free[0] = 2000
+    waiting.join(5)
+    assert not waiting.is_alive()
+
+def test_stopped_job_gives_up_without_a_reservation(tmp_path, monkeypatch):
+    monkeypatch.setattr(skylark_pipeline.shutil, "disk_usage", lambda path: Usage(0, 0, 0))
+    guard, stop, waited = DiskSpaceGuard(min_free=0, poll=60), threading.Event(), []
+    guard.acquire("first", {str(tmp_path): 10})
+    thread = threading.Thread(target=lambda: waited.append(guard.acquire("second", {str(tmp_path): 10}, stop)))
+    thread.start()
+    time.sleep(0.05)
+    stop.set()
+    guard.wake()
+    thread.join(5)
+    assert waited and waited[0] < 5 and "second" not in guard._jobs
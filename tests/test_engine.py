@@ -0,0 +1,73 @@
+import sys, types
+import pytest
+import skylark_engine
+
+class FakeYoutubeDL:
+    # Mimics the part of yt_dlp.YoutubeDL the worker relies on: errors go through trouble(), which
+    # sets `_download_retcode`, and download() returns that attribute without resetting it.
+    def __init__(self, params):
+        self.params, self._download_retcode = dict(params, outtmpl={}), 0
+    def add_progress_hook(self, hook): pass
+    def add_postprocessor_hook(self, hook): pass
+    def close(self): pass
+    def download(self, urls):
+        if "bad" in urls[0]:
+            self.params['logger'].error("ERROR: [youtube] bad: HTTP Error 503: Service Unavailable")
+            self._download_retcode = 1
+        return self._download_retcode
+
+@pytest.fixture
+def worker(monkeypatch):
+    utils = types.SimpleNamespace(DownloadError=type("DownloadError", (Exception,), {}), DownloadCancelled=type("DownloadCancelled", (Exception,), {}))
+    monkeypatch.setitem(sys.modules, "yt_dlp", types.SimpleNamespace(YoutubeDL=FakeYoutubeDL, utils=utils))
+    monkeypatch.setattr(skylark_engine, "_logger", skylark_engine._CapturingLogger())
+    monkeypatch.setattr(skylark_engine, "_instances", skylark_engine.OrderedDict())
+
+def test_failed_job_does_not_fail_the_next_one_on_the_cached_instance(worker):
+    options = {'format': 'bestaudio', 'outtmpl': 'media.%(ext)s'}
+    return_code, _, stderr = skylark_engine._download_job("https://www.youtube.com/watch?v=bad", options)
+    assert return_code == 1 and "503" in stderr
+    return_code, _, stderr = skylark_engine._download_job("https://www.youtube.com/watch?v=good", options)
+    assert len(skylark_engine._instances) == 1
+    assert (return_code, stderr) == (0, "")
+
+def test_resize_leaves_the_extraction_pool_running(monkeypatch):
+    # A batch sizing the download pool must not restart the workers a detail lookup is using.
+    monkeypatch.setattr(skylark_engine.YtDlpEngine, "is_available", staticmethod(lambda: True))
+    engine = skylark_engine.YtDlpEngine(max_workers=2)
+    try:
+        extraction = engine._pool()
+        engine.resize(6)
+        assert engine._pool() is extraction and engine.max_workers == 2
+        downloads = engine._begin_download()
+        engine.resize(3)
+        assert engine._begin_download() is downloads
+        engine._end_download(), engine._end_download()
+        assert engine._begin_download() is not downloads and engine._download_executor_size == 3
+        engine._end_download()
+    finally: engine.shutdown()
+
+def test_tracker_totals_from_several_threads_add_up():
+    tracker = skylark_engine.ProgressTracker()
+    def churn():
+        for n in range(2000):
+            tracker.add_total(2)
+            tracker.drop(f"item{n}")
+    threads = [skylark_engine.threading.Thread(target=churn) for _ in range(4)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert tracker.total == 8000
+
+def test_batch_subprocess_errors_go_to_their_own_urls(tmp_path, monkeypatch):
+    script = tmp_path / "yt-dlp"
+    script.write_text("#!/bin/sh\n"
+                      "echo '{\"original_url\": \"https://www.youtube.com/watch?v=okokokokok1\"}'\n"
+                      "echo 'ERROR: [youtube] privateid01: Private video' >&2\n"
+                      "echo 'ERROR: [youtube] deletedid01: Video unavailable' >&2\n"
+                      "echo 'WARNING: unable to reach the proxy' >&2\n")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{skylark_engine.os.pathsep}{skylark_engine.os.environ['PATH']}")
+    urls = [f"https://www.youtube.com/watch?v={vid}" for vid in ("okokokokok1", "privateid01", "deletedid01", "missingid01")]
+    results = {url: (info is not None, stderr) for url, info, stderr in skylark_engine._fetch_details_batch_subprocess(urls)}
+    assert results == {urls[0]: (True, ""), urls[1]: (False, "ERROR: [youtube] privateid01: Private video"),
+                       urls[2]: (False, "ERROR: [youtube] deletedid01: Video unavailable"), urls[3]: (False, "WARNING: unable to reach the proxy")}
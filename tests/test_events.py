@@ -0,0 +1,38 @@
+import dataclasses, threading
+import pytest
+from skylark_engine import DownloadSettings
+from skylark_events import EventBus
+
+def test_drain_coalesces_status_and_item_events_but_keeps_calls_in_order():
+    bus, first, second = EventBus(), object(), object()
+    bus.status("one")
+    bus.item_changed(first)
+    bus.call(print, 1)
+    bus.item_changed(first)
+    bus.status("two", "red")
+    bus.item_changed(second)
+    bus.call(print, 2)
+    calls, items, status = bus.drain()
+    assert [call.args for call in calls] == [(1,), (2,)]
+    assert list(items.values()) == [first, second] and (status.message, status.color) == ("two", "red")
+    assert bus.coalesced == 2 and bus.pending_count() == 0
+
+def test_drain_takes_only_the_events_present_on_entry():
+    bus = EventBus()
+    for n in range(5): bus.call(print, n)
+    calls, _, _ = bus.drain(max_events=3)
+    assert [call.args for call in calls] == [(0,), (1,), (2,)] and bus.pending_count() == 2
+
+def test_events_from_many_threads_all_arrive():
+    bus = EventBus()
+    threads = [threading.Thread(target=lambda n=n: [bus.call(print, n, i) for i in range(1000)]) for n in range(4)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    calls, _, _ = bus.drain()
+    assert len(calls) == 4000
+    assert all([i for _, i in (call.args for call in calls if call.args[0] == n)] == list(range(1000)) for n in range(4))
+
+def test_settings_snapshot_is_immutable():
+    settings = DownloadSettings()
+    with pytest.raises(dataclasses.FrozenInstanceError): settings.format = "MP3 - Audio Only"
+    assert settings.replace(format="MP3 - Audio Only").format == "MP3 - Audio Only" and settings.format != "MP3 - Audio Only"
@@ -0,0 +1,35 @@
+import types
+import pytest
+
+skylark_downloader = pytest.importorskip("skylark_downloader")
+App = skylark_downloader.App
+
+class Widget:
+    def __init__(self, *args): self.options, self.destroyed = {}, False
+    def configure(self, **options): self.options.update(options)
+    def grab_release(self): pass
+    def destroy(self): self.destroyed = True
+
+def fake_app(dependencies=None, ingest_session=None):
+    app = types.SimpleNamespace(dependencies=dependencies, ingest_session=ingest_session, ffmpeg_dialog=None, add_button=Widget(), download_button=Widget(), download_queue=[], is_downloading=False, update_status=lambda *args: None)
+    for name in ("_apply_dependencies", "_update_ui_after_fetch"): setattr(app, name, getattr(App, name).__get__(app))
+    return app
+
+def test_add_button_stays_disabled_without_yt_dlp():
+    app = fake_app({"yt_dlp": False, "ffmpeg": True})
+    app._update_ui_after_fetch()
+    assert app.add_button.options["state"] == skylark_downloader.AppConfig.STATE_DISABLED
+    app.ingest_session = object()
+    app._update_ui_after_fetch()
+    assert app.add_button.options == {"state": skylark_downloader.AppConfig.STATE_NORMAL, "text": "Cancel"}
+
+def test_fresh_probe_finding_ffmpeg_closes_the_dialog(monkeypatch):
+    monkeypatch.setattr(skylark_downloader, "FFmpegMissingDialog", Widget)
+    app = fake_app()
+    app._apply_dependencies({"yt_dlp": True, "ffmpeg": False})
+    dialog = app.ffmpeg_dialog
+    app._apply_dependencies({"yt_dlp": True, "ffmpeg": False})
+    assert app.ffmpeg_dialog is dialog
+    app._apply_dependencies({"yt_dlp": True, "ffmpeg": True, "yt_dlp_version": "2026.01.01"})
+    assert dialog.destroyed and app.ffmpeg_dialog is None
+    assert app.add_button.options["state"] == skylark_downloader.AppConfig.STATE_NORMAL
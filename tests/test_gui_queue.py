@@ -0,0 +1,56 @@
+import types
+import pytest
+from skylark_cache import MetadataCache
+from skylark_queue import DownloadQueue, QueueItem
+
+skylark_downloader = pytest.importorskip("skylark_downloader")
+App = skylark_downloader.App
+
+class Recorder:
+    def __init__(self): self.calls = []
+    def __getattr__(self, name): return lambda *args, **kwargs: self.calls.append((name, *args))
+
+def fake_app(count):
+    # Just the state the queue commands touch; no Tk window is created.
+    app = types.SimpleNamespace(download_queue=DownloadQueue(), download_runner=None, journal=Recorder(), queue_view=Recorder())
+    for name in ("_move_queue_item", "_run_queue_item_next", "_apply_queue_order"): setattr(app, name, getattr(App, name).__get__(app))
+    items = [QueueItem(f"https://www.youtube.com/watch?v=video{n:06d}", video_id=f"video{n:06d}") for n in range(count)]
+    for item in items: app.download_queue.add(item)
+    return app, items
+
+def test_moves_keep_the_queue_order_and_bounded_priorities():
+    app, items = fake_app(4)
+    for _ in range(5): app._run_queue_item_next(items[3])
+    assert app.download_queue.snapshot() == [items[3], *items[:3]] and items[3].priority == 1
+    app._move_queue_item(items[1], -1)
+    app._move_queue_item(items[1], -1)
+    assert app.download_queue.snapshot() == [items[1], items[3], items[0], items[2]]
+    assert [item.priority for item in app.download_queue] == [1, 1, 0, 0]
+    app._move_queue_item(items[3], 1)
+    app._move_queue_item(items[2], 1)
+    assert app.download_queue.snapshot() == [items[1], items[0], items[3], items[2]]
+    assert [item.priority for item in app.download_queue] == [1, 0, 0, 0]
+    assert ("reorder", [item.key for item in app.download_queue]) in app.journal.calls
+
+def test_failed_batch_still_finishes_the_download():
+    # A run() that raises must still hand control back to the Tk thread, or "Downloading..." never ends.
+    class Events:
+        def __init__(self): self.calls = []
+        def call(self, fn, *args): self.calls.append((fn, args))
+    class BrokenRunner:
+        def run(self, items, save_path, on_result): raise OSError("library index is unreadable")
+    app = types.SimpleNamespace(events=Events(), _finish_download="finish", _on_download_result=None)
+    App.run_download_process.__get__(app)(BrokenRunner(), [], "/tmp")
+    assert app.events.calls == [("finish", ([], "Download failed: library index is unreadable"))]
+
+def test_entries_already_queued_are_not_cache_hits(tmp_path):
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+    entry = lambda n: {"id": f"video{n:06d}", "url": f"https://www.youtube.com/watch?v=video{n:06d}", "title": f"Video {n}"}
+    cache.put_many({f"video{n:06d}": {"title": f"Video {n}", "duration": 60} for n in (0, 1)})
+    app, items = fake_app(1)
+    app.metadata_cache, app.download_button, app.is_downloading = cache, Recorder(), False
+    app._fetch_and_update_details = lambda *args, **kwargs: None
+    app._add_entries = App._add_entries.__get__(app)
+    session = skylark_downloader.IngestSession("https://www.youtube.com/playlist?list=x")
+    assert app._add_entries([entry(0), entry(1), entry(1), entry(2)], session) == 2
+    assert (session.added, session.cached, cache.hits, cache.misses) == (2, 1, 1, 1)
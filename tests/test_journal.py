@@ -0,0 +1,24 @@
+import skylark_cli
+from skylark_journal import JobJournal
+from skylark_queue import QueueItem
+
+def test_paused_items_stay_paused_across_sessions(tmp_path):
+    journal = JobJournal(str(tmp_path / "journal.sqlite3"))
+    items = [QueueItem(f"https://www.youtube.com/watch?v=video{n:06d}", video_id=f"video{n:06d}") for n in range(3)]
+    journal.add_many(items)
+    items[1].paused = True
+    journal.update_details(items[1])
+    journal.close()
+    restored = JobJournal(str(tmp_path / "journal.sqlite3")).pending()
+    assert [(item.key, item.paused) for item in restored] == [(items[0].key, False), (items[1].key, True), (items[2].key, False)]
+
+def test_cli_does_not_requeue_a_paused_item(fake_tools, tmp_path):
+    # The paused item's URL is given again; its journal row must keep the pause.
+    path = str(tmp_path / "journal.sqlite3")
+    journal = JobJournal(path)
+    item = QueueItem("https://www.youtube.com/watch?v=bench000001", video_id="bench000001", title="Benchmark video 1")
+    item.paused = True
+    journal.add_many([item])
+    journal.close()
+    skylark_cli.main([item.url, "--journal", path, "-o", str(tmp_path / "out"), "--settings", "", "--no-inprocess-engine", "--progress-interval", "0"])
+    assert [(restored.key, restored.paused) for restored in JobJournal(path).pending()] == [(item.key, True)]
@@ -0,0 +1,26 @@
+import struct
+import pytest
+from skylark_library import read_tags
+
+URL = b"https://www.youtube.com/watch?v=abcdefghijk"
+DESCRIPTION = b"See also https://www.youtube.com/watch?v=ZZZZZZZZZZZ"
+
+def box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+# Tag layouts as ffmpeg writes them; the description links another video, which must not be picked up.
+@pytest.mark.parametrize("name, data", [
+    ("id3.mp3", b"ID3\x03\x00TXXX\x00\x00\x00\x30\x00\x00\x00description\x00" + DESCRIPTION + b"TXXX\x00\x00\x00\x1e\x00\x00\x00skylark_profile\x000123456789abTXXX\x00\x00\x00\x30\x00\x00\x00skylark_url\x00" + URL),
+    ("vorbis.opus", b"OpusTags\x2b\x00\x00\x00description=" + DESCRIPTION + b"\x1c\x00\x00\x00skylark_profile=0123456789ab\x36\x00\x00\x00skylark_url=" + URL),
+    ("ebml.mka", b"E\xa3\x8bDESCRIPTIOND\x87\xb5" + DESCRIPTION + b"g\xc8\xa1E\xa3\x8fSKYLARK_PROFILED\x87\x8c0123456789abg\xc8\xb5E\xa3\x8bSKYLARK_URLD\x87\xab" + URL),
+    ("keywords.mp4", box(b"ftyp", b"isom") + box(b"mdat", b"\0" * 64) + box(b"moov", box(b"udta", box(b"meta", b"\0" * 4 + box(b"ilst", box(b"desc", box(b"data", b"\0\0\0\x01\0\0\0\0" + DESCRIPTION)) + box(b"keyw", box(b"data", b"\0\0\0\x01\0\0\0\0skylark_profile=0123456789ab skylark_url=" + URL))))))),
+])
+def test_read_tags_finds_the_library_tags_in_each_container(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    assert read_tags(str(path)) == ("abcdefghijk", "0123456789ab")
+
+def test_read_tags_ignores_untagged_files(tmp_path):
+    path = tmp_path / "plain.mp3"
+    path.write_bytes(b"ID3\x03\x00TXXX\x00\x00\x00\x30\x00\x00\x00comment\x00" + URL)
+    assert read_tags(str(path)) is None
@@ -0,0 +1,12 @@
+import json, logging
+from skylark_metrics import Metrics
+
+def test_trace_file_without_a_registered_logger(tmp_path):
+    loggers = set(logging.root.manager.loggerDict)
+    for n in range(3):
+        metrics = Metrics(str(tmp_path / f"trace{n}.jsonl"))
+        with metrics.span("download", key="a") as span: span['bytes'] = 10
+        metrics.close()
+        metrics.record("late", 0.1)
+    assert set(logging.root.manager.loggerDict) == loggers
+    assert [json.loads(line)["stage"] for line in (tmp_path / "trace0.jsonl").read_text().splitlines()] == ["download"]
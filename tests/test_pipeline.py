@@ -0,0 +1,132 @@
+import os, threading, time
+import pytest
+from skylark_engine import DownloadSettings
+import skylark_pipeline
+from skylark_pipeline import PERMANENT, RATE_LIMITED, RETRYABLE, CircuitBreaker, DownloadRunner, classify_error, work_dir_for, work_root
+from skylark_queue import QueueItem
+
+def run_in_thread(runner, items, save_path, timeout=30.0):
+    results = []
+    thread = threading.Thread(target=lambda: results.extend(runner.run(items, save_path)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "run() did not return"
+    return results
+
+def test_failure_after_render_finishes_the_job(fake_tools, tmp_path):
+    # An error in the steps after ffmpeg (subtitle copies, cleanup, the archive) still reaches _finish.
+    runner = DownloadRunner(DownloadSettings(inprocess_engine=False, download_archive=str(tmp_path / "archive.txt")))
+    def broken_add(item): raise OSError("archive is read-only")
+    runner.archive.add = broken_add
+    item = QueueItem("https://www.youtube.com/watch?v=bench000001", video_id="bench000001", title="Benchmark video 1")
+    results = run_in_thread(runner, [item], str(tmp_path / "out"))
+    assert [(level, "read-only" in message) for _, level, message in results] == [("error", True)]
+
+def test_setup_error_gives_the_limiter_slot_back(fake_tools, tmp_path, monkeypatch):
+    # With one slot, a leaked slot from the first job's setup would leave the second job waiting forever.
+    estimate = skylark_pipeline.estimate_job_bytes
+    def estimate_job_bytes(settings, item):
+        if item.video_id == "bench000001": raise ValueError("bad duration")
+        return estimate(settings, item)
+    monkeypatch.setattr(skylark_pipeline, "estimate_job_bytes", estimate_job_bytes)
+    runner = DownloadRunner(DownloadSettings(inprocess_engine=False, adaptive_concurrency=False, concurrent_downloads=1))
+    items = [QueueItem(f"https://www.youtube.com/watch?v=bench00000{n}", video_id=f"bench00000{n}", title=f"Benchmark video {n}") for n in (1, 2)]
+    results = run_in_thread(runner, items, str(tmp_path / "out"))
+    assert sorted((item.video_id, level) for item, level, _ in results) == [("bench000001", "error"), ("bench000002", "ok")]
+    assert runner.limiter.active == 0
+
+@pytest.mark.parametrize("stderr, returncode, kind", [
+    ("ERROR: unable to download video data: HTTP Error 503: Service Unavailable", 1, RETRYABLE),
+    ("ERROR: [youtube] abc: Private video. Sign in if you've been granted access to this video", 1, PERMANENT),
+    ("ERROR: [youtube] abc: Sign in to confirm you're not a bot", 1, RATE_LIMITED),
+    ("yt-dlp: error: no such option: --bogus", 2, PERMANENT),
+    ("sh: 1: yt-dlp: not found", 127, PERMANENT),
+    ("[download]  12.5% of 10.00MiB", -9, RETRYABLE),
+    ("WARNING: Requested format is not available, trying another", 137, RETRYABLE),
+    ("ERROR: HTTP Error 429: Too Many Requests", -15, RATE_LIMITED),
+])
+def test_classify_error_uses_the_exit_code(stderr, returncode, kind):
+    assert classify_error(stderr, returncode) == kind
+
+def start_run(runner, items, save_path):
+    results = []
+    thread = threading.Thread(target=lambda: results.extend(runner.run(items, save_path)), daemon=True)
+    thread.start()
+    return thread, results
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def test_resume_right_after_pause_downloads_the_item(fake_tools, tmp_path, monkeypatch):
+    # The resume arrives while the paused job is still stopping; it must start again once that job ends.
+    monkeypatch.setenv("SKYLARK_BENCH_SIZE", "400000")
+    monkeypatch.setenv("SKYLARK_BENCH_SPEED", "200000")
+    runner = DownloadRunner(DownloadSettings(format="MP3 - Audio Only", inprocess_engine=False))
+    item = QueueItem("https://www.youtube.com/watch?v=bench000001", video_id="bench000001", title="Benchmark video 1")
+    thread, results = start_run(runner, [item], str(tmp_path / "out"))
+    wait_until(lambda: runner.tracker.state(item.key) is not None)
+    assert runner.pause(item.key) and runner.add([item])
+    thread.join(30)
+    assert not thread.is_alive()
+    assert [level for _, level, _ in results] == ["paused", "ok"]
+
+def test_reorder_changes_the_start_order_of_waiting_jobs():
+    runner = DownloadRunner(DownloadSettings(inprocess_engine=False))
+    items = [QueueItem(f"https://www.youtube.com/watch?v=bench00000{n}", video_id=f"bench00000{n}") for n in range(4)]
+    with runner._cond:
+        runner._schedule(items)
+        first = runner._take()
+    assert first.item is items[0]
+    assert runner.reorder([items[0].key, items[3].key, items[1].key, items[2].key])
+    with runner._cond: order = [runner._take().item for _ in range(3)]
+    assert order == [items[3], items[1], items[2]]
+
+def test_setup_failure_ends_the_batch(tmp_path):
+    # An unopenable library index raises out of run() and closes the batch instead of leaving it open.
+    runner = DownloadRunner(DownloadSettings(inprocess_engine=False, library_index=str(tmp_path / "missing" / "library.db")))
+    item = QueueItem("https://www.youtube.com/watch?v=bench000001", video_id="bench000001")
+    with pytest.raises(Exception): runner.run([item], str(tmp_path / "out"))
+    assert not runner.add([item]) and runner.library is None
+
+def test_half_open_breaker_closes_only_on_the_probe_success():
+    breaker, early, probe = CircuitBreaker(cooldown=0.01), object(), object()
+    breaker.wait(token=early)
+    assert breaker.trip()
+    breaker.wait(token=probe)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_success(early)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_success(probe)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_jobs_start_by_priority_then_shortest_first():
+    runner = DownloadRunner(DownloadSettings(inprocess_engine=False, shortest_first=True))
+    items = [QueueItem(f"https://www.youtube.com/watch?v=bench00000{n}", video_id=f"bench00000{n}", duration=duration, priority=priority)
+             for n, (duration, priority) in enumerate([(600, 0), (60, 0), (0, 0), (900, 1), (60, 0)])]
+    with runner._cond:
+        runner._schedule(items)
+        order = [runner._take().item for _ in items]
+    assert order == [items[3], items[1], items[4], items[0], items[2]]
+
+def test_cancel_stops_running_and_waiting_jobs(fake_tools, tmp_path, monkeypatch):
+    # One slot: the first job is cancelled mid-download, the second while still waiting, the third runs.
+    monkeypatch.setenv("SKYLARK_BENCH_SIZE", "400000")
+    monkeypatch.setenv("SKYLARK_BENCH_SPEED", "200000")
+    settings = DownloadSettings(format="MP3 - Audio Only", inprocess_engine=False, adaptive_concurrency=False, concurrent_downloads=1)
+    runner, save_path = DownloadRunner(settings), str(tmp_path / "out")
+    items = [QueueItem(f"https://www.youtube.com/watch?v=bench00000{n}", video_id=f"bench00000{n}", title=f"Benchmark video {n}") for n in (1, 2, 3)]
+    reported, results = [], []
+    thread = threading.Thread(target=lambda: results.extend(runner.run(items, save_path, lambda item, level, message: reported.append(level))), daemon=True)
+    thread.start()
+    wait_until(lambda: runner.tracker.state(items[0].key) is not None)
+    assert runner.cancel(items[1].key) and runner.cancel(items[0].key) and not runner.cancel(items[0].key)
+    wait_until(lambda: len(reported) >= 2, timeout=1.5)
+    assert reported[:2] == ["cancelled", "cancelled"]
+    thread.join(30)
+    assert not thread.is_alive()
+    assert sorted((item.video_id, level) for item, level, _ in results) == [("bench000001", "cancelled"), ("bench000002", "cancelled"), ("bench000003", "ok")]
+    assert not any(os.path.exists(work_dir_for(work_root(settings, save_path), item)) for item in items[:2])
+    assert runner.limiter.active == 0 and (runner.tracker.completed, runner.tracker.total) == (1, 1)
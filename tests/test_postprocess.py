@@ -0,0 +1,44 @@
+from skylark_engine import DownloadSettings, stream_format
+from skylark_library import output_profile
+from skylark_pipeline import audio_codec_args, build_postprocess_command
+
+def codec_args(command):
+    return command[command.index('-c:a'):command.index('-c:a') + 2]
+
+def test_m4a_copies_aac_and_transcodes_opus(tmp_path):
+    settings = DownloadSettings(format="M4A - Audio Only (Original Stream When Available)", embed_thumbnail=False, audio_bitrate="192K")
+    assert audio_codec_args(settings, "media.140.m4a", "m4a") == ['-c:a', 'copy']
+    command = build_postprocess_command(settings, [str(tmp_path / "media.251.webm")], str(tmp_path), {}, str(tmp_path / "out.m4a"))
+    assert command[command.index('-f') + 1] == 'ipod'
+    assert codec_args(command) == ['-c:a', 'aac'] and command[command.index('-b:a') + 1] == '192k'
+
+def test_opus_copies_opus_and_transcodes_aac():
+    settings = DownloadSettings(format="Opus - Audio Only (Original Stream When Available)")
+    assert audio_codec_args(settings, "media.251.webm", "opus") == ['-c:a', 'copy']
+    assert audio_codec_args(settings, "media.140.m4a", "opus")[:2] == ['-c:a', 'libopus']
+
+def test_extra_m4a_requests_an_aac_stream_and_transcodes_without_one(tmp_path):
+    settings = DownloadSettings(quality="Highest", extra_audio="M4A - Audio Only (Original Stream When Available)", embed_thumbnail=False)
+    assert stream_format(settings) == "bestvideo,bestaudio[ext=m4a]/bestaudio"
+    audio = settings.output_settings()[1]
+    command = build_postprocess_command(audio, [str(tmp_path / "media.251.webm")], str(tmp_path), {}, str(tmp_path / "out.m4a"))
+    assert codec_args(command) == ['-c:a', 'aac']
+
+def test_metadata_keeps_the_description_and_adds_library_tags(tmp_path):
+    meta = {'title': "T", 'uploader': "U", 'description': "About this video", 'webpage_url': "https://www.youtube.com/watch?v=abcdefghijk"}
+    for fmt, key in (("MP3 - Audio Only", "skylark_profile="), ("M4A - Audio Only (Original Stream When Available)", "keywords=skylark_profile=")):
+        settings = DownloadSettings(format=fmt, embed_thumbnail=False)
+        command = build_postprocess_command(settings, [str(tmp_path / "media.140.m4a")], str(tmp_path), meta, str(tmp_path / "out"))
+        values = [command[n + 1] for n, arg in enumerate(command) if arg == '-metadata']
+        assert "description=About this video" in values and "comment=https://www.youtube.com/watch?v=abcdefghijk" in values
+        assert any(value.startswith(key + output_profile(settings)) for value in values)
+
+def test_saved_lossless_labels_still_load_and_keep_their_library_profile():
+    settings = DownloadSettings.from_dict({"format": "M4A - Audio Only (Lossless)", "extra_audio": "Opus - Audio Only (Lossless)"})
+    assert settings.format == "M4A - Audio Only (Original Stream When Available)" and settings.audio_mode == ("bestaudio[ext=m4a]/bestaudio", "m4a")
+    assert settings.extra_audio == "Opus - Audio Only (Original Stream When Available)"
+    assert output_profile(settings) == "3d6d437815a1"
+
+def test_opus_profile_ignores_the_thumbnail_option():
+    settings = DownloadSettings(format="Opus - Audio Only (Original Stream When Available)")
+    assert output_profile(settings) == output_profile(settings.replace(embed_thumbnail=not settings.embed_thumbnail))
@@ -0,0 +1,45 @@
+import pytest
+from skylark_engine import item_from_entry
+from skylark_queue import DownloadQueue, QueueItem, canonical_video_id
+
+def make(n):
+    return QueueItem(f"https://www.youtube.com/watch?v=video{n:06d}", video_id=f"video{n:06d}")
+
+def test_window_after_removals_moves_and_re_adds():
+    queue, items = DownloadQueue(), [make(n) for n in range(10)]
+    for item in items: queue.add(item)
+    assert queue.window(8, 5) == items[8:]
+    for item in items[2:5]: queue.remove(item)
+    again = make(3)
+    assert queue.add(again)
+    queue.move(items[9], 0)
+    assert queue.window(0, 3) == [items[9], items[0], items[1]]
+    assert queue.snapshot() == [items[9], items[0], items[1], *items[5:9], again]
+    assert len(queue) == 8 and queue.window(7, 5) == [again]
+
+def test_normalize_priorities_keeps_their_order():
+    queue, items = DownloadQueue(), [make(n) for n in range(4)]
+    for item, priority in zip(items, (7, 7, 3, 0)):
+        item.priority = priority
+        queue.add(item)
+    assert set(queue.normalize_priorities()) == {items[0], items[1], items[2]}
+    assert [item.priority for item in items] == [2, 2, 1, 0]
+    assert queue.normalize_priorities() == []
+
+@pytest.mark.parametrize("url", [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "https://youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42",
+    "https://youtu.be/dQw4w9WgXcQ?si=abc", "https://www.youtube.com/shorts/dQw4w9WgXcQ", "https://music.youtube.com/watch?v=dQw4w9WgXcQ&list=RD",
+    "https://www.youtube.com/embed/dQw4w9WgXcQ", "https://www.youtube.com/live/dQw4w9WgXcQ",
+])
+def test_url_forms_share_one_video_id(url):
+    assert canonical_video_id(url) == "dQw4w9WgXcQ"
+
+def test_same_video_from_different_urls_is_queued_once():
+    queue = DownloadQueue()
+    entries = [{"id": "dQw4w9WgXcQ", "url": "https://youtu.be/dQw4w9WgXcQ", "title": "A"}, {"webpage_url": "https://www.youtube.com/shorts/dQw4w9WgXcQ", "title": "A again"},
+               {"url": "https://example.com/clip.mp4", "ie_key": "Generic", "title": "Elsewhere"}, {"url": "https://example.com/clip.mp4", "ie_key": "Generic", "title": "Elsewhere"}]
+    added = [queue.add(item) for item in map(item_from_entry, entries)]
+    assert added == [True, False, True, False]
+    assert [item.key for item in queue] == ["dQw4w9WgXcQ", "https://example.com/clip.mp4"]
+    assert queue.get("dQw4w9WgXcQ").url == "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    assert item_from_entry({"id": "x", "title": "[Private video]"}) is None
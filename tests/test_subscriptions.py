@@ -0,0 +1,66 @@
+import threading
+import pytest
+import skylark_subscriptions
+from skylark_subscriptions import NEWEST_FIRST, OLDEST_FIRST, SubscriptionStore, guess_ordering, sync_all, sync_subscription
+
+PLAYLIST, CHANNEL = "https://www.youtube.com/playlist?list=PLx", "https://www.youtube.com/@someone/videos"
+
+@pytest.fixture
+def listing(monkeypatch):
+    # Listings served one entry per batch, with every read recorded as (url, playlist_start, entries read).
+    listings, reads = {}, []
+    def extract_stream(url, stop, engine=None, batch_size=50, playlist_start=1):
+        reads.append([url, playlist_start, 0])
+        for n in listings[url][playlist_start - 1:]:
+            if stop.is_set(): return
+            reads[-1][2] += 1
+            yield [{"id": f"video{n:06d}", "title": f"Video {n}", "playlist_title": "List"}], ""
+    monkeypatch.setattr(skylark_subscriptions, "extract_stream", extract_stream)
+    return listings, reads
+
+def ids(entries):
+    return [int(info["id"][5:]) for info in entries]
+
+def test_orderings_are_guessed_from_the_url():
+    assert (guess_ordering(PLAYLIST), guess_ordering(CHANNEL), guess_ordering("https://www.youtube.com/playlist?list=UUabc")) == (OLDEST_FIRST, NEWEST_FIRST, NEWEST_FIRST)
+
+def test_playlist_sync_resumes_near_the_previous_end(tmp_path, listing):
+    listings, reads = listing
+    store = SubscriptionStore(str(tmp_path / "subscriptions.sqlite3"))
+    store.add(PLAYLIST)
+    listings[PLAYLIST] = list(range(10))
+    assert ids(sync_subscription(store, PLAYLIST, threading.Event())[0]) == list(range(10))
+    listings[PLAYLIST] = list(range(12))
+    assert sync_subscription(store, PLAYLIST, threading.Event()) == ([{"id": "video000010", "title": "Video 10", "playlist_title": "List"}, {"id": "video000011", "title": "Video 11", "playlist_title": "List"}], "")
+    assert reads[-1] == [PLAYLIST, 6, 7]
+    assert store.get(PLAYLIST)["entry_count"] == 12 and store.get(PLAYLIST)["title"] == "List"
+
+def test_reordered_playlist_falls_back_to_a_full_listing(tmp_path, listing):
+    listings, reads = listing
+    store = SubscriptionStore(str(tmp_path / "subscriptions.sqlite3"))
+    store.add(PLAYLIST)
+    listings[PLAYLIST] = list(range(10))
+    sync_subscription(store, PLAYLIST, threading.Event())
+    listings[PLAYLIST] = [3, 2, *range(20, 30)]
+    assert ids(sync_subscription(store, PLAYLIST, threading.Event())[0]) == list(range(20, 30))
+    assert [start for _, start, _ in reads] == [1, 6, 1]
+
+def test_channel_sync_stops_at_known_videos_and_can_skip_the_backlog(tmp_path, listing):
+    listings, reads = listing
+    store = SubscriptionStore(str(tmp_path / "subscriptions.sqlite3"))
+    store.add(CHANNEL, skip_existing=True)
+    listings[CHANNEL] = list(range(9, -1, -1))
+    assert sync_subscription(store, CHANNEL, threading.Event()) == ([], "")
+    listings[CHANNEL] = [11, 10, *range(9, -1, -1)]
+    assert ids(sync_all(store, threading.Event())[CHANNEL][0]) == [11, 10]
+    assert reads[-1][2] == 2 + skylark_subscriptions.KNOWN_STREAK
+
+def test_cancelled_sync_saves_nothing(tmp_path, listing):
+    listings, _ = listing
+    store = SubscriptionStore(str(tmp_path / "subscriptions.sqlite3"))
+    store.add(PLAYLIST)
+    listings[PLAYLIST] = list(range(10))
+    cancel = threading.Event()
+    cancel.set()
+    assert sync_subscription(store, PLAYLIST, cancel)[1] == "Cancelled."
+    assert store.known_ids(PLAYLIST) == set() and store.get(PLAYLIST)["last_synced"] is None